@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Packer for the Sölle sermon corpus (data/sermons.dat)
+
+Builds the binary data file from JSON sermons and maintains it afterwards
+through an append-only journal, so adding a sermon never rewrites the corpus.
+
+    python 00__pack_sermons.py pack preken/*.json      # build from scratch
+    python 00__pack_sermons.py add nieuw.json          # journal: new sermons
+    python 00__pack_sermons.py replace herzien.json    # journal: replace by id
+    python 00__pack_sermons.py delete 07 12            # journal: tombstones
+    python 00__pack_sermons.py compact [--codec zlib]  # fold the journal in
+    python 00__pack_sermons.py list
+
+Each JSON file holds one sermon ({"id", "title", "scripture", "text"}) or a
+list of them.
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import List, Dict
+
+import sermon_data
+from sermon_data import SERMON_DATA_FILE
+
+
+def read_json_sermons(paths: List[str]) -> List[Dict]:
+    """Reads sermons from JSON files; each file holds one sermon or a list."""
+    sermons = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        sermons.extend(data if isinstance(data, list) else [data])
+    return sermons
+
+
+def cmd_pack(args):
+    sermons = read_json_sermons(args.files)
+    with sermon_data._writer_lock(args.data):
+        sermon_data.write_sermons(args.data, sermons, sermon_data.CODECS[args.codec])
+        if os.path.exists(sermon_data.journal_path(args.data)):
+            os.remove(sermon_data.journal_path(args.data))
+    print(f"{len(sermons)} preken geschreven naar {args.data}")
+
+
+def cmd_add(args):
+    sermons = read_json_sermons(args.files)
+    sermon_data.add_sermons(args.data, sermons)
+    print(f"{len(sermons)} preken toegevoegd aan {sermon_data.journal_path(args.data)}")
+
+
+def cmd_replace(args):
+    sermons = read_json_sermons(args.files)
+    sermon_data.replace_sermons(args.data, sermons)
+    print(f"{len(sermons)} preken vervangen via {sermon_data.journal_path(args.data)}")
+
+
+def cmd_delete(args):
+    sermon_data.delete_sermons(args.data, args.ids)
+    print(f"{len(args.ids)} preken verwijderd via {sermon_data.journal_path(args.data)}")
+
+
+def cmd_compact(args):
+    count = sermon_data.compact(args.data, sermon_data.CODECS[args.codec])
+    print(f"Journal samengevoegd: {count} preken in {args.data} ({sermon_data.SERMON_MAGIC.decode()})")
+
+
+def cmd_list(args):
+    with sermon_data.SermonReader(args.data) as reader:
+        for meta in reader.metadata():
+            print(f"{meta.id or '-':>6}  {meta.scripture or '':<28} {meta.word_count:>6} woorden  {meta.title or ''}")
+        print(f"\n{len(reader)} preken (formaat SOLLE0{reader.version})")
+
+
+def add_codec_argument(parser):
+    parser.add_argument("--codec", choices=sorted(sermon_data.CODECS), default="zdict",
+                        help="zlib per preek, of zlib met een gedeelde woordenlijst (zdict, standaard)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Beheer het preekbestand (sermons.dat).")
+    parser.add_argument("--data", default=SERMON_DATA_FILE, help="pad naar het preekbestand")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, help_text in (
+        ("pack", cmd_pack, "bouw het bestand opnieuw op uit JSON-bestanden"),
+        ("add", cmd_add, "voeg preken toe (journal)"),
+        ("replace", cmd_replace, "vervang preken met hetzelfde id (journal)"),
+    ):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("files", nargs="+", help="JSON-bestanden")
+        p.set_defaults(func=func)
+        if name == "pack":
+            add_codec_argument(p)
+
+    p = sub.add_parser("delete", help="verwijder preken op id (journal)")
+    p.add_argument("ids", nargs="+")
+    p.set_defaults(func=cmd_delete)
+
+    p = sub.add_parser("compact", help="voeg het journal samen met het preekbestand")
+    add_codec_argument(p)
+    p.set_defaults(func=cmd_compact)
+    sub.add_parser("list", help="toon de preken in het bestand").set_defaults(func=cmd_list)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except (ValueError, OSError) as e:
+        print(f"Fout: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
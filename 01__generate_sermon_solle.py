@@ -1,23 +1,21 @@
 #!/usr/bin/env python3
 import os
+import sys
 import glob
-import json
-import random
+import time
 import datetime
 import re
-import struct
-import zlib
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import google.generativeai as genai
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
-
-# Constants for binary sermon file
-SERMON_MAGIC = b'SOLLE01'
-SERMON_VERSION = 1
-SERMON_XOR_KEY = b'DorotheeS\xc3\xb6lle1929-2003MystiekEnVerzet'
-SERMON_DATA_FILE = os.path.join(os.path.dirname(__file__), "data", "sermons.dat")
+from bible_fetcher import BibleFetcher
+from sermon_llm import ChunkWriter, generate_text
+from lectionary import read_lectionary
+from sermon_queue import Checkpoint, JobQueue, run_jobs
+from sermon_data import load_random_examples
 
 # Load environment variables from .env file
 load_dotenv()
@@ -25,366 +23,20 @@ load_dotenv()
 # Configuration
 API_KEY = os.getenv("GEMINI_API_KEY")
 MODEL_NAME = "gemini-3-flash-preview"
+OUTPUT_DIR = "output/preken"
+# Characters of each example sermon given to the model
+EXAMPLE_CHARS = 1500
+# Sermons written at the same time in batch mode (--workers)
+BATCH_WORKERS = 2
+# The checkpointed stages of write_sermon, in order
+SERMON_STAGES = ("bible_text", "examples", "context_analysis", "sermon")
 
 if not API_KEY:
     print("Warning: GEMINI_API_KEY environment variable not set in .env")
 
-class BibleFetcher:
-    """Fetches Bible text from bible.hispage.nl (HSV)."""
-    
-    # Standaard canonieke volgorde (1-66) + Veelvoorkomende afkortingen
-    BOOK_MAPPING = {
-        # Oude Testament
-        "genesis": 1, "gen": 1, "exodus": 2, "ex": 2, "leviticus": 3, "lev": 3, "numeri": 4, "num": 4, 
-        "deuteronomium": 5, "deut": 5, "dt": 5,
-        "jozua": 6, "joz": 6, "richteren": 7, "rechters": 7, "ri": 7, "ruth": 8, "rut": 8,
-        "1 samuel": 9, "1sam": 9, "1 sa": 9, "2 samuel": 10, "2sam": 10, "2 sa": 10,
-        "1 koningen": 11, "1kon": 11, "1 ko": 11, "2 koningen": 12, "2kon": 12, "2 ko": 12,
-        "1 kronieken": 13, "1kr": 13, "1 kr": 13, "2 kronieken": 14, "2kr": 14, "2 kr": 14,
-        "ezra": 15, "nehemia": 16, "neh": 16, "esther": 17, "est": 17,
-        "job": 18, "psalmen": 19, "psalm": 19, "ps": 19, "spreuken": 20, "spr": 20,
-        "prediker": 21, "pred": 21, "hooglied": 22, "hgl": 22,
-        "jesaja": 23, "jes": 23, "jeremia": 24, "jer": 24, "klaagliederen": 25, "kla": 25,
-        "ezechiël": 26, "ezechiel": 26, "ez": 26, "daniël": 27, "daniel": 27, "dan": 27,
-        "hosea": 28, "hos": 28, "joël": 29, "joel": 29, "amos": 30, "am": 30,
-        "obadja": 31, "ob": 31, "jona": 32, "micha": 33, "mi": 33, "mic": 33,
-        "nahum": 34, "na": 34, "nah": 34, "habakuk": 35, "hab": 35, "zefanja": 36, "zef": 36,
-        "haggai": 37, "hag": 37, "zacharia": 38, "zach": 38, "zac": 38, "maleachi": 39, "mal": 39,
-        # Nieuwe Testament
-        "mattheüs": 40, "mattheus": 40, "matt": 40, "mt": 40, "marcus": 41, "marc": 41, "mk": 41, "mc": 41,
-        "lucas": 42, "lukas": 42, "luc": 42, "luk": 42, "lc": 42, "johannes": 43, "joh": 43, "jn": 43,
-        "handelingen": 44, "hand": 44, "hnd": 44, "romeinen": 45, "rom": 45,
-        "1 korintiërs": 46, "1 korintiers": 46, "1kor": 46, "1 kor": 46, "1ko": 46,
-        "2 korintiërs": 47, "2 korintiers": 47, "2kor": 47, "2 kor": 47, "2ko": 47,
-        "galaten": 48, "gal": 48, "efesiërs": 49, "efesiers": 49, "efeze": 49, "ef": 49,
-        "filippenzen": 50, "fil": 50, "kolossenzen": 51, "kol": 51,
-        "1 tessalonicenzen": 52, "1tess": 52, "1 tess": 52, "1th": 52,
-        "2 tessalonicenzen": 53, "2tess": 53, "2 tess": 53, "2th": 53,
-        "1 timoteüs": 54, "1 timotheus": 54, "1tim": 54, "1 tim": 54, "1ti": 54,
-        "2 timoteüs": 55, "2 timotheus": 55, "2tim": 55, "2 tim": 55, "2ti": 55,
-        "titus": 56, "tit": 56, "filemon": 57, "film": 57, "flm": 57,
-        "hebreeën": 58, "hebreeen": 58, "hebr": 58, "heb": 58,
-        "jakobus": 59, "jak": 59,
-        "1 petrus": 60, "1pet": 60, "1 pet": 60, "1pe": 60,
-        "2 petrus": 61, "2pet": 61, "2 pet": 61, "2pe": 61,
-        "1 johannes": 62, "1joh": 62, "1 joh": 62, "1jo": 62,
-        "2 johannes": 63, "2joh": 63, "2 joh": 63, "2jo": 63,
-        "3 johannes": 64, "3joh": 64, "3 joh": 64, "3jo": 64,
-        "judas": 65, "jud": 65, "openbaring": 66, "openbaringen": 66, "op": 66
-    }
-
-    @staticmethod
-    def parse_reference(reference: str) -> tuple[Optional[int], Optional[str], Optional[str], str]:
-        """
-        Parses 'Lukas 2:1-4' into (42, '2', '1-4', 'match_type').
-        Returns: (book_id, chapter, verses, log_message)
-        """
-        # Improved regex to handle '1 Joh', '1Joh', '1 Johannes', 'Lucas', 'Lk'
-        # Matches optional digit + space + word(s) + space + digit
-        
-        # Stap 1: Normaliseren (lowercase, spaties rond cijfers)
-        ref_norm = reference.lower().strip()
-        
-        # Zoek naar het patroon: (Boek) (Hoofdstuk) : (Verzen)
-        # We splitsen eerst op het laatste cijfergroep die het hoofdstuk is.
-        
-        match = re.match(r"^(\d?\s*[a-zëï]+)\.?\s*(\d+)(?:[:\.](\d+(?:-\d+)?))?$", ref_norm)
-        
-        if not match:
-            return None, None, None, f"Regex parse mislukt voor '{reference}'"
-        
-        book_part = match.group(1).strip()
-        chapter = match.group(2)
-        verses = match.group(3)
-        
-        log_msg = f"Geparsed: Boek='{book_part}', Hst='{chapter}', Vers='{verses}'"
-
-        # Mapping check
-        book_id = BibleFetcher.BOOK_MAPPING.get(book_part)
-        match_type = "exact"
-        
-        if not book_id:
-            # Fuzzy Matching
-            # 1. Probeer zonder spaties (1 joh -> 1joh)
-            compact_name = book_part.replace(" ", "")
-            book_id = BibleFetcher.BOOK_MAPPING.get(compact_name)
-            if book_id:
-                match_type = "compact_match"
-            else:
-                # 2. Startswith search in keys (riskant bij 'joh' -> 'johannes' vs 'jona'?)
-                # We sorteren keys op lengte om eerst 'johannes' te matchen als input 'johannes' is, 
-                # maar als input 'joh' is, matcht het 'johannes'. 
-                # Om veilig te zijn: als input 'joh' is, en 'joh' staat in keys (wat zo is), pakken we die.
-                # Als input 'luk' is, en 'luk' staat in keys, pakken we die.
-                # Als input 'lu' is?
-                for key, bid in BibleFetcher.BOOK_MAPPING.items():
-                    if key.startswith(book_part):
-                        book_id = bid
-                        match_type = f"fuzzy_startswith_'{key}'"
-                        break
-        
-        if book_id:
-            log_msg += f" -> ID gevonden: {book_id} ({match_type})"
-        else:
-            log_msg += " -> GEEN ID gevonden."
-
-        return book_id, chapter, verses, log_msg
-
-    @staticmethod
-    def fetch_text(reference: str) -> tuple[str, str]:
-        """
-        Fetches the text from multiple sources, trying bijbel.net first (more reliable),
-        then falling back to bible.hispage.nl.
-        Returns: (text, log_details)
-        """
-        book_id, chapter, verses, parse_log = BibleFetcher.parse_reference(reference)
-
-        if not book_id or not chapter:
-            return f"[Kon tekst niet automatisch ophalen. Fallback op interne kennis.]", parse_log
-
-        fetch_log = parse_log
-
-        # Try debijbel.nl first (Nederlandse Bijbelgenootschap - cleaner HTML)
-        text, log = BibleFetcher._try_debijbel(reference, book_id, chapter, verses)
-        fetch_log += log
-        if not text.startswith("["):
-            return text, fetch_log
-
-        # Fallback to hispage.nl
-        text, log = BibleFetcher._try_hispage(book_id, chapter)
-        fetch_log += log
-        return text, fetch_log
-
-    @staticmethod
-    def _try_debijbel(reference: str, book_id: int, chapter: str, verses: Optional[str]) -> tuple[str, str]:
-        """Try to fetch from debijbel.nl (NBG - cleaner, more reliable)."""
-        log = "\n\n--- Poging 1: debijbel.nl (HSV) ---"
-
-        # Map book_id to debijbel.nl book abbreviation
-        book_abbrevs = {
-            1: "GEN", 2: "EXO", 3: "LEV", 4: "NUM", 5: "DEU", 6: "JOZ", 7: "RIC", 8: "RUT",
-            9: "1SA", 10: "2SA", 11: "1KO", 12: "2KO", 13: "1KR", 14: "2KR", 15: "EZR",
-            16: "NEH", 17: "EST", 18: "JOB", 19: "PSA", 20: "SPR", 21: "PRE", 22: "HOO",
-            23: "JES", 24: "JER", 25: "KLA", 26: "EZE", 27: "DAN", 28: "HOS", 29: "JOE",
-            30: "AMO", 31: "OBA", 32: "JON", 33: "MIC", 34: "NAH", 35: "HAB", 36: "SEF",
-            37: "HAG", 38: "ZAC", 39: "MAL", 40: "MAT", 41: "MAR", 42: "LUK", 43: "JOH",
-            44: "HAN", 45: "ROM", 46: "1KOR", 47: "2KOR", 48: "GAL", 49: "EFE", 50: "FIL",
-            51: "KOL", 52: "1TES", 53: "2TES", 54: "1TIM", 55: "2TIM", 56: "TIT", 57: "FLM",
-            58: "HEB", 59: "JAK", 60: "1PE", 61: "2PE", 62: "1JOH", 63: "2JOH", 64: "3JOH",
-            65: "JUD", 66: "OPE"
-        }
-
-        abbrev = book_abbrevs.get(book_id, "")
-        if not abbrev:
-            log += f"\nGeen abbreviatie voor book_id {book_id}"
-            return "[Boek niet gevonden]", log
-
-        # debijbel.nl HSV format: https://debijbel.nl/bijbel/HSV/PSA.23
-        url = f"https://debijbel.nl/bijbel/HSV/{abbrev}.{chapter}"
-        log += f"\nURL: {url}"
-        print(f"   (Ophalen van {url}...)")
-
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'nl-NL,nl;q=0.9,en;q=0.8'
-            }
-            response = requests.get(url, headers=headers, timeout=15)
-            log += f"\nHTTP Status: {response.status_code}"
-
-            if response.status_code != 200:
-                return f"[HTTP {response.status_code}]", log
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # Find verse containers - debijbel.nl uses specific classes
-            verses_text = []
-
-            # Try multiple selectors
-            verse_elements = soup.find_all('span', class_=lambda x: x and 'verse' in x.lower()) or \
-                            soup.find_all('div', class_=lambda x: x and 'verse' in x.lower()) or \
-                            soup.find_all(class_=lambda x: x and 'tekst' in x.lower())
-
-            if verse_elements:
-                for elem in verse_elements:
-                    text = elem.get_text(strip=True)
-                    if text and len(text) > 5:  # Filter out tiny elements
-                        verses_text.append(text)
-
-            # If specific verse elements not found, try main content area
-            if not verses_text:
-                main_content = soup.find('main') or soup.find('article') or soup.find('div', class_='content')
-                if main_content:
-                    # Get all paragraphs
-                    for p in main_content.find_all(['p', 'div']):
-                        text = p.get_text(strip=True)
-                        # Filter: verse text usually starts with number or has Dutch words
-                        if text and len(text) > 10 and not any(nav in text.lower() for nav in
-                            ['genesis', 'exodus', 'leviticus', 'king james', 'statenvertaling',
-                             'lutherse', 'copyright', 'bijbelgenootschap', 'cookie', 'privacy']):
-                            verses_text.append(text)
-
-            if verses_text:
-                full_text = " ".join(verses_text)
-                # Clean up
-                full_text = re.sub(r'\s+', ' ', full_text).strip()
-                if len(full_text) > 6000:
-                    full_text = full_text[:6000] + "..."
-                log += f"\nSucces: {len(full_text)} karakters opgehaald."
-                return full_text, log
-
-            log += "\nGeen verzen gevonden op debijbel.nl"
-            return "[Geen tekst gevonden]", log
-
-        except Exception as e:
-            log += f"\nException: {str(e)}"
-            return f"[Fout: {str(e)}]", log
-
-    @staticmethod
-    def _try_hispage(book_id: int, chapter: str) -> tuple[str, str]:
-        """Fallback to bible.hispage.nl with improved parsing."""
-        log = "\n\n--- Poging 2: hispage.nl ---"
-
-        # v[]=6 is HSV (Herziene Statenvertaling)
-        url = f"https://bible.hispage.nl/index.php?book={book_id}&chapter={chapter}&v[]=6&language=1"
-        log += f"\nURL: {url}"
-        print(f"   (Ophalen van {url}...)")
-
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0 (compatible; SermonBot/1.0)'}
-            response = requests.get(url, headers=headers, timeout=10)
-            log += f"\nHTTP Status: {response.status_code}"
-
-            if response.status_code != 200:
-                return f"[Fout bij ophalen: HTTP {response.status_code}]", log
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # Remove navigation elements, scripts, styles
-            for element in soup.find_all(['script', 'style', 'nav', 'header', 'footer', 'select', 'option', 'button']):
-                element.decompose()
-
-            # Remove elements with navigation-like content
-            for element in soup.find_all(['div', 'span', 'td', 'a']):
-                text = element.get_text(strip=True).lower()
-                # Skip if it looks like navigation/menu
-                if any(nav in text for nav in ['genesis', 'exodus', 'leviticus', 'numbers', 'deuteronomy',
-                    'matthew', 'mark', 'luke', 'john', 'king james', 'statenvertaling',
-                    'lutherse vertaling', 'leidse vertaling', 'nbg', 'het boek', 'basisbijbel',
-                    'new international', 'louis segond', 'vulgate', 'and or']):
-                    if len(text) < 100:  # Only remove if it's a short nav element
-                        element.decompose()
-
-            # Now extract text
-            # Look for table cells that contain verse numbers followed by text
-            verses = []
-
-            # Find all table rows
-            for row in soup.find_all('tr'):
-                cells = row.find_all('td')
-                for cell in cells:
-                    text = cell.get_text(separator=' ', strip=True)
-                    # Check if this looks like a verse (starts with number or contains Dutch text)
-                    if text and len(text) > 20:
-                        # Check for verse pattern: number at start followed by text
-                        if re.match(r'^\d+\s+\w', text):
-                            verses.append(text)
-                        # Or just substantial Dutch text
-                        elif any(dutch in text.lower() for dutch in ['heere', 'god', 'jezus', 'christus', 'hij', 'zij', 'mij', 'zijn']):
-                            verses.append(text)
-
-            if verses:
-                # Take only unique verses and join
-                seen = set()
-                unique_verses = []
-                for v in verses:
-                    v_clean = v[:50]  # Use first 50 chars for dedup
-                    if v_clean not in seen:
-                        seen.add(v_clean)
-                        unique_verses.append(v)
-
-                full_text = " ".join(unique_verses)
-                full_text = re.sub(r'\s+', ' ', full_text).strip()
-
-                if len(full_text) > 6000:
-                    full_text = full_text[:6000] + "..."
-
-                log += f"\nSucces: {len(full_text)} karakters opgehaald."
-                return full_text, log
-
-            log += "\nGeen verzen gevonden met verbeterde parsing."
-            return "[Kon geen leesbare tekst extraheren.]", log
-
-        except Exception as e:
-            log += f"\nException: {str(e)}"
-            return f"[Fout bij ophalen: {str(e)}]", log
-
 def setup_client():
     genai.configure(api_key=API_KEY)
 
-def _xor_bytes(data: bytes, key: bytes) -> bytes:
-    """Apply XOR operation to data with key."""
-    key_len = len(key)
-    return bytes(b ^ key[i % key_len] for i, b in enumerate(data))
-
-
-def _load_sermons_from_binary(binary_file: str) -> List[Dict]:
-    """Load all sermons from the binary data file."""
-    sermons = []
-
-    if not os.path.exists(binary_file):
-        print(f"Sermon data file not found: {binary_file}")
-        return sermons
-
-    with open(binary_file, 'rb') as f:
-        # Read and verify header
-        magic = f.read(len(SERMON_MAGIC))
-        if magic != SERMON_MAGIC:
-            raise ValueError("Invalid sermon data file format")
-
-        version = struct.unpack('<B', f.read(1))[0]
-        if version != SERMON_VERSION:
-            raise ValueError(f"Unsupported sermon data version: {version}")
-
-        count = struct.unpack('<H', f.read(2))[0]
-
-        # Read each sermon
-        for _ in range(count):
-            length = struct.unpack('<I', f.read(4))[0]
-            obfuscated = f.read(length)
-            compressed = _xor_bytes(obfuscated, SERMON_XOR_KEY)
-            json_bytes = zlib.decompress(compressed)
-            sermon = json.loads(json_bytes.decode('utf-8'))
-            sermons.append(sermon)
-
-    return sermons
-
-
-def load_random_examples(n: int = 6) -> List[Dict]:
-    """Loads n random sermons from the binary sermon data file."""
-    try:
-        all_sermons = _load_sermons_from_binary(SERMON_DATA_FILE)
-    except Exception as e:
-        print(f"Error loading sermon data: {e}")
-        return []
-
-    if not all_sermons:
-        return []
-
-    selected = random.sample(all_sermons, min(n, len(all_sermons)))
-    examples = []
-
-    for data in selected:
-        if 'scripture' in data and 'text' in data:
-            examples.append({
-                'title': data.get('title', 'Onbekend'),
-                'scripture': data.get('scripture', ''),
-                'text': data.get('text', '')[:1500] + "..."
-            })
-
-    return examples
-
 def construct_system_prompt() -> str:
     """Constructs the system prompt based on Sölle's theology and style."""
     
@@ -412,8 +64,11 @@ def construct_system_prompt() -> str:
     """
     return analysis
 
-def perform_pre_work(model, scripture: str, bible_text: str) -> str:
-    """Asks the model to perform extensive contextual analysis before writing."""
+def perform_pre_work(model, scripture: str, bible_text: str,
+                     on_chunk: Optional[Callable[[str], None]] = None, echo: bool = True) -> str:
+    """Asks the model to perform extensive contextual analysis before writing.
+    The text is passed to on_chunk as it arrives (see sermon_llm.generate_text).
+    """
     prompt = f"""
     **STAP 1: DIEPGAANDE CONTEXT & TEKST ANALYSE**
 
@@ -508,11 +163,13 @@ def perform_pre_work(model, scripture: str, bible_text: str) -> str:
     Geef deze analyse uitgebreid en puntsgewijs. Dit is het fundament voor de preek.
     Wees concreet, noem namen van bedrijven, politici, plaatsen. Geen abstracties.
     """
-    response = model.generate_content(prompt)
-    return response.text
+    return generate_text(model, prompt, on_chunk, echo)
 
-def generate_sermon(model, scripture: str, bible_text: str, context_analysis: str, examples: List[Dict]) -> str:
-    """Generates an extensive sermon using the examples and context analysis."""
+def generate_sermon(model, scripture: str, bible_text: str, context_analysis: str, examples: List[Dict],
+                    on_chunk: Optional[Callable[[str], None]] = None, echo: bool = True) -> str:
+    """Generates an extensive sermon using the examples and context analysis.
+    The text is passed to on_chunk as it arrives (see sermon_llm.generate_text).
+    """
 
     examples_str = "\n\n".join([f"--- STIJLVOORBEELD (Sölle) ---\n{ex['text']}..." for ex in examples])
 
@@ -629,94 +286,256 @@ def generate_sermon(model, scripture: str, bible_text: str, context_analysis: st
     **SCHRIJF NU DE PREEK:**
     """
 
-    response = model.generate_content(prompt)
-    return response.text
-
-def main():
-    setup_client()
-    
-    # 1. Input Scripture
-    scripture = input("Geef de Bijbeltekst op (bijv. Lukas 2:1-4): ")
-    if not scripture:
-        print("Geen tekst opgegeven.")
-        return
+    return generate_text(model, prompt, on_chunk, echo)
 
-    # 2. Initialize Model
+def create_model():
+    """The sermon model, falling back to gemini-3-preview."""
     try:
-        model = genai.GenerativeModel(
+        return genai.GenerativeModel(
             model_name=MODEL_NAME,
             system_instruction=construct_system_prompt()
         )
     except Exception as e:
         print(f"Error initializing model {MODEL_NAME}: {e}")
-        model = genai.GenerativeModel(
+        return genai.GenerativeModel(
             model_name="gemini-3-preview",
             system_instruction=construct_system_prompt()
         )
 
-    # 3. Fetch Bible Text
-    print(f"Ophalen van tekst voor '{scripture}' van hispage.nl...")
-    bible_text, fetch_log = BibleFetcher.fetch_text(scripture)
-    print(f"   > Gevonden tekst (eerste 100 tekens): {bible_text[:100]}...")
-
-    # 4. Load Examples
-    print("Ophalen van willekeurige voorbeeldpreken...")
-    examples = load_random_examples(n=4)
-    
-    # 5. Pre-work (Context Analysis)
-    print("Analyseren van de context...")
-    context_analysis = perform_pre_work(model, scripture, bible_text)
-    print(f"\n--- Analyse ---\n{context_analysis}\n---------------")
-
-    # 6. Generate Sermon
-    print("Schrijven van de preek...")
-    sermon = generate_sermon(model, scripture, bible_text, context_analysis, examples)
-    
-    # 7. Output and Log
-    print("\n--- Preek van Dorothee Sölle (LLM) ---\n")
-    print(sermon)
-    
-    # Create output directory
-    output_dir = "output/preken"
+def new_output_paths(scripture: str, output_dir: str = OUTPUT_DIR) -> Tuple[str, str]:
+    """
+    Claims a fresh .md file for scripture and returns (sermon_path, log_path).
+    The name is '<date>_<time>_<reference>'; when that is taken (same second,
+    or another reference with the same safe name) '-2', '-3', ... is added.
+    The file is created exclusively, so concurrent jobs never share a name.
+    """
     os.makedirs(output_dir, exist_ok=True)
-    
-    # Create a safe filename
-    timestamp_fs = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+    timestamp_fs = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     safe_scripture = re.sub(r'[^\w\s-]', '', scripture).strip().replace(' ', '_')
     base_filename = f"{timestamp_fs}_{safe_scripture}"
-    
-    sermon_path = os.path.join(output_dir, f"{base_filename}.md")
-    log_path = os.path.join(output_dir, f"{base_filename}.log")
-    
-    # Save Sermon
-    with open(sermon_path, "w", encoding="utf-8") as f:
-        f.write(f"# Preek over {scripture}\n")
-        f.write(f"*Gegenereerd op: {datetime.datetime.now().strftime('%d-%m-%Y %H:%M')}*\n\n")
-        f.write(sermon)
-    
-    # Save Log
-    with open(log_path, "w", encoding="utf-8") as f:
-        f.write("=== GENERATION LOG ===\n")
-        f.write(f"Timestamp: {datetime.datetime.now()}\n")
-        f.write(f"Scripture Input: {scripture}\n")
-        f.write(f"Model: {MODEL_NAME}\n\n")
-        
-        f.write("--- BIBLE FETCHING ---\n")
-        f.write(fetch_log + "\n\n")
-        f.write(f"--- FULL SCRAPED BIBLE TEXT (HSV) ---\n{bible_text}\n\n")
-        
-        f.write("--- CONTEXT ANALYSIS ---\n")
-        f.write(context_analysis + "\n\n")
-
-        f.write("--- EXAMPLES USED ---\n")
-        for ex in examples:
-            f.write(f"- {ex['title']} ({ex['scripture']})\n")
-
-        f.write("\n--- GENERATED SERMON ---\n")
-        f.write(sermon + "\n")
+    for n in itertools.count(2):
+        sermon_path = os.path.join(output_dir, f"{base_filename}.md")
+        try:
+            with open(sermon_path, "x", encoding="utf-8"):
+                pass
+            return sermon_path, os.path.join(output_dir, f"{base_filename}.log")
+        except FileExistsError:
+            base_filename = f"{timestamp_fs}_{safe_scripture}-{n}"
+
+def write_sermon(model, scripture: str, echo: bool = True, state: Optional[Dict] = None,
+                 checkpoint: Optional[Callable[[Dict], None]] = None) -> Tuple[str, str]:
+    """
+    The whole pipeline for one reference: fetch the text, load examples,
+    analyse, write the sermon. The .md and .log are filled as the stages
+    complete; with echo the progress and the model output are printed too.
+
+    state holds the output of the stages done so far ('bible_text',
+    'fetch_log', 'examples', 'context_analysis', 'sermon' and the output
+    paths); stages found in it are not repeated, and checkpoint(state) is
+    called after every completed stage.
+    Returns (sermon_path, log_path).
+    """
+    say = print if echo else (lambda *args, **kwargs: None)
+    state = {} if state is None else state
+    checkpoint = checkpoint or (lambda state: None)
+
+    # 1. Fetch Bible Text
+    if "bible_text" not in state:
+        say(f"Ophalen van tekst voor '{scripture}' van hispage.nl...")
+        state["bible_text"], state["fetch_log"] = BibleFetcher.fetch_text(scripture, echo=echo)
+        checkpoint(state)
+    bible_text, fetch_log = state["bible_text"], state["fetch_log"]
+    say(f"   > Gevonden tekst (eerste 100 tekens): {bible_text[:100]}...")
+
+    # 2. Load Examples
+    if "examples" not in state:
+        say("Ophalen van willekeurige voorbeeldpreken...")
+        state["examples"] = load_random_examples(n=4, excerpt_chars=EXAMPLE_CHARS, scripture=scripture,
+                                                  seed=os.getenv("SOLLE_SEED"))
+        checkpoint(state)
+    examples = state["examples"]
+
+    # 3. Open the output files; every section is appended as soon as it is known
+    if "sermon_path" not in state:
+        state["sermon_path"], state["log_path"] = new_output_paths(scripture)
+        checkpoint(state)
+    sermon_path, log_path = state["sermon_path"], state["log_path"]
+
+    with open(sermon_path, "w", encoding="utf-8") as sermon_file, \
+            open(log_path, "w", encoding="utf-8") as log_file:
+        sermon_file.write(f"# Preek over {scripture}\n")
+        sermon_file.write(f"*Gegenereerd op: {datetime.datetime.now().strftime('%d-%m-%Y %H:%M')}*\n\n")
+        sermon_file.flush()
+
+        log_file.write("=== GENERATION LOG ===\n")
+        log_file.write(f"Timestamp: {datetime.datetime.now()}\n")
+        log_file.write(f"Scripture Input: {scripture}\n")
+        log_file.write(f"Model: {MODEL_NAME}\n\n")
+
+        log_file.write("--- BIBLE FETCHING ---\n")
+        log_file.write(fetch_log + "\n\n")
+        log_file.write(f"--- FULL SCRAPED BIBLE TEXT (HSV) ---\n{bible_text}\n\n")
+        log_file.flush()
+
+        try:
+            # 4. Pre-work (Context Analysis), shown and logged while it is written
+            say("Analyseren van de context...")
+            say("\n--- Analyse ---")
+            log_file.write("--- CONTEXT ANALYSIS ---\n")
+            writer = ChunkWriter(log_file, echo=echo)
+            if "context_analysis" in state:
+                writer(state["context_analysis"])
+            else:
+                state["context_analysis"] = perform_pre_work(model, scripture, bible_text, on_chunk=writer, echo=echo)
+                checkpoint(state)
+            say("\n---------------")
+            log_file.write("\n\n")
+
+            log_file.write("--- EXAMPLES USED ---\n")
+            for ex in examples:
+                log_file.write(f"- {ex['title']} ({ex['scripture']})\n")
+
+            # 5. Generate Sermon into the .md and the log
+            say("Schrijven van de preek...")
+            say("\n--- Preek van Dorothee Sölle (LLM) ---\n")
+            log_file.write("\n--- GENERATED SERMON ---\n")
+            writer = ChunkWriter(sermon_file, log_file, echo=echo)
+            if "sermon" in state:
+                writer(state["sermon"])
+            else:
+                state["sermon"] = generate_sermon(model, scripture, bible_text, state["context_analysis"],
+                                                  examples, on_chunk=writer, echo=echo)
+            say()
+            log_file.write("\n")
+        except BaseException as e:
+            # Keep what has arrived, marked as incomplete
+            ChunkWriter(sermon_file, log_file, echo=False).interrupted(e)
+            say(f"\nGenereren afgebroken; de gedeeltelijke preek staat in: {sermon_path}")
+            raise
+
+    checkpoint(state)
+    return sermon_path, log_path
+
+def write_sermon_checkpointed(model, checkpoint: Checkpoint, echo: bool = True) -> Tuple[str, str]:
+    """
+    write_sermon with every completed stage saved in checkpoint, continuing
+    from the stages already in it. The checkpoint is removed once the
+    sermon is complete and kept for --resume when the run fails.
+    """
+    try:
+        paths = write_sermon(model, checkpoint.input, echo=echo, state=checkpoint.state, checkpoint=checkpoint.save)
+    except BaseException:
+        if echo:
+            print(f"Tussenresultaten bewaard; verder gaan met: "
+                  f"python 01__generate_sermon_solle.py --resume {checkpoint.path}")
+        raise
+    checkpoint.remove()
+    return paths
+
+def run_batch(model, references: List[str], workers: int) -> int:
+    """
+    Runs write_sermon for every reference on a pool of workers and prints a
+    summary per job. Returns the number of failed jobs.
+    """
+    print(f"{len(references)} preken, {workers} tegelijk\n")
+    results = {}
+    start = time.perf_counter()
+
+    def job(scripture: str):
+        job_start = time.perf_counter()
+        checkpoint = Checkpoint.new("sermon", scripture)
+        try:
+            sermon_path, _ = write_sermon_checkpointed(model, checkpoint, echo=False)
+            return True, sermon_path, time.perf_counter() - job_start
+        except Exception as e:
+            return (False, f"{type(e).__name__}: {e} (verder gaan: --resume {checkpoint.path})",
+                    time.perf_counter() - job_start)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(job, scripture): i for i, scripture in enumerate(references)}
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            results[i] = future.result()
+            ok, detail, seconds = results[i]
+            print(f"[{done}/{len(references)}] {references[i]}: {'klaar' if ok else 'mislukt'} ({seconds:.1f} s)")
+
+    failed = 0
+    print(f"\n{'verwijzing':<30}{'status':<9}{'tijd':>8}  bestand / fout")
+    for i, scripture in enumerate(references):
+        ok, detail, seconds = results[i]
+        failed += not ok
+        print(f"{scripture:<30}{'ok' if ok else 'mislukt':<9}{seconds:>7.1f}s  {detail}")
+    print(f"\nKlaar in {time.perf_counter() - start:.1f} s: {len(references) - failed} gelukt, {failed} mislukt.")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Genereer een preekconcept in de stijl van Dorothee Sölle. Zonder argumenten wordt "
+                    "om één bijbeltekst gevraagd; met --batch of --ref worden meerdere preken gemaakt, "
+                    "met --resume gaat een afgebroken preek verder.")
+    parser.add_argument("--batch", action="append", default=[], metavar="BESTAND",
+                        help="bestand met één verwijzing per regel, eventueel met datum (herhaalbaar)")
+    parser.add_argument("--ref", action="append", default=[], help="verwijzing, bijv. 'Luk 2:1-20' (herhaalbaar)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS,
+                        help=f"preken tegelijk (standaard {BATCH_WORKERS})")
+    parser.add_argument("--queue", action="store_true",
+                        help="via de takenwachtrij (hervatbaar); zonder verwijzingen worden openstaande taken hervat")
+    parser.add_argument("--resume", nargs="?", const="", metavar="CHECKPOINT",
+                        help="ga verder met de laatst afgebroken preek (of met dit checkpointbestand)")
+    args = parser.parse_args()
+    if args.resume is not None and (args.batch or args.ref or args.queue):
+        parser.error("--resume kan niet samen met --batch, --ref of --queue "
+                     "(de wachtrij hervat zelf; een batchpreek hervat je met --resume CHECKPOINT)")
+
+    setup_client()
+
+    references = read_lectionary(args.batch) + args.ref
+    if args.queue:
+        queue = JobQueue(JobQueue.default_path())
+        for scripture in references:
+            queue.submit("sermon", scripture)
+        model = create_model()
+
+        def handler(scripture: str, state: Dict, checkpoint) -> str:
+            return write_sermon(model, scripture, echo=False, state=state, checkpoint=checkpoint)[0]
+
+        unfinished = run_jobs(queue, "sermon", handler, args.workers)
+        sys.exit(1 if unfinished else 0)
+    if args.batch or args.ref:
+        if not references:
+            print("Geen verwijzingen gevonden.")
+            return
+        failed = run_batch(create_model(), references, args.workers)
+        sys.exit(1 if failed else 0)
+
+    # 1. Input Scripture, or the run to resume
+    if args.resume is not None:
+        try:
+            checkpoint = Checkpoint.load(args.resume) if args.resume else Checkpoint.latest("sermon")
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"{args.resume} is geen bruikbaar checkpoint ({e})")
+        if checkpoint is None:
+            print("Geen afgebroken preek gevonden om te hervatten.")
+            return
+        if checkpoint.kind != "sermon":
+            parser.error(f"{checkpoint.path} is geen checkpoint van een preek (maar van '{checkpoint.kind}')")
+        done = [stage for stage in SERMON_STAGES if stage in checkpoint.state]
+        print(f"Hervatten van '{checkpoint.input}' (al klaar: {', '.join(done) or 'niets'})")
+    else:
+        scripture = input("Geef de Bijbeltekst op (bijv. Lukas 2:1-4): ")
+        if not scripture:
+            print("Geen tekst opgegeven.")
+            return
+        checkpoint = Checkpoint.new("sermon", scripture)
+
+    # 2. Initialize Model
+    model = create_model()
+
+    # 3. Fetch, analyse and write; each completed stage is checkpointed
+    sermon_path, log_path = write_sermon_checkpointed(model, checkpoint)
 
     print(f"\nPreek opgeslagen in: {sermon_path}")
     print(f"Logbestand opgeslagen in: {log_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
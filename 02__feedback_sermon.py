@@ -9,15 +9,15 @@ Dorothee Sölle's theological methodology, and generates an improved version.
 import os
 import sys
 import glob
-import json
-import random
 import datetime
 import re
-import struct
-import zlib
+import argparse
 import google.generativeai as genai
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
+from sermon_llm import INCOMPLETE_MARKER, ChunkWriter, generate_text
+from sermon_queue import QUEUE_WORKERS, Checkpoint, JobQueue, run_jobs
+from sermon_data import load_random_examples
 
 # Load environment variables from .env file
 load_dotenv()
@@ -25,12 +25,10 @@ load_dotenv()
 # Configuration
 API_KEY = os.getenv("GEMINI_API_KEY")
 MODEL_NAME = "gemini-3-flash-preview"
-
-# Constants for binary sermon file
-SERMON_MAGIC = b'SOLLE01'
-SERMON_VERSION = 1
-SERMON_XOR_KEY = b'DorotheeS\xc3\xb6lle1929-2003MystiekEnVerzet'
-SERMON_DATA_FILE = os.path.join(os.path.dirname(__file__), "data", "sermons.dat")
+# Characters of each example sermon given to the model
+EXAMPLE_CHARS = 2000
+# The checkpointed stages of review_sermon, in order
+FEEDBACK_STAGES = ("examples", "critique", "improved")
 
 if not API_KEY:
     print("Error: GEMINI_API_KEY environment variable not set in .env")
@@ -42,69 +40,6 @@ def setup_client():
     genai.configure(api_key=API_KEY)
 
 
-def _xor_bytes(data: bytes, key: bytes) -> bytes:
-    """Apply XOR operation to data with key."""
-    key_len = len(key)
-    return bytes(b ^ key[i % key_len] for i, b in enumerate(data))
-
-
-def _load_sermons_from_binary(binary_file: str) -> List[Dict]:
-    """Load all sermons from the binary data file."""
-    sermons = []
-
-    if not os.path.exists(binary_file):
-        print(f"Sermon data file not found: {binary_file}")
-        return sermons
-
-    with open(binary_file, 'rb') as f:
-        # Read and verify header
-        magic = f.read(len(SERMON_MAGIC))
-        if magic != SERMON_MAGIC:
-            raise ValueError("Invalid sermon data file format")
-
-        version = struct.unpack('<B', f.read(1))[0]
-        if version != SERMON_VERSION:
-            raise ValueError(f"Unsupported sermon data version: {version}")
-
-        count = struct.unpack('<H', f.read(2))[0]
-
-        # Read each sermon
-        for _ in range(count):
-            length = struct.unpack('<I', f.read(4))[0]
-            obfuscated = f.read(length)
-            compressed = _xor_bytes(obfuscated, SERMON_XOR_KEY)
-            json_bytes = zlib.decompress(compressed)
-            sermon = json.loads(json_bytes.decode('utf-8'))
-            sermons.append(sermon)
-
-    return sermons
-
-
-def load_random_examples(n: int = 4) -> List[Dict]:
-    """Loads n random sermons from the binary sermon data file for style reference."""
-    try:
-        all_sermons = _load_sermons_from_binary(SERMON_DATA_FILE)
-    except Exception as e:
-        print(f"Error loading sermon data: {e}")
-        return []
-
-    if not all_sermons:
-        return []
-
-    selected = random.sample(all_sermons, min(n, len(all_sermons)))
-    examples = []
-
-    for data in selected:
-        if 'scripture' in data and 'text' in data:
-            examples.append({
-                'title': data.get('title', 'Onbekend'),
-                'scripture': data.get('scripture', ''),
-                'text': data.get('text', '')[:2000] + "..."
-            })
-
-    return examples
-
-
 def construct_critic_system_prompt() -> str:
     """Constructs the system prompt for the critic role."""
     return """
@@ -182,9 +117,11 @@ def construct_improver_system_prompt() -> str:
     """
 
 
-def critique_sermon(model, sermon: str, scripture: str) -> str:
+def critique_sermon(model, sermon: str, scripture: str,
+                    on_chunk: Optional[Callable[[str], None]] = None, echo: bool = True) -> str:
     """
     Generates a detailed critique of the sermon based on Sölle's methodology.
+    The text is passed to on_chunk as it arrives (see sermon_llm.generate_text).
     """
     prompt = f"""
     **KRITISCHE ANALYSE VAN EEN PREEK**
@@ -292,13 +229,14 @@ def critique_sermon(model, sermon: str, scripture: str) -> str:
     Schrijf alternatieve passages als voorbeeld.
     """
 
-    response = model.generate_content(prompt)
-    return response.text
+    return generate_text(model, prompt, on_chunk, echo)
 
 
-def improve_sermon(model, original_sermon: str, critique: str, scripture: str, bible_text: str, examples: List[Dict]) -> str:
+def improve_sermon(model, original_sermon: str, critique: str, scripture: str, bible_text: str, examples: List[Dict],
+                   on_chunk: Optional[Callable[[str], None]] = None, echo: bool = True) -> str:
     """
     Generates an improved version of the sermon based on the critique.
+    The text is passed to on_chunk as it arrives (see sermon_llm.generate_text).
     """
     examples_str = "\n\n".join([f"--- STIJLVOORBEELD (Sölle) ---\n{ex['text']}..." for ex in examples])
 
@@ -406,19 +344,30 @@ def improve_sermon(model, original_sermon: str, critique: str, scripture: str, b
     **SCHRIJF NU DE VERBETERDE PREEK:**
     """
 
-    response = model.generate_content(prompt)
-    return response.text
+    return generate_text(model, prompt, on_chunk, echo)
+
+
+def is_complete_sermon(sermon_path: str) -> bool:
+    """
+    False for a file left by a failed or interrupted run: empty, only the
+    header, or ending in the marker ChunkWriter adds when generation stops.
+    """
+    try:
+        with open(sermon_path, 'r', encoding='utf-8') as f:
+            lines = [line for line in f.read().splitlines() if line.strip()]
+    except OSError:
+        return False
+    body = [line for line in lines if not line.startswith(('# Preek over', '*Gegenereerd op'))]
+    return bool(body) and not lines[-1].startswith(INCOMPLETE_MARKER)
 
 
 def find_latest_sermon(output_dir: str = "output/preken") -> Optional[str]:
-    """Finds the most recent sermon file in the output directory."""
+    """Finds the most recent complete sermon file in the output directory."""
     pattern = os.path.join(output_dir, "*.md")
     files = glob.glob(pattern)
-    if not files:
-        return None
-    # Sort by modification time, newest first
+    # Sort by modification time, newest first; skip what a failed run left behind
     files.sort(key=os.path.getmtime, reverse=True)
-    return files[0]
+    return next((path for path in files if is_complete_sermon(path)), None)
 
 
 def extract_scripture_from_sermon(sermon_path: str) -> str:
@@ -463,46 +412,8 @@ def extract_bible_text_from_log(sermon_path: str) -> str:
     return "[Bijbeltekst niet beschikbaar]"
 
 
-def main():
-    """Main function to run the feedback loop."""
-    setup_client()
-
-    # 1. Find or specify the sermon to critique
-    print("=" * 60)
-    print("SÖLLE PREEK FEEDBACK SYSTEEM")
-    print("=" * 60)
-
-    # Check for command line argument
-    if len(sys.argv) > 1:
-        sermon_path = sys.argv[1]
-    else:
-        # Find the latest sermon
-        sermon_path = find_latest_sermon()
-        if not sermon_path:
-            print("Geen preken gevonden in output/preken/")
-            print("Geef het pad naar een preek op als argument:")
-            print("  python feedback_sermon.py path/to/sermon.md")
-            return
-
-    if not os.path.exists(sermon_path):
-        print(f"Bestand niet gevonden: {sermon_path}")
-        return
-
-    print(f"\nAnalyseren van: {sermon_path}")
-
-    # 2. Read the sermon
-    with open(sermon_path, 'r', encoding='utf-8') as f:
-        sermon_content = f.read()
-
-    # Extract metadata
-    scripture = extract_scripture_from_sermon(sermon_path)
-    bible_text = extract_bible_text_from_log(sermon_path)
-
-    print(f"Bijbelgedeelte: {scripture}")
-    print(f"Bijbeltekst beschikbaar: {'Ja' if '[' not in bible_text[:5] else 'Nee'}")
-
-    # 3. Initialize models
-    print("\nInitialiseren van taalmodellen...")
+def create_models():
+    """The critic and improver models, falling back to gemini-3-preview."""
     try:
         critic_model = genai.GenerativeModel(
             model_name=MODEL_NAME,
@@ -523,87 +434,239 @@ def main():
             model_name="gemini-3-preview",
             system_instruction=construct_improver_system_prompt()
         )
+    return critic_model, improver_model
 
-    # 4. Load example sermons for style reference
-    print("Laden van voorbeeldpreken voor stijlreferentie...")
-    examples = load_random_examples(n=4)
 
-    # 5. Generate critique
-    print("\n" + "=" * 60)
-    print("STAP 1: KRITISCHE ANALYSE")
-    print("=" * 60)
-    print("Genereren van kritiek...")
+def review_sermon(critic_model, improver_model, sermon_path: str, echo: bool = True,
+                  state: Optional[Dict] = None,
+                  checkpoint: Optional[Callable[[Dict], None]] = None) -> Tuple[str, str, str]:
+    """
+    Critiques the sermon in sermon_path and writes an improved version.
 
-    critique = critique_sermon(critic_model, sermon_content, scripture)
+    state holds the output of the stages done so far ('examples', 'critique',
+    'improved' and the output paths); stages found in it are not repeated,
+    and checkpoint(state) is called after every completed stage. With echo
+    the progress and the model output are printed.
+    Returns (critique_path, improved_path, log_path).
+    """
+    say = print if echo else (lambda *args, **kwargs: None)
+    state = {} if state is None else state
+    checkpoint = checkpoint or (lambda state: None)
 
-    print("\n--- KRITIEK ---\n")
-    print(critique)
+    # 1. Read the sermon
+    with open(sermon_path, 'r', encoding='utf-8') as f:
+        sermon_content = f.read()
 
-    # 6. Generate improved sermon
-    print("\n" + "=" * 60)
-    print("STAP 2: VERBETERDE VERSIE")
-    print("=" * 60)
-    print("Genereren van verbeterde preek...")
-
-    improved_sermon = improve_sermon(
-        improver_model,
-        sermon_content,
-        critique,
-        scripture,
-        bible_text,
-        examples
-    )
-
-    print("\n--- VERBETERDE PREEK ---\n")
-    print(improved_sermon)
-
-    # 7. Save outputs
-    output_dir = os.path.dirname(sermon_path)
-    base_name = os.path.basename(sermon_path).replace('.md', '')
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
-
-    # Save critique
-    critique_path = os.path.join(output_dir, f"{base_name}_critique_{timestamp}.md")
-    with open(critique_path, 'w', encoding='utf-8') as f:
-        f.write(f"# Kritiek op Preek over {scripture}\n")
-        f.write(f"*Gegenereerd op: {datetime.datetime.now().strftime('%d-%m-%Y %H:%M')}*\n\n")
-        f.write(f"**Origineel bestand:** {sermon_path}\n\n")
-        f.write("---\n\n")
-        f.write(critique)
-
-    # Save improved sermon
-    improved_path = os.path.join(output_dir, f"{base_name}_improved_{timestamp}.md")
-    with open(improved_path, 'w', encoding='utf-8') as f:
-        f.write(f"# Verbeterde Preek over {scripture}\n")
-        f.write(f"*Gegenereerd op: {datetime.datetime.now().strftime('%d-%m-%Y %H:%M')}*\n\n")
-        f.write(f"**Gebaseerd op:** {sermon_path}\n\n")
-        f.write("---\n\n")
-        f.write(improved_sermon)
-
-    # Save combined log
-    log_path = os.path.join(output_dir, f"{base_name}_feedback_{timestamp}.log")
-    with open(log_path, 'w', encoding='utf-8') as f:
-        f.write("=== FEEDBACK GENERATION LOG ===\n")
-        f.write(f"Timestamp: {datetime.datetime.now()}\n")
-        f.write(f"Original Sermon: {sermon_path}\n")
-        f.write(f"Scripture: {scripture}\n")
-        f.write(f"Model: {MODEL_NAME}\n\n")
-
-        f.write("--- ORIGINAL SERMON ---\n")
-        f.write(sermon_content + "\n\n")
-
-        f.write("--- BIBLE TEXT USED ---\n")
-        f.write(bible_text + "\n\n")
-
-        f.write("--- CRITIQUE ---\n")
-        f.write(critique + "\n\n")
-
-        f.write("--- IMPROVED SERMON ---\n")
-        f.write(improved_sermon + "\n\n")
-
-        f.write("--- EXAMPLES USED ---\n")
+    # Extract metadata
+    scripture = extract_scripture_from_sermon(sermon_path)
+    bible_text = extract_bible_text_from_log(sermon_path)
+
+    say(f"Bijbelgedeelte: {scripture}")
+    say(f"Bijbeltekst beschikbaar: {'Ja' if '[' not in bible_text[:5] else 'Nee'}")
+
+    # 2. Load example sermons for style reference
+    if "examples" not in state:
+        say("Laden van voorbeeldpreken voor stijlreferentie...")
+        state["examples"] = load_random_examples(n=4, excerpt_chars=EXAMPLE_CHARS, scripture=scripture,
+                                                  seed=os.getenv("SOLLE_SEED"))
+        checkpoint(state)
+    examples = state["examples"]
+
+    # 3. Open the output files; critique and improved sermon are appended as they arrive
+    if "log_path" not in state:
+        output_dir = os.path.dirname(sermon_path)
+        base_name = os.path.basename(sermon_path).replace('.md', '')
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+        state["critique_path"] = os.path.join(output_dir, f"{base_name}_critique_{timestamp}.md")
+        state["improved_path"] = os.path.join(output_dir, f"{base_name}_improved_{timestamp}.md")
+        state["log_path"] = os.path.join(output_dir, f"{base_name}_feedback_{timestamp}.log")
+        checkpoint(state)
+    critique_path, improved_path, log_path = state["critique_path"], state["improved_path"], state["log_path"]
+
+    with open(log_path, 'w', encoding='utf-8') as log_file:
+        log_file.write("=== FEEDBACK GENERATION LOG ===\n")
+        log_file.write(f"Timestamp: {datetime.datetime.now()}\n")
+        log_file.write(f"Original Sermon: {sermon_path}\n")
+        log_file.write(f"Scripture: {scripture}\n")
+        log_file.write(f"Model: {MODEL_NAME}\n\n")
+
+        log_file.write("--- ORIGINAL SERMON ---\n")
+        log_file.write(sermon_content + "\n\n")
+
+        log_file.write("--- BIBLE TEXT USED ---\n")
+        log_file.write(bible_text + "\n\n")
+        log_file.flush()
+
+        # 4. Generate critique
+        say("\n" + "=" * 60)
+        say("STAP 1: KRITISCHE ANALYSE")
+        say("=" * 60)
+        say("Genereren van kritiek...")
+        say("\n--- KRITIEK ---\n")
+
+        with open(critique_path, 'w', encoding='utf-8') as f:
+            f.write(f"# Kritiek op Preek over {scripture}\n")
+            f.write(f"*Gegenereerd op: {datetime.datetime.now().strftime('%d-%m-%Y %H:%M')}*\n\n")
+            f.write(f"**Origineel bestand:** {sermon_path}\n\n")
+            f.write("---\n\n")
+            log_file.write("--- CRITIQUE ---\n")
+            writer = ChunkWriter(f, log_file, echo=echo)
+            if "critique" in state:
+                writer(state["critique"])
+            else:
+                try:
+                    state["critique"] = critique_sermon(critic_model, sermon_content, scripture, on_chunk=writer,
+                                                        echo=echo)
+                except BaseException as e:
+                    writer.interrupted(e)
+                    say(f"\nGenereren afgebroken; de gedeeltelijke kritiek staat in: {critique_path}")
+                    raise
+        checkpoint(state)
+        say()
+        log_file.write("\n\n")
+
+        # 5. Generate improved sermon
+        say("\n" + "=" * 60)
+        say("STAP 2: VERBETERDE VERSIE")
+        say("=" * 60)
+        say("Genereren van verbeterde preek...")
+        say("\n--- VERBETERDE PREEK ---\n")
+
+        with open(improved_path, 'w', encoding='utf-8') as f:
+            f.write(f"# Verbeterde Preek over {scripture}\n")
+            f.write(f"*Gegenereerd op: {datetime.datetime.now().strftime('%d-%m-%Y %H:%M')}*\n\n")
+            f.write(f"**Gebaseerd op:** {sermon_path}\n\n")
+            f.write("---\n\n")
+            log_file.write("--- IMPROVED SERMON ---\n")
+            writer = ChunkWriter(f, log_file, echo=echo)
+            if "improved" in state:
+                writer(state["improved"])
+            else:
+                try:
+                    state["improved"] = improve_sermon(
+                        improver_model,
+                        sermon_content,
+                        state["critique"],
+                        scripture,
+                        bible_text,
+                        examples,
+                        on_chunk=writer,
+                        echo=echo
+                    )
+                except BaseException as e:
+                    writer.interrupted(e)
+                    say(f"\nGenereren afgebroken; de gedeeltelijke preek staat in: {improved_path}")
+                    raise
+        say()
+        log_file.write("\n\n")
+
+        log_file.write("--- EXAMPLES USED ---\n")
         for ex in examples:
-            f.write(f"- {ex['title']} ({ex['scripture']})\n")
+            log_file.write(f"- {ex['title']} ({ex['scripture']})\n")
+
+    checkpoint(state)
+    return critique_path, improved_path, log_path
+
+
+def review_sermon_checkpointed(critic_model, improver_model, checkpoint: Checkpoint,
+                               echo: bool = True) -> Tuple[str, str, str]:
+    """
+    review_sermon with every completed stage saved in checkpoint, continuing
+    from the stages already in it. The checkpoint is removed once the
+    improved sermon is complete and kept for --resume when the run fails.
+    """
+    try:
+        paths = review_sermon(critic_model, improver_model, checkpoint.input, echo=echo,
+                              state=checkpoint.state, checkpoint=checkpoint.save)
+    except BaseException:
+        if echo:
+            print(f"Tussenresultaten bewaard; verder gaan met: python 02__feedback_sermon.py --resume {checkpoint.path}")
+        raise
+    checkpoint.remove()
+    return paths
+
+
+def main():
+    """Main function to run the feedback loop."""
+    parser = argparse.ArgumentParser(description="Kritiek op en verbetering van een preekconcept")
+    parser.add_argument("sermons", nargs="*", metavar="PREEK",
+                        help="preekbestand(en); standaard de nieuwste preek in output/preken/")
+    parser.add_argument("--queue", action="store_true",
+                        help="via de takenwachtrij; zonder preken worden openstaande taken hervat")
+    parser.add_argument("--workers", type=int, default=QUEUE_WORKERS,
+                        help=f"preken tegelijk met --queue (standaard {QUEUE_WORKERS})")
+    parser.add_argument("--resume", nargs="?", const="", metavar="CHECKPOINT",
+                        help="ga verder met de laatst afgebroken feedback (of met dit checkpointbestand)")
+    args = parser.parse_args()
+    if args.resume is not None and (args.sermons or args.queue):
+        parser.error("--resume kan niet samen met preekbestanden of --queue (de wachtrij hervat zelf)")
+    if len(args.sermons) > 1 and not args.queue:
+        parser.error("geef één preek op, of gebruik --queue voor meerdere preken")
+
+    setup_client()
+
+    # 1. Find or specify the sermon to critique
+    print("=" * 60)
+    print("SÖLLE PREEK FEEDBACK SYSTEEM")
+    print("=" * 60)
+
+    if args.queue:
+        queue = JobQueue(JobQueue.default_path())
+        for sermon_path in args.sermons:
+            if not os.path.exists(sermon_path):
+                print(f"Bestand niet gevonden, overgeslagen: {sermon_path}")
+                continue
+            queue.submit("feedback", sermon_path)
+        critic_model, improver_model = create_models()
+
+        def handler(sermon_path: str, state: Dict, checkpoint) -> str:
+            return review_sermon(critic_model, improver_model, sermon_path, echo=False,
+                                 state=state, checkpoint=checkpoint)[1]
+
+        unfinished = run_jobs(queue, "feedback", handler, args.workers)
+        sys.exit(1 if unfinished else 0)
+
+    if args.resume is not None:
+        try:
+            checkpoint = Checkpoint.load(args.resume) if args.resume else Checkpoint.latest("feedback")
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"{args.resume} is geen bruikbaar checkpoint ({e})")
+        if checkpoint is None:
+            print("Geen afgebroken feedback gevonden om te hervatten.")
+            return
+        if checkpoint.kind != "feedback":
+            parser.error(f"{checkpoint.path} is geen checkpoint van feedback (maar van '{checkpoint.kind}')")
+        sermon_path = checkpoint.input
+        done = [stage for stage in FEEDBACK_STAGES if stage in checkpoint.state]
+        print(f"\nHervatten van: {sermon_path} (al klaar: {', '.join(done) or 'niets'})")
+    else:
+        # Check for command line argument
+        if args.sermons:
+            sermon_path = args.sermons[0]
+        else:
+            # Find the latest sermon
+            sermon_path = find_latest_sermon()
+            if not sermon_path:
+                print("Geen volledige preken gevonden in output/preken/")
+                print("Geef het pad naar een preek op als argument:")
+                print("  python feedback_sermon.py path/to/sermon.md")
+                return
+        checkpoint = None
+
+    if not os.path.exists(sermon_path):
+        print(f"Bestand niet gevonden: {sermon_path}")
+        return
+
+    if checkpoint is None:
+        print(f"\nAnalyseren van: {sermon_path}")
+        checkpoint = Checkpoint.new("feedback", sermon_path)
+
+    # 2. Initialize models
+    print("\nInitialiseren van taalmodellen...")
+    critic_model, improver_model = create_models()
+
+    # 3. Critique and improve; each completed stage is checkpointed
+    critique_path, improved_path, log_path = review_sermon_checkpointed(critic_model, improver_model, checkpoint)
 
     print("\n" + "=" * 60)
     print("RESULTATEN OPGESLAGEN")
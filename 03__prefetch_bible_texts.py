@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Bulk prefetch of Bible texts into the local chapter cache.
+
+Reads the readings for the coming weeks from lectionary files and/or the
+command line, collects the distinct chapters and fetches every chapter that
+is not fresh in the cache with a bounded worker pool. Requests to the same
+host are spaced out (--rate), and the next source is only tried when the
+first one fails, never raced against it. Afterwards generating sermons on
+these readings needs no network access for scripture (SOLLE_OFFLINE=1 works).
+
+    python 03__prefetch_bible_texts.py leesrooster.txt
+    python 03__prefetch_bible_texts.py leesrooster.txt --van 2026-11-29 --tot 2027-01-06
+    python 03__prefetch_bible_texts.py --ref "Jes 9:1-6; Luk 2:1-20" --ref "Ps 1-150"
+
+A lectionary file holds one reading per line, optionally preceded by an ISO
+date ('2026-12-24  Luk 2:1-20'); --van/--tot keep only the dated lines in
+that range. Empty lines and everything after '#' are ignored.
+"""
+
+import os
+import sys
+import time
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Tuple
+
+from dotenv import load_dotenv
+
+import bible_fetcher
+from bible_fetcher import BibleFetcher, chapter_cache
+from lectionary import read_lectionary
+
+load_dotenv()
+
+# Default spacing for the prefetch: two requests per second per site
+PREFETCH_RATE = 2.0
+PREFETCH_WORKERS = 4
+
+
+def chapters_for(references: List[str]) -> Tuple[List[Tuple[int, int]], List[str]]:
+    """Distinct (book_id, chapter) pairs of all passages in order, and the references that did not parse."""
+    chapters, unparsed = {}, []
+    for reference, (passages, _) in zip(references, BibleFetcher.parse_many(references)):
+        if not passages:
+            unparsed.append(reference)
+        for passage in passages:
+            for chapter in range(passage.chapter, passage.end_chapter + 1):
+                chapters[(passage.book_id, chapter)] = None
+    return list(chapters), unparsed
+
+
+def prefetch_chapter(book_id: int, chapter: int) -> str:
+    """
+    Makes sure the chapter is fresh in the cache.
+    Returns 'hit' (already fresh), 'opgehaald' (was missing), 'vernieuwd'
+    (was stale, now revalidated or refetched) or 'mislukt'.
+    """
+    cache = chapter_cache()
+    before = [cache.get(source, book_id, chapter) for source in BibleFetcher.SOURCES]
+    if any(entry and entry.age < bible_fetcher._cache_ttl() for entry in before):
+        return "hit"
+
+    started = time.time()
+    BibleFetcher._fetch_chapter(book_id, chapter)
+    # A stale entry handed back after a failed fetch keeps its old timestamp
+    after = [cache.get(source, book_id, chapter) for source in BibleFetcher.SOURCES]
+    if not any(entry and entry.checked_at >= started for entry in after):
+        return "mislukt"
+    return "vernieuwd" if any(before) else "opgehaald"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Haal bijbelhoofdstukken voor een leesrooster vooraf op in de cache")
+    parser.add_argument("files", nargs="*", help="leesroosterbestand(en): één lezing per regel, eventueel met datum")
+    parser.add_argument("--ref", action="append", default=[], help="losse verwijzing, bijv. 'Luk 2:1-20' (herhaalbaar)")
+    parser.add_argument("--van", type=datetime.date.fromisoformat, help="eerste datum (JJJJ-MM-DD)")
+    parser.add_argument("--tot", type=datetime.date.fromisoformat, help="laatste datum (JJJJ-MM-DD)")
+    parser.add_argument("--workers", type=int, default=PREFETCH_WORKERS,
+                        help=f"hoofdstukken tegelijk (standaard {PREFETCH_WORKERS})")
+    parser.add_argument("--rate", type=float,
+                        help=f"verzoeken per seconde per site (standaard SOLLE_HTTP_RATE of {PREFETCH_RATE:g})")
+    args = parser.parse_args()
+
+    if os.getenv("SOLLE_OFFLINE"):
+        print("SOLLE_OFFLINE staat aan; er kan niets opgehaald worden.")
+        sys.exit(1)
+    if chapter_cache() is None:
+        print("De bijbelcache is uitgeschakeld of niet beschikbaar; er valt niets voor te bereiden.")
+        sys.exit(1)
+    if args.rate is not None:
+        os.environ["SOLLE_HTTP_RATE"] = str(args.rate)
+    elif not os.getenv("SOLLE_HTTP_RATE"):
+        os.environ["SOLLE_HTTP_RATE"] = str(PREFETCH_RATE)
+    # No hedging: waiting for a rate slot would look like a slow source and
+    # start the next one as well, nearly doubling the requests
+    os.environ["SOLLE_BIBLE_HEDGE_DELAY"] = "inf"
+
+    references = read_lectionary(args.files, args.van, args.tot) + args.ref
+    chapters, unparsed = chapters_for(references)
+    for reference in unparsed:
+        print(f"Niet herkend, overgeslagen: '{reference}'")
+    if not chapters:
+        print("Geen hoofdstukken om op te halen.")
+        return
+
+    print(f"{len(references)} lezingen, {len(chapters)} verschillende hoofdstukken"
+          f" ({args.workers} tegelijk, {os.environ['SOLLE_HTTP_RATE']} verzoeken/s per site)\n")
+    counts = {"hit": 0, "opgehaald": 0, "vernieuwd": 0, "mislukt": 0}
+    failed = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(prefetch_chapter, *key): key for key in chapters}
+        for done, future in enumerate(as_completed(futures), 1):
+            book_id, chapter = futures[future]
+            try:
+                status = future.result()
+            except Exception as e:
+                status = "mislukt"
+                print(f"   Fout bij {BibleFetcher.book_name(book_id)} {chapter}: {e}")
+            counts[status] += 1
+            if status == "mislukt":
+                failed.append(f"{BibleFetcher.book_name(book_id)} {chapter}")
+            print(f"[{done}/{len(chapters)}] {BibleFetcher.book_name(book_id)} {chapter}: {status}")
+
+    print(f"\nKlaar in {time.perf_counter() - start:.1f} s: {counts['hit']} al in cache (hit),"
+          f" {counts['opgehaald']} opgehaald (miss), {counts['vernieuwd']} vernieuwd, {counts['mislukt']} mislukt.")
+    if failed:
+        print("Mislukt: " + ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: book-name lookup and bulk reference parsing.
+
+Compares the previous linear startswith scan over BOOK_MAPPING with the
+prebuilt BookIndex, on every mapping key, on normalised/prefix/misspelt
+names and on a synthetic planning sheet of references (many repeats, as in
+a real schedule). Exact names must resolve as before; the other rows show
+what each lookup makes of them.
+
+    python benchmarks/bench_books.py [reference_count]
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bible_fetcher
+from bible_fetcher import BibleFetcher, BookIndex
+
+SAMPLES = ["jo", "lu", "ma", "II Kor", "Eerste Petrus", "Ezechiël", "Johanes", "Mathheus",
+           "Filipenzen", "Openbaringen", "iii joh", "xyz"]
+
+
+def _reference_lookup(book_part: str):
+    """BibleFetcher._lookup_book before BookIndex."""
+    book_id = BibleFetcher.BOOK_MAPPING.get(book_part)
+    if not book_id:
+        book_id = BibleFetcher.BOOK_MAPPING.get(book_part.replace(" ", ""))
+        if not book_id:
+            for key, bid in BibleFetcher.BOOK_MAPPING.items():
+                if key.startswith(book_part):
+                    return bid
+    return book_id
+
+
+def _time(fn, repeat: int = 3) -> float:
+    """Best-of-repeat wall time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    for key, book_id in BibleFetcher.BOOK_MAPPING.items():
+        assert BibleFetcher.lookup_book(key).book_id == book_id, f"{key}: exact lookup changed"
+    print(f"{'naam':<16}{'oud':>6}  nieuw")
+    for name in SAMPLES:
+        match = BibleFetcher.lookup_book(name)
+        print(f"{name:<16}{_reference_lookup(name.lower()) or '-':>6}  {match.book_id or '-'}"
+              f" ({BibleFetcher._describe_match(match)})")
+
+    rng = random.Random(1)
+    names = list(BibleFetcher.BOOK_MAPPING) + ["johanes", "mathheus", "ii kor", "lu", "psalmn"]
+    plan = [f"{rng.choice(names)} {rng.randint(1, 20)}:{rng.randint(1, 10)}-{rng.randint(11, 30)}"
+            for _ in range(count // 10)] * 10
+    rng.shuffle(plan)
+
+    lookups = names * (count // len(names))
+    old = _time(lambda: [_reference_lookup(name) for name in lookups])
+    index = bible_fetcher.book_index()
+    new = _time(lambda: [index.lookup(name) for name in lookups])
+    print(f"\n{len(lookups):,} boeknamen: oud {old * 1000:.1f} ms, nieuw {new * 1000:.1f} ms ({old / new:.1f}x)")
+
+    # First lookup of names that are not exact keys: prefix scan versus index (fresh, no memo)
+    misses = [name for name in SAMPLES if name.lower() not in BibleFetcher.BOOK_MAPPING]
+    old = _time(lambda: [_reference_lookup(name.lower()) for name in misses])
+    new = _time(lambda: [BookIndex._lookup(index, name) for name in misses])
+    build = _time(lambda: BookIndex(BibleFetcher.BOOK_MAPPING))
+    print(f"{len(misses)} niet-exacte namen, eerste keer: oud {old * 1e6:.0f} µs, nieuw {new * 1e6:.0f} µs"
+          f" (index opbouwen: {build * 1000:.1f} ms, eenmalig)")
+
+    single = _time(lambda: [BibleFetcher.parse_passages(reference) for reference in plan], repeat=1)
+    batch = _time(lambda: BibleFetcher.parse_many(plan), repeat=1)
+    print(f"{len(plan):,} verwijzingen ({len(set(plan)):,} verschillend): parse_passages {single * 1000:.0f} ms,"
+          f" parse_many {batch * 1000:.0f} ms ({single / batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: plain zlib records vs. zlib with a shared preset dictionary.
+
+Rewrites a sermon corpus with each codec (and with fixed dictionary sizes) and
+reports file size, record bytes and per-record decode time. The dictionary is
+trained on the same corpus, so a leave-one-out section follows that
+compresses each sermon with a dictionary trained on all the others.
+
+    python benchmarks/bench_codec.py [path/to/sermons.dat]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import sermon_data
+from sermon_data import SermonReader, CODEC_ZLIB, CODEC_ZLIB_DICT, SERMON_DATA_FILE
+
+
+def _decode_time(path: str, repeat: int = 5) -> float:
+    """Best-of-repeat mean time to fully decode one record, in microseconds."""
+    best = float('inf')
+    with SermonReader(path, use_journal=False) as reader:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for i in range(len(reader)):
+                reader.read(i)
+            best = min(best, (time.perf_counter() - start) / len(reader))
+    return best * 1e6
+
+
+def _write_with_dictionary(path: str, sermons, zdict_size: int):
+    """write_sermons with the dictionary size forced instead of chosen."""
+    chooser = sermon_data._choose_dictionary
+    sermon_data._choose_dictionary = lambda s: sermon_data.train_dictionary(s)[-zdict_size:]
+    try:
+        sermon_data.write_sermons(path, sermons, CODEC_ZLIB_DICT)
+    finally:
+        sermon_data._choose_dictionary = chooser
+
+
+def _leave_one_out(sermons, zdict_size: int) -> int:
+    total = 0
+    for i, sermon in enumerate(sermons):
+        zdict = sermon_data.train_dictionary(sermons[:i] + sermons[i + 1:])[-zdict_size:]
+        total += len(sermon_data._encode_record(sermon, zdict))
+    return total
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else SERMON_DATA_FILE
+    with SermonReader(source) as reader:
+        sermons = list(reader)
+    print(f"Corpus: {source} ({len(sermons)} preken)\n")
+
+    variants = [("zlib", lambda p: sermon_data.write_sermons(p, sermons, CODEC_ZLIB)),
+                ("zdict (auto)", lambda p: sermon_data.write_sermons(p, sermons, CODEC_ZLIB_DICT))]
+    for size in (2048, 8192, 32768):
+        variants.append((f"zdict {size // 1024} KiB", lambda p, size=size: _write_with_dictionary(p, sermons, size)))
+
+    print(f"{'codec':<16}{'file':>10}{'records':>10}{'dict':>8}{'decode/rec':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, write in variants:
+            path = os.path.join(tmp, "sermons.dat")
+            write(path)
+            with SermonReader(path, use_journal=False) as reader:
+                records = sum(length for _, _, length, _ in reader._index)
+                zdict = reader._index[0][3] if len(reader) else None
+                assert list(reader) == sermons, f"{name}: round trip mismatch"
+            print(f"{name:<16}{os.path.getsize(path):>10,}{records:>10,}{len(zdict or b''):>8,}"
+                  f"{_decode_time(path):>10.1f} us")
+
+    if len(sermons) <= 500:
+        print("\nLeave-one-out record bytes (dictionary trained without the sermon itself):")
+        plain = sum(len(sermon_data._encode_record(s)) for s in sermons)
+        print(f"  zlib            {plain:>10,}")
+        for size in (2048, 8192, 32768):
+            loo = _leave_one_out(sermons, size)
+            print(f"  zdict {size // 1024:>2} KiB     {loo:>10,}  ({loo / plain:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark: verse extraction from saved chapter pages.
+
+Compares the previous selector cascade / nav-stripping code from
+BibleFetcher with bible_extract, per fixture in benchmarks/fixtures and per
+available parser backend (html.parser, lxml). Output of the new extractors
+is checked against the reference on the same parser, both for the full
+cascade and with the winning strategy remembered ('memo').
+
+The fixtures reproduce the page structure of debijbel.nl and
+bible.hispage.nl (menus, nested layout tables, scripts); the verse text is
+Psalm 23 in the public-domain Statenvertaling or generated filler.
+
+    python benchmarks/bench_extract.py [repeat]
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import importlib.util
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bs4 import BeautifulSoup
+
+import bible_extract
+from bible_extract import extract_debijbel, extract_hispage
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def _reference_debijbel(html: bytes, parser: str) -> list:
+    """The extraction in BibleFetcher._try_debijbel before bible_extract."""
+    soup = BeautifulSoup(html, parser)
+    verses_text = []
+    verse_elements = soup.find_all('span', class_=lambda x: x and 'verse' in x.lower()) or \
+        soup.find_all('div', class_=lambda x: x and 'verse' in x.lower()) or \
+        soup.find_all(class_=lambda x: x and 'tekst' in x.lower())
+    if verse_elements:
+        for elem in verse_elements:
+            text = elem.get_text(" ", strip=True)
+            if text and len(text) > 5:
+                verses_text.append(text)
+    if not verses_text:
+        main_content = soup.find('main') or soup.find('article') or soup.find('div', class_='content')
+        if main_content:
+            for p in main_content.find_all(['p', 'div']):
+                text = p.get_text(" ", strip=True)
+                if text and len(text) > 10 and not any(nav in text.lower() for nav in
+                        ['genesis', 'exodus', 'leviticus', 'king james', 'statenvertaling',
+                         'lutherse', 'copyright', 'bijbelgenootschap', 'cookie', 'privacy']):
+                    verses_text.append(text)
+    return verses_text
+
+
+def _reference_hispage(html: bytes, parser: str) -> list:
+    """The extraction in BibleFetcher._try_hispage before bible_extract."""
+    soup = BeautifulSoup(html, parser)
+    for element in soup.find_all(['script', 'style', 'nav', 'header', 'footer', 'select', 'option', 'button']):
+        element.decompose()
+    for element in soup.find_all(['div', 'span', 'td', 'a']):
+        text = element.get_text(strip=True).lower()
+        if any(nav in text for nav in ['genesis', 'exodus', 'leviticus', 'numbers', 'deuteronomy',
+                'matthew', 'mark', 'luke', 'john', 'king james', 'statenvertaling',
+                'lutherse vertaling', 'leidse vertaling', 'nbg', 'het boek', 'basisbijbel',
+                'new international', 'louis segond', 'vulgate', 'and or']):
+            if len(text) < 100:
+                element.decompose()
+    verses = []
+    for row in soup.find_all('tr'):
+        for cell in row.find_all('td'):
+            text = cell.get_text(separator=' ', strip=True)
+            if text and len(text) > 20:
+                if re.match(r'^\d+\s+\w', text):
+                    verses.append(text)
+                elif any(dutch in text.lower() for dutch in ['heere', 'god', 'jezus', 'christus', 'hij', 'zij', 'mij', 'zijn']):
+                    verses.append(text)
+    seen = set()
+    unique_verses = []
+    for v in verses:
+        if v[:50] not in seen:
+            seen.add(v[:50])
+            unique_verses.append(v)
+    return unique_verses
+
+
+def _time(fn, repeat: int) -> float:
+    """Best-of-repeat wall time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    parsers = ["html.parser"] + (["lxml"] if importlib.util.find_spec("lxml") else [])
+    if len(parsers) == 1:
+        print("(lxml niet geïnstalleerd: alleen html.parser)")
+
+    saved = os.environ.get("SOLLE_HTML_PARSER")
+    baseline = {}
+    print(f"{'fixture':<24}{'KB':>5}{'verzen':>8}  {'parser':<12}{'strategie':<12}"
+          f"{'oud':>9}{'nieuw':>9}{'memo':>9}{'winst':>8}")
+    try:
+        for path in sorted(glob.glob(os.path.join(FIXTURES, "*.html"))):
+            name = os.path.basename(path)
+            with open(path, 'rb') as f:
+                html = f.read()
+            if name.startswith("debijbel"):
+                reference, extract = _reference_debijbel, extract_debijbel
+            else:
+                reference, extract = _reference_hispage, extract_hispage
+            for parser in parsers:
+                os.environ["SOLLE_HTML_PARSER"] = parser
+                expected = reference(html, parser)
+                result = extract(html)
+                assert result.verses == expected, f"{name} ({parser}): output differs from the reference"
+                if extract is extract_debijbel:
+                    memo = lambda: extract(html, prefer=result.strategy)
+                    assert memo() == result, f"{name} ({parser}): remembered strategy gives other output"
+                else:
+                    memo = lambda: extract(html)
+                old = _time(lambda: reference(html, parser), repeat)
+                new = _time(lambda: extract(html), repeat)
+                remembered = _time(memo, repeat)
+                baseline.setdefault(name, old)
+                print(f"{name:<24}{len(html) / 1024:>5.0f}{len(result.verses):>8}  {parser:<12}{result.strategy:<12}"
+                      f"{old * 1000:>7.1f}ms{new * 1000:>7.1f}ms{remembered * 1000:>7.1f}ms"
+                      f"{baseline[name] / remembered:>7.1f}x")
+    finally:
+        if saved is None:
+            os.environ.pop("SOLLE_HTML_PARSER", None)
+        else:
+            os.environ["SOLLE_HTML_PARSER"] = saved
+    print(f"\nStandaard parser: {bible_extract.HTML_PARSER}; 'winst' is t.o.v. de oude code met html.parser.")
+
+
+if __name__ == "__main__":
+    main()
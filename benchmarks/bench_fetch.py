@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark and regression check: fetch plus extraction per source, offline.
+
+Replays recorded source responses (benchmarks/fixtures/http, see
+bible_fetcher.HttpRecordings) through BibleFetcher's debijbel and hispage
+attempts, reports latency and throughput, and compares every extracted
+chapter with the snapshot in expected.json, so that a change in extraction
+shows up as a failure. --stub runs the same chapters over HTTP against a
+local stub server serving the saved pages, to include the request itself.
+
+    python benchmarks/bench_fetch.py [--repeat N] [--stub]
+    python benchmarks/bench_fetch.py record           # from the stub server
+    python benchmarks/bench_fetch.py record --live    # from the real sites (network)
+
+record writes the recordings and a fresh expected.json; review its diff.
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["SOLLE_NO_CACHE"] = "1"
+for variable in ("SOLLE_HTTP_RECORD", "SOLLE_HTTP_REPLAY"):
+    os.environ.pop(variable, None)
+
+from bible_fetcher import BibleFetcher, split_verses
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECORDINGS = os.path.join(FIXTURES, "http")
+EXPECTED = os.path.join(RECORDINGS, "expected.json")
+
+# The chapters of the saved pages in benchmarks/fixtures (hispage_<book>_<chapter>.html)
+CHAPTERS = sorted({tuple(map(int, m.groups())) for m in
+                   (re.match(r"hispage_(\d+)_(\d+)\.html$", name) for name in os.listdir(FIXTURES)) if m})
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves the saved pages at the paths of the real sites."""
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        if parts.path.startswith("/bijbel/HSV/"):
+            name = f"debijbel_{parts.path.rsplit('/', 1)[1]}.html"
+        else:
+            name = f"hispage_{query.get('book', ['?'])[0]}_{query.get('chapter', ['?'])[0]}.html"
+        path = os.path.join(FIXTURES, name)
+        if not os.path.exists(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"' + hashlib.sha1(body).hexdigest()[:16] + '"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def stub_server():
+    """Points the source URLs at a local FixtureHandler for the duration."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    urls = BibleFetcher.DEBIJBEL_URL, BibleFetcher.HISPAGE_URL
+    BibleFetcher.DEBIJBEL_URL = re.sub(r"^https?://[^/]+", base, urls[0])
+    BibleFetcher.HISPAGE_URL = re.sub(r"^https?://[^/]+", base, urls[1])
+    try:
+        yield
+    finally:
+        BibleFetcher.DEBIJBEL_URL, BibleFetcher.HISPAGE_URL = urls
+        server.shutdown()
+
+
+def fetch(source: str, book_id: int, chapter: int) -> str:
+    with contextlib.redirect_stdout(io.StringIO()):
+        text, _ = BibleFetcher._try_source(source, book_id, str(chapter), None)
+    return text
+
+
+def summary(text: str) -> dict:
+    return {"verses": len(split_verses(text)), "chars": len(text),
+            "sha1": hashlib.sha1(text.encode("utf-8")).hexdigest()}
+
+
+def record(live: bool):
+    os.environ["SOLLE_HTTP_RECORD"] = RECORDINGS
+    expected = {}
+    with contextlib.nullcontext() if live else stub_server():
+        for book_id, chapter in CHAPTERS:
+            for source in BibleFetcher.SOURCES:
+                text = fetch(source, book_id, chapter)
+                expected[f"{source} {book_id}:{chapter}"] = summary(text)
+                print(f"{source:<10}{book_id:>3}:{chapter:<4} {'FOUT ' + text if text.startswith('[') else 'opgenomen'}")
+    with open(EXPECTED, "w", encoding="utf-8") as f:
+        json.dump(expected, f, indent=1, sort_keys=True)
+    print(f"\nOpnames en {os.path.basename(EXPECTED)} geschreven naar {RECORDINGS}")
+
+
+def replay(repeat: int, over_stub: bool) -> int:
+    with open(EXPECTED, "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    if over_stub:
+        context, mode = stub_server(), "stub (HTTP op localhost)"
+    else:
+        os.environ["SOLLE_HTTP_REPLAY"] = RECORDINGS
+        context, mode = contextlib.nullcontext(), "replay"
+
+    failures = 0
+    total, count = 0.0, 0
+    print(f"Modus: {mode}, beste van {repeat}\n")
+    print(f"{'bron':<10}{'hoofdstuk':<11}{'verzen':>7}{'ms':>9}  controle")
+    with context:
+        for book_id, chapter in CHAPTERS:
+            for source in BibleFetcher.SOURCES:
+                key = f"{source} {book_id}:{chapter}"
+                best = float("inf")
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    text = fetch(source, book_id, chapter)
+                    best = min(best, time.perf_counter() - start)
+                total += best
+                count += 1
+                result = summary(text)
+                ok = result == expected.get(key)
+                failures += not ok
+                print(f"{source:<10}{f'{book_id}:{chapter}':<11}{result['verses']:>7}{best * 1000:>9.2f}  "
+                      f"{'ok' if ok else 'AFWIJKING t.o.v. ' + json.dumps(expected.get(key))}")
+    print(f"\n{count} hoofdstukken in {total * 1000:.1f} ms: {count / total:,.0f} hoofdstukken/s")
+    if failures:
+        print(f"{failures} afwijking(en): extractie gewijzigd? Controleer, en neem zo nodig opnieuw op met 'record'.")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ophalen + extractie per bron, offline")
+    parser.add_argument("mode", nargs="?", choices=("replay", "record"), default="replay")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stub", action="store_true", help="via een lokale HTTP-server in plaats van replay")
+    parser.add_argument("--live", action="store_true", help="record: van de echte sites")
+    args = parser.parse_args()
+    if args.mode == "record":
+        record(args.live)
+    else:
+        sys.exit(replay(args.repeat, args.stub))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SermonReader.read_many scaling with threads and processes.
+
+Builds a synthetic corpus by repeating the shipped sermons (with unique ids)
+until it holds the requested number of records, then decodes all of them
+serially and with growing worker counts. Output is checked against the
+serial result.
+
+    python benchmarks/bench_parallel.py [record_count] [max_workers]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sermon_data import SermonReader, SERMON_DATA_FILE, write_sermons
+
+
+def _time(fn, repeat: int = 3) -> float:
+    """Best-of-repeat wall time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1) * 2
+
+    with SermonReader(SERMON_DATA_FILE) as reader:
+        base = list(reader)
+    sermons = [dict(base[i % len(base)], id=f"{i:06d}") for i in range(count)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sermons.dat")
+        write_sermons(path, sermons)
+        with SermonReader(path, use_journal=False) as reader:
+            expected = reader.read_many(workers=1)
+            serial = _time(lambda: reader.read_many(workers=1))
+            print(f"{count:,} records, {os.cpu_count()} CPUs")
+            print(f"serial        {serial:7.2f} s   {count / serial:9,.0f} rec/s")
+
+            workers = 2
+            while workers <= max_workers:
+                for name, processes in (("threads", False), ("processes", True)):
+                    assert reader.read_many(workers=workers, processes=processes) == expected, \
+                        f"{name}: output mismatch"
+                    t = _time(lambda: reader.read_many(workers=workers, processes=processes))
+                    print(f"{name:<9} {workers:>3} {t:7.2f} s   {count / t:9,.0f} rec/s  ({serial / t:4.2f}x)")
+                workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-byte generator XOR vs. the vectorized codec in sermon_data.
+
+Checks that both produce identical bytes and reports timings for the NumPy
+path (when installed) and the big-int fallback.
+
+    python benchmarks/bench_xor.py [size_in_bytes ...]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import sermon_data
+from sermon_data import SERMON_XOR_KEY, xor_bytes, xor_inplace
+
+
+def _xor_bytes_reference(data: bytes, key: bytes) -> bytes:
+    """The original implementation from the generation scripts."""
+    key_len = len(key)
+    return bytes(b ^ key[i % key_len] for i, b in enumerate(data))
+
+
+def _time(fn, repeat: int) -> float:
+    """Best-of-repeat wall time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(size: int, repeat: int = 5):
+    data = os.urandom(size)
+    expected = _xor_bytes_reference(data, SERMON_XOR_KEY)
+
+    ref = _time(lambda: _xor_bytes_reference(data, SERMON_XOR_KEY), repeat)
+    print(f"\n{size:>12,} bytes   reference     {ref * 1000:9.2f} ms")
+
+    backends = [("bigint", None)]
+    if sermon_data.np is not None:
+        backends.insert(0, ("numpy", sermon_data.np))
+
+    saved = sermon_data.np
+    try:
+        for name, backend in backends:
+            sermon_data.np = backend
+            assert xor_bytes(data) == expected, f"{name}: output mismatch"
+            buf = bytearray(data)
+            xor_inplace(buf)
+            assert buf == expected, f"{name}: in-place output mismatch"
+            # Chunked processing with a key phase must match as well
+            split = size // 3
+            assert xor_bytes(data[:split]) + xor_bytes(data[split:], phase=split) == expected
+
+            t = _time(lambda: xor_bytes(data), repeat)
+            buf = bytearray(data)
+            t_inplace = _time(lambda: xor_inplace(buf), repeat)
+            print(f"{'':>12}         {name:<13} {t * 1000:9.2f} ms  ({ref / t:6.0f}x)"
+                  f"   in-place {t_inplace * 1000:9.2f} ms  ({ref / t_inplace:6.0f}x)")
+    finally:
+        sermon_data.np = saved
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [2_000, 50_000, 1_000_000, 8_000_000]
+    print("XOR codec benchmark (identical output verified for every backend)")
+    for size in sizes:
+        bench(size)
+
+
+if __name__ == "__main__":
+    main()
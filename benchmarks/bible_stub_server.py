@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Harness: BibleFetcher against a local stub of debijbel.nl and hispage.nl.
+
+Serves canned chapter pages from a ThreadingHTTPServer on localhost, points
+BibleFetcher's source URLs at it and runs a few scenarios (slow source, dead
+source, repeated failures) to check which source wins, how long fetch_text
+takes, that transient errors are retried on the shared session, and that the
+circuit breaker skips a source after repeated failures. When aiohttp is
+installed the same is checked for AsyncBibleFetcher, plus cancellation. No
+request leaves the machine; the chapter cache is disabled.
+
+    python benchmarks/bible_stub_server.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import importlib.util
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["SOLLE_NO_CACHE"] = "1"
+os.environ.setdefault("SOLLE_HTTP_BACKOFF", "0.1")
+
+import bible_fetcher
+from bible_fetcher import BibleFetcher, CircuitBreaker
+
+PAGES = {
+    "debijbel": b'<html><main><span class="verse">1 De HEERE is mijn Herder, mij zal niets ontbreken.</span>'
+                b'<span class="verse">2 Hij doet mij neerliggen in grazige weiden.</span></main></html>',
+    "hispage": b'<html><table><tr><td>1 De HEERE is mijn Herder, mij zal niets ontbreken (hispage).</td></tr>'
+               b'</table></html>',
+}
+
+
+class StubState:
+    """
+    Per-source behaviour: response delay in seconds, HTTP status (None: drop
+    the connection) and a number of upcoming requests that get a 503 first.
+    """
+
+    def __init__(self):
+        self.delay = {"debijbel": 0.0, "hispage": 0.0}
+        self.status = {"debijbel": 200, "hispage": 200}
+        self.fail_next = {"debijbel": 0, "hispage": 0}
+        self.hits = {"debijbel": 0, "hispage": 0}
+        self.lock = threading.Lock()
+
+
+STATE = StubState()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        source = "debijbel" if self.path.startswith("/debijbel/") else "hispage"
+        with STATE.lock:
+            STATE.hits[source] += 1
+            transient = STATE.fail_next[source] > 0
+            STATE.fail_next[source] -= transient
+        time.sleep(STATE.delay[source])
+        status = 503 if transient else STATE.status[source]
+        if status is None:
+            self.close_connection = True
+            self.connection.close()
+            return
+        body = PAGES[source] if status == 200 else b"error"
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def scenario(name: str, debijbel=(0.0, 200), hispage=(0.0, 200), expect: str = "debijbel", runs: int = 1):
+    STATE.delay["debijbel"], STATE.status["debijbel"] = debijbel
+    STATE.delay["hispage"], STATE.status["hispage"] = hispage
+    for run in range(runs):
+        start = time.perf_counter()
+        text, log = BibleFetcher.fetch_text("Psalm 23:1-2")
+        elapsed = time.perf_counter() - start
+        winner = "hispage" if "(hispage)" in text else "debijbel" if not text.startswith("[") else "geen"
+        skipped = [s for s in BibleFetcher.SOURCES if f"{s} overgeslagen" in log]
+        print(f"{name:<40} run {run + 1}  {elapsed:6.2f} s  winnaar: {winner:<9}"
+              f"{'  overgeslagen: ' + ', '.join(skipped) if skipped else ''}")
+    assert winner == expect, f"{name}: expected {expect}, got {winner}\n{log}"
+    return elapsed
+
+
+async def async_scenarios():
+    from bible_fetcher_async import AsyncBibleFetcher
+
+    bible_fetcher._breakers.clear()
+    hedge = bible_fetcher._hedge_delay()
+    async with AsyncBibleFetcher() as fetcher:
+        for name, debijbel, expect in (("async: beide snel", (0.0, 200), "debijbel"),
+                                       ("async: debijbel traag (4 s)", (4.0, 200), "hispage"),
+                                       ("async: debijbel HTTP 503", (0.0, 503), "hispage")):
+            STATE.delay["debijbel"], STATE.status["debijbel"] = debijbel
+            STATE.delay["hispage"], STATE.status["hispage"] = (0.0, 200)
+            bible_fetcher._breakers.clear()
+            start = time.perf_counter()
+            text, log = await fetcher.fetch_text("Psalm 23:1-2")
+            elapsed = time.perf_counter() - start
+            winner = "hispage" if "(hispage)" in text else "debijbel" if not text.startswith("[") else "geen"
+            print(f"{name:<40} run 1  {elapsed:6.2f} s  winnaar: {winner}")
+            assert winner == expect, f"{name}: expected {expect}, got {winner}\n{log}"
+            assert elapsed < hedge + 1.5
+
+        # Two chapters are fetched concurrently: about one response time, not two
+        STATE.delay["debijbel"], STATE.status["debijbel"] = (0.5, 200)
+        start = time.perf_counter()
+        await fetcher.fetch_text("Psalm 23:1; Psalm 24:1")
+        elapsed = time.perf_counter() - start
+        print(f"{'async: twee hoofdstukken tegelijk':<40} run 1  {elapsed:6.2f} s")
+        assert elapsed < 0.9, "chapters were not fetched concurrently"
+
+        # Cancelling the caller cancels the requests and leaves a half-open breaker usable
+        STATE.delay["debijbel"], STATE.delay["hispage"] = (3.0, 3.0)
+        bible_fetcher._breakers["debijbel"] = breaker = CircuitBreaker(failures=1, cooldown=0.0)
+        breaker.record(False)
+        task = asyncio.ensure_future(fetcher.fetch_text("Psalm 23:1-2"))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        leftover = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        print(f"{'async: geannuleerd':<40} run 1  open taken: {len(leftover)}")
+        assert not leftover, "cancelled fetch left tasks running"
+        assert breaker.allow(), "cancelled trial request kept the breaker half-open"
+    STATE.delay["debijbel"], STATE.delay["hispage"] = (0.0, 0.0)
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    BibleFetcher.DEBIJBEL_URL = base + "/debijbel/{abbrev}.{chapter}"
+    BibleFetcher.HISPAGE_URL = base + "/hispage?book={book_id}&chapter={chapter}"
+
+    hedge = bible_fetcher._hedge_delay()
+    attempts = 1 + int(os.getenv("SOLLE_HTTP_RETRIES") or bible_fetcher.HTTP_RETRIES)
+    print(f"Stub op {base}, hedge delay {hedge:g} s, {attempts} pogingen per bron,"
+          f" breaker {bible_fetcher.BREAKER_FAILURES} fouten\n")
+
+    scenario("beide snel", expect="debijbel")
+    t = scenario("debijbel traag (4 s)", debijbel=(4.0, 200), expect="hispage")
+    assert t < hedge + 1.5, "hedged request did not cut the wait"
+    t = scenario("debijbel HTTP 503", debijbel=(0.0, 503), expect="hispage")
+    assert t < hedge + 0.5, "a failed source should start the next one without waiting for it"
+    scenario("debijbel verbinding verbroken", debijbel=(0.0, None), expect="hispage")
+
+    # Transient 503s are retried on the session and never reach the race
+    bible_fetcher._breakers.clear()
+    before = STATE.hits["debijbel"]
+    STATE.fail_next["debijbel"] = attempts - 1
+    scenario("debijbel 503, daarna hersteld (retry)", expect="debijbel")
+    assert STATE.hits["debijbel"] - before == attempts
+
+    # Fresh breakers: three failures open debijbel's, after which it is skipped
+    bible_fetcher._breakers.clear()
+    before = STATE.hits["debijbel"]
+    scenario("debijbel faalt herhaald", debijbel=(0.0, 503), expect="hispage", runs=5)
+    assert STATE.hits["debijbel"] - before == bible_fetcher.BREAKER_FAILURES * attempts, "breaker did not open"
+
+    # After the cool-down a single trial request closes the breaker again
+    bible_fetcher._breakers["debijbel"] = breaker = CircuitBreaker(failures=1, cooldown=0.2)
+    breaker.record(False)
+    time.sleep(0.3)
+    scenario("debijbel hersteld na cool-down", expect="debijbel")
+    assert not breaker.is_open
+
+    bible_fetcher._breakers.clear()
+    scenario("beide bronnen onbereikbaar", debijbel=(0.0, 500), hispage=(0.0, 500), expect="geen")
+
+    if importlib.util.find_spec("aiohttp"):
+        print()
+        asyncio.run(async_scenarios())
+    else:
+        print("\n(aiohttp niet geïnstalleerd: async scenario's overgeslagen)")
+    server.shutdown()
+    print("\nAlle scenario's geslaagd.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Verse extraction from the HTML of debijbel.nl and bible.hispage.nl.
+
+Both extractors walk the parsed document once and match classes and
+navigation keywords with precompiled regular expressions, instead of one
+find_all pass per selector and a get_text() over every element's subtree.
+They take the raw response body and return the verse texts in page order,
+so they can be benchmarked against saved pages (benchmarks/bench_extract.py),
+together with the strategy that found them and a fingerprint of the page
+layout around them, so that a fetcher can try the strategy that worked last
+time first and notice when a site changes.
+
+When lxml is installed (listed as a dependency) the pages are parsed and
+walked with lxml.html directly, 5-20x faster than before on the fixtures.
+Without it BeautifulSoup with the standard library's html.parser is used,
+which is not measurably faster than the old code: html.parser itself
+dominates. Both paths return the same texts. SOLLE_HTML_PARSER=html.parser
+forces the fallback.
+"""
+
+import os
+import re
+import hashlib
+from typing import List, NamedTuple, Optional, Tuple
+
+from bs4 import BeautifulSoup, CData, NavigableString
+
+try:
+    import lxml.html as lxml_html
+except ImportError:  # optional: BeautifulSoup with html.parser is used instead
+    lxml_html = None
+
+HTML_PARSER = "lxml" if lxml_html is not None else "html.parser"
+
+_VERSE_CLASS = re.compile(r"verse", re.IGNORECASE)
+_TEKST_CLASS = re.compile(r"tekst", re.IGNORECASE)
+
+# Paragraphs in debijbel's main-content fallback that are navigation, not text
+_DEBIJBEL_NAV = re.compile(
+    "genesis|exodus|leviticus|king james|statenvertaling|lutherse|copyright|bijbelgenootschap|cookie|privacy"
+)
+# Short hispage elements (book and version menus) that are removed before extraction
+_HISPAGE_NAV = re.compile(
+    "genesis|exodus|leviticus|numbers|deuteronomy|matthew|mark|luke|john|king james|statenvertaling"
+    "|lutherse vertaling|leidse vertaling|nbg|het boek|basisbijbel|new international|louis segond"
+    "|vulgate|and or"
+)
+_HISPAGE_NAV_TAGS = frozenset(("div", "span", "td", "a"))
+_HISPAGE_NAV_MAX = 100
+_HISPAGE_DROP_TAGS = ["script", "style", "nav", "header", "footer", "select", "option", "button"]
+_VERSE_START = re.compile(r"^\d+\s+\w")
+_DUTCH_WORDS = re.compile("heere|god|jezus|christus|hij|zij|mij|zijn")
+
+
+# Elements whose strings BeautifulSoup's get_text() leaves out
+_NO_TEXT_TAGS = frozenset(("script", "style", "template"))
+
+
+def html_parser() -> str:
+    """'lxml' or 'html.parser'; read at call time so values from .env are honoured."""
+    parser = os.getenv("SOLLE_HTML_PARSER") or HTML_PARSER
+    return parser if parser != "lxml" or lxml_html is not None else "html.parser"
+
+
+def parse_html(html: bytes) -> BeautifulSoup:
+    return BeautifulSoup(html, "html.parser")
+
+
+def _lxml_strings(el, skip=frozenset()):
+    """Text pieces below el in document order, as BeautifulSoup's strings; subtrees in skip are left out."""
+    if el.tag in _NO_TEXT_TAGS:
+        return
+    if el.text:
+        yield el.text
+    for child in el:
+        if isinstance(child.tag, str) and child not in skip:
+            yield from _lxml_strings(child, skip)
+        if child.tail:
+            yield child.tail
+
+
+def _lxml_text(el, separator: str = "", skip=frozenset()) -> str:
+    """el's text like get_text(separator, strip=True)."""
+    return separator.join(piece for piece in (s.strip() for s in _lxml_strings(el, skip)) if piece)
+
+
+def _class_string(tag) -> str:
+    classes = tag.get("class")
+    return " ".join(classes) if isinstance(classes, list) else (classes or "")
+
+
+class Extraction(NamedTuple):
+    """
+    Verses found on a page, the strategy that found them and the layout
+    fingerprint of their container; failed lists the strategies tried first
+    that found nothing.
+    """
+    verses: List[str]
+    strategy: Optional[str]
+    fingerprint: Optional[str]
+    failed: Tuple[str, ...] = ()
+
+
+def _fingerprint(path: List[str]) -> str:
+    """
+    Short hash of an element's ancestor path (tag names and classes, digits
+    removed so 'v23' and 'v24' match). html/body are left out because
+    html.parser and lxml do not agree on adding them.
+    """
+    steps = [step for step in path if step.split(".", 1)[0] not in ("html", "body", "[document]")]
+    return hashlib.sha1(re.sub(r"\d+", "", ">".join(steps)).encode("utf-8")).hexdigest()[:12]
+
+
+def _soup_fingerprint(tag) -> str:
+    path = [tag] + list(tag.parents)
+    return _fingerprint([".".join([t.name] + sorted(_class_string(t).split())) for t in reversed(path)])
+
+
+def _lxml_fingerprint(el) -> str:
+    path = [el] + list(el.iterancestors())
+    return _fingerprint([".".join([e.tag] + sorted((e.get("class") or "").split())) for e in reversed(path)])
+
+
+# debijbel.nl selector cascade, in order: spans with a 'verse' class, divs
+# with a 'verse' class, anything with a 'tekst' class, the paragraphs of
+# <main>/<article>/div.content
+DEBIJBEL_STRATEGIES = ("verse-span", "verse-div", "tekst", "main")
+
+
+def _debijbel_match(strategy: str, name: str, classes: str) -> bool:
+    if strategy == "verse-span":
+        return name == "span" and bool(_VERSE_CLASS.search(classes))
+    if strategy == "verse-div":
+        return name == "div" and bool(_VERSE_CLASS.search(classes))
+    return bool(_TEKST_CLASS.search(classes))
+
+
+def extract_debijbel(html: bytes, prefer: Optional[str] = None) -> Extraction:
+    """
+    Verse texts from a debijbel.nl chapter page.
+
+    The first strategy of DEBIJBEL_STRATEGIES that yields verses wins. The
+    prefer'd strategy (the one that worked last time) is tried on its own
+    first; only when it finds nothing are the candidates of all strategies
+    collected, in a single walk over the document.
+    """
+    if html_parser() == "lxml":
+        doc = lxml_html.document_fromstring(html)
+        single, collect, verses_of, fingerprint = (
+            _lxml_debijbel_single, _lxml_debijbel_collect, _lxml_debijbel_verses, _lxml_fingerprint)
+    else:
+        doc = parse_html(html)
+        single, collect, verses_of, fingerprint = (
+            _soup_debijbel_single, _soup_debijbel_collect, _soup_debijbel_verses, _soup_fingerprint)
+
+    failed = []
+    # 'main' is only a last resort: tried first it would also match pages
+    # where a more specific strategy finds the verses
+    if prefer in DEBIJBEL_STRATEGIES[:-1]:
+        verses, first = verses_of(prefer, single(doc, prefer))
+        if verses:
+            return Extraction(verses, prefer, fingerprint(first))
+        failed.append(prefer)
+
+    candidates = collect(doc)
+    for strategy in DEBIJBEL_STRATEGIES:
+        if strategy in failed:
+            continue
+        verses, first = verses_of(strategy, candidates[strategy])
+        if verses:
+            return Extraction(verses, strategy, fingerprint(first), tuple(failed))
+        failed.append(strategy)
+    return Extraction([], None, None, tuple(failed))
+
+
+def _soup_debijbel_single(soup, strategy: str):
+    if strategy == "main":
+        return soup.find("main") or soup.find("article") or soup.find("div", class_="content")
+    return [tag for tag in soup.find_all(None if strategy == "tekst" else strategy.split("-")[1])
+            if _debijbel_match(strategy, tag.name, _class_string(tag))]
+
+
+def _soup_debijbel_collect(soup) -> dict:
+    candidates = {strategy: [] for strategy in DEBIJBEL_STRATEGIES[:3]}
+    main = article = content = None
+    for tag in soup.find_all(True):
+        classes = _class_string(tag)
+        if classes:
+            for strategy in DEBIJBEL_STRATEGIES[:3]:
+                if _debijbel_match(strategy, tag.name, classes):
+                    candidates[strategy].append(tag)
+        if tag.name == "main":
+            main = main or tag
+        elif tag.name == "article":
+            article = article or tag
+        elif tag.name == "div" and content is None and "content" in (tag.get("class") or ()):
+            content = tag
+    candidates["main"] = main or article or content
+    return candidates
+
+
+def _soup_debijbel_verses(strategy: str, candidates):
+    """(verse texts, first element they came from)"""
+    verses, first = [], None
+    if strategy == "main":
+        if not candidates:
+            return verses, first
+        for p in candidates.find_all(["p", "div"]):
+            text = p.get_text(" ", strip=True)
+            if text and len(text) > 10 and not _DEBIJBEL_NAV.search(text.lower()):
+                verses.append(text)
+                first = first or p
+        return verses, first
+    for elem in candidates:
+        # Separator keeps a verse number apart from its text ('1 De HEERE')
+        text = elem.get_text(" ", strip=True)
+        if text and len(text) > 5:  # Filter out tiny elements
+            verses.append(text)
+            first = first or elem
+    return verses, first
+
+
+def _lxml_classes(el) -> str:
+    return " ".join((el.get("class") or "").split())
+
+
+def _lxml_debijbel_single(doc, strategy: str):
+    if strategy == "main":
+        for tag in ("main", "article"):
+            el = next(doc.iter(tag), None)
+            if el is not None:
+                return el
+        return next((el for el in doc.iter("div") if "content" in _lxml_classes(el).split()), None)
+    elements = doc.iter() if strategy == "tekst" else doc.iter(strategy.split("-")[1])
+    return [el for el in elements
+            if isinstance(el.tag, str) and _debijbel_match(strategy, el.tag, _lxml_classes(el))]
+
+
+def _lxml_debijbel_collect(doc) -> dict:
+    candidates = {strategy: [] for strategy in DEBIJBEL_STRATEGIES[:3]}
+    main = article = content = None
+    for el in doc.iter():
+        if not isinstance(el.tag, str):
+            continue  # comments and processing instructions
+        classes = _lxml_classes(el)
+        if classes:
+            for strategy in DEBIJBEL_STRATEGIES[:3]:
+                if _debijbel_match(strategy, el.tag, classes):
+                    candidates[strategy].append(el)
+        if el.tag == "main":
+            main = main if main is not None else el
+        elif el.tag == "article":
+            article = article if article is not None else el
+        elif el.tag == "div" and content is None and "content" in classes.split():
+            content = el
+    candidates["main"] = next((el for el in (main, article, content) if el is not None), None)
+    return candidates
+
+
+def _lxml_debijbel_verses(strategy: str, candidates):
+    verses, first = [], None
+    if strategy == "main":
+        if candidates is None:
+            return verses, first
+        for p in candidates.iter("p", "div"):
+            if p is candidates:
+                continue
+            text = _lxml_text(p, " ")
+            if text and len(text) > 10 and not _DEBIJBEL_NAV.search(text.lower()):
+                verses.append(text)
+                first = first if first is not None else p
+        return verses, first
+    for el in candidates:
+        text = _lxml_text(el, " ")
+        if text and len(text) > 5:
+            verses.append(text)
+            first = first if first is not None else el
+    return verses, first
+
+
+def _find_hispage_nav(tag, nav: list) -> int:
+    """
+    Collects the short navigation elements below tag into nav (children before
+    their parents) and returns tag's text length as get_text(strip=True)
+    measures it.
+
+    Text lengths are summed bottom-up in one walk, and only elements shorter
+    than _HISPAGE_NAV_MAX have their (short) text built and checked, so the
+    cost no longer grows with element count times subtree size. Nothing is
+    removed during the walk, so every element is judged on its full text.
+    """
+    length = 0
+    for child in tag.contents:
+        if isinstance(child, NavigableString):
+            if type(child) in (NavigableString, CData):
+                length += len(child.strip())
+            continue
+        child_length = _find_hispage_nav(child, nav)
+        length += child_length
+        if (child.name in _HISPAGE_NAV_TAGS and child_length < _HISPAGE_NAV_MAX
+                and _HISPAGE_NAV.search(child.get_text(strip=True).lower())):
+            nav.append(child)
+    return length
+
+
+# bible.hispage.nl has a single strategy; it is named for the log all the same
+HISPAGE_STRATEGY = "table-cells"
+
+
+def extract_hispage(html: bytes) -> Extraction:
+    """
+    Verse texts from a bible.hispage.nl chapter page: table cells inside a row
+    that start with a verse number or contain common Dutch words, after menus
+    and short navigation elements are removed. Duplicates (by their first 50
+    characters) are dropped.
+    """
+    if html_parser() == "lxml":
+        return _extract_hispage_lxml(html)
+    soup = parse_html(html)
+    for element in soup.find_all(_HISPAGE_DROP_TAGS):
+        element.decompose()
+    nav = []
+    _find_hispage_nav(soup, nav)
+    for element in nav:
+        element.decompose()
+
+    verses = []
+    seen = set()
+    first = None
+    for cell in soup.find_all("td"):
+        if cell.find_parent("tr") is None:
+            continue
+        text = cell.get_text(separator=" ", strip=True)
+        if text and len(text) > 20 and (_VERSE_START.match(text) or _DUTCH_WORDS.search(text.lower())):
+            if text[:50] not in seen:
+                seen.add(text[:50])
+                verses.append(text)
+                first = first or cell
+    if not verses:
+        return Extraction([], None, None, (HISPAGE_STRATEGY,))
+    return Extraction(verses, HISPAGE_STRATEGY, _soup_fingerprint(first))
+
+
+def _lxml_nav_length(el, skip: set) -> int:
+    """_find_hispage_nav for lxml: adds short navigation elements to skip, returns el's text length."""
+    length = len(el.text.strip()) if el.text and el.tag not in _NO_TEXT_TAGS else 0
+    for child in el:
+        if isinstance(child.tag, str) and child not in skip:
+            child_length = _lxml_nav_length(child, skip)
+            length += child_length
+            if (child.tag in _HISPAGE_NAV_TAGS and child_length < _HISPAGE_NAV_MAX
+                    and _HISPAGE_NAV.search(_lxml_text(child, "", skip).lower())):
+                skip.add(child)
+        if child.tail:
+            length += len(child.tail.strip())
+    return length
+
+
+def _extract_hispage_lxml(html: bytes) -> Extraction:
+    # Removed elements are skipped rather than dropped from the tree: dropping
+    # would merge the text around them and change how it is joined
+    doc = lxml_html.document_fromstring(html)
+    skip = set(doc.iter(*_HISPAGE_DROP_TAGS))
+    _lxml_nav_length(doc, skip)
+
+    verses = []
+    seen = set()
+    first = None
+    for cell in doc.iter("td"):
+        in_row = False
+        for ancestor in cell.iterancestors():
+            if ancestor in skip:
+                break
+            in_row = in_row or ancestor.tag == "tr"
+        else:
+            if not in_row or cell in skip:
+                continue
+            text = _lxml_text(cell, " ", skip)
+            if text and len(text) > 20 and (_VERSE_START.match(text) or _DUTCH_WORDS.search(text.lower())):
+                if text[:50] not in seen:
+                    seen.add(text[:50])
+                    verses.append(text)
+                    first = first if first is not None else cell
+    if not verses:
+        return Extraction([], None, None, (HISPAGE_STRATEGY,))
+    return Extraction(verses, HISPAGE_STRATEGY, _lxml_fingerprint(first))
@@ -0,0 +1,1238 @@
+#!/usr/bin/env python3
+"""
+Bible text retrieval for the sermon generator.
+
+Parses Dutch scripture references and fetches the chapter text (HSV) from
+debijbel.nl, falling back to bible.hispage.nl.
+
+References may name several passages ('Jes 9:1-6; Luk 2:1-20') and cross
+chapter boundaries ('Joh 1:1-2:12'). Each chapter is split into a
+verse -> text map and only the requested verses are returned.
+
+Extracted chapters are kept in a local SQLite cache keyed on
+(source, book_id, chapter). Within the TTL a cached chapter is used without
+touching the network; after that it is revalidated with If-None-Match /
+If-Modified-Since, and if the site cannot be reached the stale text is used.
+SOLLE_OFFLINE=1 never goes to the network.
+
+For benchmarks and regression checks without network, source responses can
+be recorded to files and replayed (HttpRecordings, SOLLE_HTTP_RECORD and
+SOLLE_HTTP_REPLAY).
+"""
+
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from bible_extract import Extraction, extract_debijbel, extract_hispage
+from sermon_data import backoff_delay, cache_dir
+
+# Chapters older than this are revalidated (SOLLE_BIBLE_TTL_DAYS overrides)
+BIBLE_CACHE_TTL_DAYS = 30
+# Seconds before the next source is raced against a slow one (SOLLE_BIBLE_HEDGE_DELAY);
+# 'inf' turns hedging off, so the next source only starts after a failure
+BIBLE_HEDGE_DELAY = 1.0
+# A source is skipped for BREAKER_COOLDOWN seconds after BREAKER_FAILURES
+# consecutive failures (SOLLE_BREAKER_FAILURES, SOLLE_BREAKER_COOLDOWN)
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 300.0
+# Shared HTTP session: retries on connection errors and 429/5xx with jittered
+# exponential backoff (SOLLE_HTTP_RETRIES, SOLLE_HTTP_BACKOFF), keep-alive pool
+# per host (SOLLE_HTTP_POOL_SIZE) and a connect timeout separate from each
+# source's read timeout (SOLLE_HTTP_CONNECT_TIMEOUT, SOLLE_HTTP_READ_TIMEOUT)
+HTTP_RETRIES = 2
+HTTP_BACKOFF = 0.5
+HTTP_BACKOFF_MAX = 10.0
+# Longest Retry-After (seconds) a 429/503 answer can ask for
+HTTP_RETRY_AFTER_MAX = 60.0
+HTTP_POOL_SIZE = 8
+HTTP_CONNECT_TIMEOUT = 5.0
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Requests per second per host, 0 for no limit (SOLLE_HTTP_RATE); the bulk
+# prefetch (03__prefetch_bible_texts.py) sets one
+HTTP_RATE = 0.0
+
+
+def _cache_ttl() -> float:
+    return float(os.getenv("SOLLE_BIBLE_TTL_DAYS") or BIBLE_CACHE_TTL_DAYS) * 24 * 3600
+
+
+def _hedge_delay() -> Optional[float]:
+    """Seconds to wait before hedging, or None when hedging is off."""
+    delay = float(os.getenv("SOLLE_BIBLE_HEDGE_DELAY") or BIBLE_HEDGE_DELAY)
+    return delay if math.isfinite(delay) else None
+
+
+class HostRateLimiter:
+    """Hands out request slots per host, at least 1 / SOLLE_HTTP_RATE seconds apart."""
+
+    def __init__(self):
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def delay(self, url: str) -> float:
+        """Reserves the next slot for url's host; returns the seconds to wait for it (0 without a limit)."""
+        rate = float(os.getenv("SOLLE_HTTP_RATE") or HTTP_RATE)
+        if rate <= 0:
+            return 0.0
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + 1 / rate
+        return slot - now
+
+
+# Shared by the requests session and AsyncBibleFetcher, so both count against one budget
+rate_limiter = HostRateLimiter()
+
+
+def _retry_after(response) -> float:
+    """The seconds a Retry-After header asks for (0 if absent or a date), at most HTTP_RETRY_AFTER_MAX."""
+    try:
+        return min(HTTP_RETRY_AFTER_MAX, max(0.0, float(response.headers.get("Retry-After") or 0)))
+    except ValueError:
+        return 0.0
+
+
+class _ThrottledSession(requests.Session):
+    """
+    Session that waits for rate_limiter before every request, retries
+    included. Connection errors, timeouts and 429/5xx answers to GET and
+    HEAD are retried here with full-jitter backoff (or the Retry-After the
+    server asks for) instead of inside urllib3, where retries would skip
+    the limiter.
+    """
+
+    def request(self, method, url, *args, **kwargs):
+        retries = int(os.getenv("SOLLE_HTTP_RETRIES") or HTTP_RETRIES) if method.upper() in ("GET", "HEAD") else 0
+        backoff = float(os.getenv("SOLLE_HTTP_BACKOFF") or HTTP_BACKOFF)
+        wait_at_least = 0.0
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(max(backoff_delay(attempt, backoff, HTTP_BACKOFF_MAX), wait_at_least))
+            time.sleep(rate_limiter.delay(url))
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+                wait_at_least = 0.0
+                continue
+            if response.status_code not in HTTP_RETRY_STATUSES or attempt == retries:
+                # The last 5xx is handed back rather than raised
+                return response
+            wait_at_least = _retry_after(response)
+            response.close()
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """The process-wide session, built with the configured pool settings on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = int(os.getenv("SOLLE_HTTP_POOL_SIZE") or HTTP_POOL_SIZE)
+            # No retries in urllib3: _ThrottledSession retries through the rate limiter
+            adapter = HTTPAdapter(pool_connections=len(BibleFetcher.SOURCES), pool_maxsize=pool_size,
+                                  max_retries=0)
+            session = _ThrottledSession()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def close_session():
+    """Closes the shared session; the next http_session() call builds a new one from the current settings."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _timeouts(read: float) -> tuple[float, float]:
+    """(connect, read) timeout; read is the source's default unless SOLLE_HTTP_READ_TIMEOUT is set."""
+    return (float(os.getenv("SOLLE_HTTP_CONNECT_TIMEOUT") or HTTP_CONNECT_TIMEOUT),
+            float(os.getenv("SOLLE_HTTP_READ_TIMEOUT") or read))
+
+
+_STATUS_RESULT_RE = re.compile(r"\[(?:Fout bij ophalen: )?HTTP (\d{3})\]")
+
+
+def _source_unavailable(text: str) -> bool:
+    """
+    Whether a source's result says the source itself is failing: a transport
+    error, a timeout or a 5xx. A 404 or a page without verses is about the
+    requested chapter, so it does not count against the circuit breaker.
+    """
+    status = _STATUS_RESULT_RE.match(text)
+    if status:
+        return status.group(1).startswith("5")
+    return text.startswith("[Fout bij ophalen:")
+
+
+class CircuitBreaker:
+    """
+    Skips a failing source for a cool-down period.
+
+    After `failures` consecutive failures the breaker opens; once `cooldown`
+    seconds have passed a single trial request is let through, which closes
+    the breaker on success and re-opens it on failure.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._count = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._trial = True
+            return True
+
+    def cancel(self):
+        """The request let through by allow() was abandoned unfinished; a new trial may go."""
+        with self._lock:
+            self._trial = False
+
+    def record(self, success: bool):
+        with self._lock:
+            self._trial = False
+            if success:
+                self._count = 0
+                self._opened_at = None
+                return
+            self._count += 1
+            if self._count >= self.failures:
+                self._opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(source: str) -> CircuitBreaker:
+    """The process-wide breaker for source, created with the configured limits."""
+    with _breakers_lock:
+        if source not in _breakers:
+            _breakers[source] = CircuitBreaker(
+                int(os.getenv("SOLLE_BREAKER_FAILURES") or BREAKER_FAILURES),
+                float(os.getenv("SOLLE_BREAKER_COOLDOWN") or BREAKER_COOLDOWN),
+            )
+        return _breakers[source]
+
+
+# Chapter text that could not be split into verses is cut off here
+MAX_UNSPLIT_CHARS = 6000
+
+# A verse number: not part of a word or reference, followed by the verse text
+_VERSE_MARK = re.compile(r'(?<![\w:,.\-])(\d{1,3})(?=\s*[^\W\d_]|\s*[\'"‘“«(])')
+
+
+def split_verses(text: str) -> Dict[int, str]:
+    """
+    Splits extracted chapter text into {verse number: text}.
+
+    Verse numbers must run 1, 2, 3, ... (one skipped verse is tolerated), so
+    numbers inside the text or in navigation before the chapter are ignored;
+    of all runs starting at a '1' the longest wins. Returns {} when the text
+    has no recognisable numbering.
+    """
+    marks = [(int(m.group(1)), m.start(), m.end()) for m in _VERSE_MARK.finditer(text)]
+    best = []
+    for i, (n, _, _) in enumerate(marks):
+        if n != 1:
+            continue
+        run, expected = [marks[i]], 2
+        for mark in marks[i + 1:]:
+            if mark[0] in (expected, expected + 1):
+                run.append(mark)
+                expected = mark[0] + 1
+        if len(run) > len(best):
+            best = run
+    if len(best) < 2:
+        return {}
+    ends = [start for _, start, _ in best[1:]] + [len(text)]
+    return {n: text[end:stop].strip() for (n, _, end), stop in zip(best, ends)}
+
+
+class Passage(NamedTuple):
+    """Verses first_verse of chapter up to last_verse of end_chapter (None: chapter start/end)."""
+    book_id: int
+    chapter: int
+    first_verse: Optional[int]
+    end_chapter: int
+    last_verse: Optional[int]
+    label: str
+
+
+class Page(NamedTuple):
+    """The parts of an HTTP response the sources use; a requests.Response has the same attributes."""
+    status_code: int
+    headers: dict
+    content: bytes
+
+
+class MissingRecording(LookupError):
+    """Replay mode has no recorded response for a request; never treated as a fetch failure."""
+
+
+class HttpRecordings:
+    """
+    HTTP responses (status, headers, body) kept as files in a directory, to
+    be served back without network: SOLLE_HTTP_RECORD=<dir> saves every
+    source response of a live run, SOLLE_HTTP_REPLAY=<dir> answers requests
+    from the saved ones only and raises MissingRecording for any other.
+    Responses are keyed on the source and the URL's path and query, not its
+    host, so a recording made against a local stub server replays under the
+    real URLs. Each response is <name>.json (url, status, headers) plus the
+    body as <name>.body.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, source: str, url: str) -> str:
+        parts = urlsplit(url)
+        key = parts.path + ("?" + parts.query if parts.query else "")
+        slug = re.sub(r"[^\w.-]+", "_", key).strip("_")[:80]
+        digest = hashlib.sha1(f"{source} {key}".encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.directory, f"{source}_{slug}_{digest}")
+
+    def load(self, source: str, url: str) -> Page:
+        path = self._path(source, url)
+        try:
+            with open(path + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(path + ".body", "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            raise MissingRecording(f"No recorded response for {url} in {self.directory}") from None
+        return Page(meta["status_code"], CaseInsensitiveDict(meta["headers"]), body)
+
+    def save(self, source: str, url: str, response: Page):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(source, url)
+        headers = {name: value for name, value in response.headers.items() if name.lower() != "set-cookie"}
+        with open(path + ".body", "wb") as f:
+            f.write(response.content)
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump({"url": url, "status_code": response.status_code, "headers": headers},
+                      f, ensure_ascii=False, indent=1)
+
+
+def http_recordings(variable: str) -> Optional[HttpRecordings]:
+    """The recordings directory named by SOLLE_HTTP_RECORD or SOLLE_HTTP_REPLAY, if set."""
+    directory = os.getenv(variable)
+    return HttpRecordings(directory) if directory else None
+
+
+class CachedChapter(NamedTuple):
+    text: str
+    verses: Dict[int, str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    checked_at: float
+
+    @property
+    def age(self) -> float:
+        """Seconds since the text was fetched or last revalidated."""
+        return time.time() - self.checked_at
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ChapterCache:
+    """
+    Extracted chapter text and its verse map per (source, book_id, chapter)
+    in SQLite, with the ETag and Last-Modified validators of the response it
+    came from, and per source the extraction strategy that last worked.
+    """
+
+    SCHEMA = 2
+
+    def __init__(self, db_path: str):
+        self.path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Shared by the fetch threads of BibleFetcher._race
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA:
+                # Older layouts held truncated text without a verse map: start over
+                with self._db:
+                    self._db.execute("DROP TABLE IF EXISTS chapters")
+                    self._db.execute(f"PRAGMA user_version = {self.SCHEMA}")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chapters (source TEXT, book_id INTEGER, chapter INTEGER,"
+                " text TEXT, verses TEXT, etag TEXT, last_modified TEXT, checked_at REAL,"
+                " PRIMARY KEY (source, book_id, chapter))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS strategies (source TEXT PRIMARY KEY, strategy TEXT,"
+                " fingerprint TEXT, updated_at REAL)"
+            )
+        except sqlite3.Error:
+            self._db.close()
+            raise
+
+    @staticmethod
+    def default_path() -> str:
+        return os.path.join(cache_dir(), "bible.sqlite")
+
+    def get(self, source: str, book_id: int, chapter: int) -> Optional[CachedChapter]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT text, verses, etag, last_modified, checked_at FROM chapters"
+                " WHERE source = ? AND book_id = ? AND chapter = ?", (source, book_id, chapter)
+            ).fetchone()
+        if not row:
+            return None
+        text, verses, *validators = row
+        return CachedChapter(text, {int(n): v for n, v in json.loads(verses).items()}, *validators)
+
+    def put(self, source: str, book_id: int, chapter: int, text: str, verses: Dict[int, str],
+            etag: Optional[str] = None, last_modified: Optional[str] = None):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chapters VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, book_id, chapter, text, json.dumps(verses, ensure_ascii=False),
+                 etag, last_modified, time.time())
+            )
+
+    def touch(self, source: str, book_id: int, chapter: int):
+        """Marks a chapter as revalidated (HTTP 304)."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE chapters SET checked_at = ? WHERE source = ? AND book_id = ? AND chapter = ?",
+                (time.time(), source, book_id, chapter)
+            )
+
+    def strategy(self, source: str) -> Optional["StrategyMemo"]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT strategy, fingerprint FROM strategies WHERE source = ?", (source,)
+            ).fetchone()
+        return StrategyMemo(*row) if row else None
+
+    def put_strategy(self, source: str, memo: "StrategyMemo"):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO strategies VALUES (?, ?, ?, ?)",
+                (source, memo.strategy, memo.fingerprint, time.time())
+            )
+
+    def close(self):
+        self._db.close()
+
+
+_chapter_cache = None  # False once opening it has failed, so that is reported only once
+_chapter_cache_lock = threading.Lock()
+
+
+def chapter_cache() -> Optional[ChapterCache]:
+    """The shared chapter cache, or None when disabled (SOLLE_NO_CACHE=1) or unavailable."""
+    global _chapter_cache
+    if os.getenv("SOLLE_NO_CACHE"):
+        return None
+    with _chapter_cache_lock:
+        if _chapter_cache is None:
+            try:
+                _chapter_cache = ChapterCache(ChapterCache.default_path())
+            except (OSError, sqlite3.Error) as e:
+                print(f"Bijbelcache niet beschikbaar ({e}); teksten worden online opgehaald.")
+                _chapter_cache = False
+        return _chapter_cache or None
+
+
+class StrategyMemo(NamedTuple):
+    """The extraction strategy that last found verses on a source, and the layout fingerprint it saw."""
+    strategy: str
+    fingerprint: str
+
+
+_strategies = {}
+_strategies_lock = threading.Lock()
+
+
+def remembered_strategy(source: str) -> Optional[StrategyMemo]:
+    """The strategy memo for source, loaded from the chapter cache on first use."""
+    with _strategies_lock:
+        if source not in _strategies:
+            cache = chapter_cache()
+            _strategies[source] = cache.strategy(source) if cache else None
+        return _strategies[source]
+
+
+def remember_strategy(source: str, memo: StrategyMemo):
+    with _strategies_lock:
+        if _strategies.get(source) == memo:
+            return
+        _strategies[source] = memo
+    cache = chapter_cache()
+    if cache:
+        cache.put_strategy(source, memo)
+
+
+# Leading Roman numerals and ordinals of numbered books ('II Kor', 'Eerste Petrus')
+_BOOK_ORDINALS = {"i": "1", "ii": "2", "iii": "3", "1e": "1", "2e": "2", "3e": "3",
+                  "eerste": "1", "tweede": "2", "derde": "3"}
+
+
+def _book_key(name: str) -> str:
+    """'II Korintiërs' -> '2korintiers': lowercase, no diacritics, number as a digit, no spaces or dots."""
+    name = unicodedata.normalize("NFKD", name.lower())
+    words = "".join(c for c in name if not unicodedata.combining(c)).replace(".", " ").split()
+    if len(words) > 1 and words[0] in _BOOK_ORDINALS:
+        words[0] = _BOOK_ORDINALS[words[0]]
+    return "".join(words)
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (insertions, deletions, substitutions
+    and adjacent swaps); stops early with limit + 1 once it must exceed limit.
+    """
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit and min(previous) > limit:
+            return limit + 1
+    return current[len(b)]
+
+
+class BookMatch(NamedTuple):
+    """
+    Result of a book lookup. match_type is 'exact', 'normalized' (diacritics,
+    Roman numerals, spacing), 'prefix', 'fuzzy', 'ambiguous' or 'none'; key
+    is the name that matched and candidates the books an ambiguous name fits.
+    """
+    book_id: Optional[int]
+    match_type: str
+    key: Optional[str] = None
+    candidates: tuple = ()
+
+
+class BookIndex:
+    """
+    Book names and abbreviations, prebuilt for lookup: exact names, names
+    normalised with _book_key, every prefix of every normalised name with the
+    books it can start, and the names grouped by book number for edit-distance
+    matching. Lookups are memoised, so bulk parsing pays once per distinct name.
+    """
+
+    def __init__(self, mapping: Dict[str, int]):
+        self._exact = dict(mapping)
+        self._keys = {}
+        for name, book_id in mapping.items():
+            self._keys.setdefault(_book_key(name), set()).add(book_id)
+        self._prefixes = {}
+        self._by_number = {}
+        for key, book_ids in self._keys.items():
+            for end in range(1, len(key) + 1):
+                self._prefixes.setdefault(key[:end], set()).update(book_ids)
+            self._by_number.setdefault(key[:1] if key[:1].isdigit() else "", []).append(key)
+        self._memo = {}
+
+    def lookup(self, name: str) -> BookMatch:
+        match = self._memo.get(name)
+        if match is None:
+            match = self._memo[name] = self._lookup(name)
+        return match
+
+    def _lookup(self, name: str) -> BookMatch:
+        spaced = " ".join(name.lower().replace(".", " ").split())
+        if spaced in self._exact:
+            return BookMatch(self._exact[spaced], "exact", spaced)
+        key = _book_key(name)
+        if not key:
+            return BookMatch(None, "none")
+        for match_type, book_ids in (("normalized", self._keys.get(key)), ("prefix", self._prefixes.get(key))):
+            if book_ids:
+                return self._resolve(match_type, key, book_ids)
+
+        # Typos: the nearest names with the same book number, one edit for
+        # short names and two for longer ones
+        limit = 1 if len(key) < 6 else 2
+        best, book_ids, matched = limit + 1, set(), None
+        for candidate in self._by_number.get(key[:1] if key[:1].isdigit() else "", ()):
+            if abs(len(candidate) - len(key)) > limit:
+                continue
+            distance = _edit_distance(key, candidate, limit)
+            if distance > limit:
+                continue
+            if distance < best:
+                best, book_ids, matched = distance, set(self._keys[candidate]), candidate
+            elif distance == best:
+                book_ids |= self._keys[candidate]
+        if not book_ids:
+            return BookMatch(None, "none")
+        return self._resolve("fuzzy", matched, book_ids)
+
+    @staticmethod
+    def _resolve(match_type: str, key: str, book_ids: set) -> BookMatch:
+        if len(book_ids) == 1:
+            return BookMatch(next(iter(book_ids)), match_type, key)
+        return BookMatch(None, "ambiguous", key, tuple(sorted(book_ids)))
+
+
+_book_index = None
+_book_index_lock = threading.Lock()
+
+
+def book_index() -> BookIndex:
+    """The process-wide index over BibleFetcher.BOOK_MAPPING, built on first use."""
+    global _book_index
+    if _book_index is None:
+        with _book_index_lock:
+            if _book_index is None:
+                _book_index = BookIndex(BibleFetcher.BOOK_MAPPING)
+    return _book_index
+
+
+def _format_age(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min oud"
+    if seconds < 2 * 86400:
+        return f"{int(seconds // 3600)} uur oud"
+    return f"{int(seconds // 86400)} dagen oud"
+
+
+class BibleFetcher:
+    """Fetches Bible text from bible.hispage.nl (HSV)."""
+
+    # Sources in order of preference; also the cache's and breakers' source names
+    SOURCES = ("debijbel", "hispage")
+    DEBIJBEL_URL = "https://debijbel.nl/bijbel/HSV/{abbrev}.{chapter}"
+    HISPAGE_URL = "https://bible.hispage.nl/index.php?book={book_id}&chapter={chapter}&v[]=6&language=1"
+    
+    # Standaard canonieke volgorde (1-66) + Veelvoorkomende afkortingen
+    BOOK_MAPPING = {
+        # Oude Testament
+        "genesis": 1, "gen": 1, "exodus": 2, "ex": 2, "leviticus": 3, "lev": 3, "numeri": 4, "num": 4, 
+        "deuteronomium": 5, "deut": 5, "dt": 5,
+        "jozua": 6, "joz": 6, "richteren": 7, "rechters": 7, "ri": 7, "ruth": 8, "rut": 8,
+        "1 samuel": 9, "1sam": 9, "1 sa": 9, "2 samuel": 10, "2sam": 10, "2 sa": 10,
+        "1 koningen": 11, "1kon": 11, "1 ko": 11, "2 koningen": 12, "2kon": 12, "2 ko": 12,
+        "1 kronieken": 13, "1kr": 13, "1 kr": 13, "2 kronieken": 14, "2kr": 14, "2 kr": 14,
+        "ezra": 15, "nehemia": 16, "neh": 16, "esther": 17, "est": 17,
+        "job": 18, "psalmen": 19, "psalm": 19, "ps": 19, "spreuken": 20, "spr": 20,
+        "prediker": 21, "pred": 21, "hooglied": 22, "hgl": 22,
+        "jesaja": 23, "jes": 23, "jeremia": 24, "jer": 24, "klaagliederen": 25, "kla": 25,
+        "ezechiël": 26, "ezechiel": 26, "ez": 26, "daniël": 27, "daniel": 27, "dan": 27,
+        "hosea": 28, "hos": 28, "joël": 29, "joel": 29, "amos": 30, "am": 30,
+        "obadja": 31, "ob": 31, "jona": 32, "micha": 33, "mi": 33, "mic": 33,
+        "nahum": 34, "na": 34, "nah": 34, "habakuk": 35, "hab": 35, "zefanja": 36, "zef": 36,
+        "haggai": 37, "hag": 37, "zacharia": 38, "zach": 38, "zac": 38, "maleachi": 39, "mal": 39,
+        # Nieuwe Testament
+        "mattheüs": 40, "mattheus": 40, "matteüs": 40, "matteus": 40, "matt": 40, "mt": 40, "marcus": 41, "marc": 41, "mk": 41, "mc": 41,
+        "lucas": 42, "lukas": 42, "luc": 42, "luk": 42, "lc": 42, "johannes": 43, "joh": 43, "jn": 43,
+        "handelingen": 44, "hand": 44, "hnd": 44, "romeinen": 45, "rom": 45,
+        "1 korintiërs": 46, "1 korintiers": 46, "1kor": 46, "1 kor": 46, "1ko": 46,
+        "2 korintiërs": 47, "2 korintiers": 47, "2kor": 47, "2 kor": 47, "2ko": 47,
+        "galaten": 48, "gal": 48, "efesiërs": 49, "efesiers": 49, "efeze": 49, "ef": 49,
+        "filippenzen": 50, "fil": 50, "kolossenzen": 51, "kol": 51,
+        "1 tessalonicenzen": 52, "1tess": 52, "1 tess": 52, "1th": 52,
+        "2 tessalonicenzen": 53, "2tess": 53, "2 tess": 53, "2th": 53,
+        "1 timoteüs": 54, "1 timotheus": 54, "1tim": 54, "1 tim": 54, "1ti": 54,
+        "2 timoteüs": 55, "2 timotheus": 55, "2tim": 55, "2 tim": 55, "2ti": 55,
+        "titus": 56, "tit": 56, "filemon": 57, "film": 57, "flm": 57,
+        "hebreeën": 58, "hebreeen": 58, "hebr": 58, "heb": 58,
+        "jakobus": 59, "jak": 59,
+        "1 petrus": 60, "1pet": 60, "1 pet": 60, "1pe": 60,
+        "2 petrus": 61, "2pet": 61, "2 pet": 61, "2pe": 61,
+        "1 johannes": 62, "1joh": 62, "1 joh": 62, "1jo": 62,
+        "2 johannes": 63, "2joh": 63, "2 joh": 63, "2jo": 63,
+        "3 johannes": 64, "3joh": 64, "3 joh": 64, "3jo": 64,
+        "judas": 65, "jud": 65, "openbaring": 66, "openbaringen": 66, "op": 66
+    }
+
+    # (Boek) (Hoofdstuk) then either '-' (Hoofdstuk) or ':' (Verzen); the book is
+    # optional so that 'Joh 1:1-5; 3:16' can continue in the same book. A
+    # numbered book may start with a digit, Roman numeral or ordinal ('II Kor')
+    _BOOK_PATTERN = r"(?:[1-3]e?|i{1,3}|eerste|tweede|derde)?[\s.]*[^\W\d_]+"
+    _PASSAGE_RE = re.compile(rf"^(?:({_BOOK_PATTERN})\.?\s*)?(\d+)(?:\s*-\s*(\d+)|\s*[:\.]\s*(\S.*))?$")
+    # One verse range: '4', '1-14', '14b', '1-2:12' (into the next chapter) or '3:16' (new chapter)
+    _RANGE_RE = re.compile(r"^(?:(\d+)\s*[:\.]\s*)?(\d+)[a-z]?(?:\s*-\s*(?:(\d+)\s*[:\.]\s*)?(\d+)[a-z]?)?$")
+
+    @staticmethod
+    def _normalize(reference: str) -> str:
+        return reference.lower().strip().replace("–", "-").replace("—", "-")
+
+    @staticmethod
+    def parse_reference(reference: str) -> tuple[Optional[int], Optional[str], Optional[str], str]:
+        """
+        Parses 'Lukas 2:1-4' into (42, '2', '1-4', 'match_type').
+        For multi-passage references only the first passage is described.
+        Returns: (book_id, chapter, verses, log_message)
+        """
+        # Improved regex to handle '1 Joh', '1Joh', '1 Johannes', 'Lucas', 'Lk'
+        # Matches optional digit + space + word(s) + space + digit
+        
+        # Stap 1: Normaliseren (lowercase, eerste passage)
+        ref_norm = BibleFetcher._normalize(reference).split(";")[0].strip()
+        
+        match = BibleFetcher._PASSAGE_RE.match(ref_norm)
+        
+        if not match or not match.group(1):
+            return None, None, None, f"Regex parse mislukt voor '{reference}'"
+        
+        book_part = match.group(1).strip()
+        chapter = match.group(2)
+        verses = match.group(4)
+        
+        log_msg = f"Geparsed: Boek='{book_part}', Hst='{chapter}', Vers='{verses}'"
+
+        match = BibleFetcher.lookup_book(book_part)
+        if match.book_id:
+            log_msg += f" -> ID gevonden: {match.book_id} ({BibleFetcher._describe_match(match)})"
+        elif match.match_type == "ambiguous":
+            log_msg += f" -> GEEN ID gevonden ({BibleFetcher._describe_match(match)})."
+        else:
+            log_msg += " -> GEEN ID gevonden."
+
+        return match.book_id, chapter, verses, log_msg
+
+    @staticmethod
+    def lookup_book(name: str) -> BookMatch:
+        """Maps a book name or abbreviation ('Luk', 'II Kor', 'Johanes') to its number, see BookIndex."""
+        return book_index().lookup(name)
+
+    @staticmethod
+    def book_name(book_id: int) -> str:
+        """Display name of a book number: its first (full) name in BOOK_MAPPING."""
+        name = next((name for name, bid in BibleFetcher.BOOK_MAPPING.items() if bid == book_id), None)
+        return name.title() if name else str(book_id)
+
+    @staticmethod
+    def _describe_match(match: BookMatch) -> str:
+        if match.match_type == "ambiguous":
+            names = ", ".join(BibleFetcher.book_name(book_id) for book_id in match.candidates)
+            return f"dubbelzinnig: '{match.key}' kan {names} zijn"
+        if match.match_type in ("prefix", "fuzzy"):
+            return f"{match.match_type}_'{match.key}'"
+        return match.match_type
+
+    @staticmethod
+    def parse_passages(reference: str) -> tuple[List[Passage], str]:
+        """
+        Parses a reference that may hold several passages, e.g.
+        'Jes 9:1-6; Luk 2:1-20', 'Joh 1:1-2:12', 'Luk 2:1-7,15-20' or 'Ps 1-2'.
+        A passage without a book continues the previous book ('Joh 1:1-5; 3:16').
+        Returns: (passages, log_message)
+        """
+        passages = []
+        log = f"Geparsed: '{reference}'"
+        book_id = None
+        # The label keeps the spelling of the reference; only the matching uses the normalized text
+        originals = reference.strip().replace("–", "-").replace("—", "-").split(";")
+        for part, original in zip(BibleFetcher._normalize(reference).split(";"), originals):
+            part, original = part.strip(), original.strip()
+            if not part:
+                continue
+            match = BibleFetcher._PASSAGE_RE.match(part)
+            if not match:
+                log += f"\n  '{part}': regex parse mislukt"
+                continue
+            if match.group(1):
+                book = BibleFetcher.lookup_book(match.group(1).strip())
+                book_id = book.book_id
+                if not book_id:
+                    detail = f" ({BibleFetcher._describe_match(book)})" if book.candidates else ""
+                    log += f"\n  '{part}': GEEN ID gevonden voor '{match.group(1).strip()}'{detail}"
+                    continue
+                log += f"\n  '{part}': boek {book_id} ({BibleFetcher._describe_match(book)})"
+            elif book_id is None:
+                log += f"\n  '{part}': geen boek"
+                continue
+
+            chapter = int(match.group(2))
+            label = original[0].upper() + original[1:]
+            if match.group(3):                      # chapter range: 'Ps 1-2'
+                passages.append(Passage(book_id, chapter, None, int(match.group(3)), None, label))
+                continue
+            if not match.group(4):                  # whole chapter: 'Ps 23'
+                passages.append(Passage(book_id, chapter, None, chapter, None, label))
+                continue
+            for segment in match.group(4).split(","):
+                verse_range = BibleFetcher._RANGE_RE.match(segment.strip())
+                if not verse_range:
+                    log += f"\n  '{segment.strip()}': verzen niet herkend"
+                    continue
+                start_chapter, first, end_chapter, last = verse_range.groups()
+                chapter = int(start_chapter or chapter)
+                end = int(end_chapter or chapter)
+                passages.append(Passage(book_id, chapter, int(first), end, int(last or first), label))
+                chapter = end
+        log += f"\n  -> {len(passages)} passage(s)"
+        return passages, log
+
+    @staticmethod
+    def parse_many(references: Iterable[str]) -> List[tuple[List[Passage], str]]:
+        """
+        parse_passages for many references, e.g. a column of a planning
+        spreadsheet. Each distinct reference is parsed once; repeats share
+        the result.
+        """
+        parsed = {}
+        results = []
+        for reference in references:
+            if reference not in parsed:
+                parsed[reference] = BibleFetcher.parse_passages(reference)
+            results.append(parsed[reference])
+        return results
+
+    @staticmethod
+    def fetch_text(reference: str, echo: bool = True) -> tuple[str, str]:
+        """
+        Fetches the requested verses of every passage in reference. Each chapter
+        comes from the cache or from multiple sources, preferring debijbel.nl
+        (more reliable) and racing bible.hispage.nl against it when it is slow
+        or fails. echo=False leaves the progress notes to the log only.
+        Returns: (text, log_details)
+        """
+        passages, parse_log = BibleFetcher.parse_passages(reference)
+
+        if not passages:
+            return f"[Kon tekst niet automatisch ophalen. Fallback op interne kennis.]", parse_log
+
+        fetch_log = parse_log
+        chapters = {}
+        for book_id, chapter in BibleFetcher._chapter_keys(passages):
+            text, verses, log = BibleFetcher._fetch_chapter(book_id, chapter, echo)
+            chapters[book_id, chapter] = (text, verses)
+            fetch_log += log
+        return BibleFetcher._assemble(passages, chapters, fetch_log)
+
+    @staticmethod
+    def _chapter_keys(passages: List[Passage]) -> List[tuple[int, int]]:
+        """Distinct (book_id, chapter) pairs the passages need, in reading order."""
+        return list(dict.fromkeys((passage.book_id, chapter) for passage in passages
+                                  for chapter in range(passage.chapter, passage.end_chapter + 1)))
+
+    @staticmethod
+    def _assemble(passages: List[Passage], chapters: dict, fetch_log: str) -> tuple[str, str]:
+        """The requested verses of all passages from the fetched chapters: (text, log)."""
+        blocks = []
+        for passage in passages:
+            text, log = BibleFetcher._slice(passage, chapters)
+            fetch_log += log
+            blocks.append(text)
+        if len(blocks) == 1:
+            return blocks[0], fetch_log
+        failed = [block for block in blocks if block.startswith("[")]
+        if len(failed) == len(blocks):
+            return failed[0], fetch_log
+        # Label each passage; merge consecutive ranges of the same reference part ('Luk 2:1-7,15-20')
+        labelled = []
+        for passage, block in zip(passages, blocks):
+            if labelled and labelled[-1][0] == passage.label:
+                labelled[-1][1].append(block)
+            else:
+                labelled.append((passage.label, [block]))
+        if len(labelled) == 1:
+            return " [...] ".join(labelled[0][1]), fetch_log
+        return "\n\n".join(f"{label}\n" + " [...] ".join(parts) for label, parts in labelled), fetch_log
+
+    @staticmethod
+    def _slice(passage: Passage, chapters: dict) -> tuple[str, str]:
+        """The requested verses of passage, with verse numbers (chapter:verse across chapters)."""
+        parts = []
+        log = ""
+        for chapter in range(passage.chapter, passage.end_chapter + 1):
+            text, verses = chapters[passage.book_id, chapter]
+            if not verses:
+                # Extraction gave no verse numbering: use the chapter as a whole
+                if not text.startswith("[") and len(text) > MAX_UNSPLIT_CHARS:
+                    text = text[:MAX_UNSPLIT_CHARS] + "..."
+                if not text.startswith("[") or not parts:
+                    parts.append(text)
+                continue
+            first = passage.first_verse if chapter == passage.chapter and passage.first_verse else 1
+            last = passage.last_verse if chapter == passage.end_chapter and passage.last_verse else max(verses)
+            selected = [n for n in range(first, last + 1) if n in verses]
+            if len(selected) < last - first + 1:
+                log += f"\nHoofdstuk {chapter}: {last - first + 1 - len(selected)} van de verzen {first}-{last} niet gevonden."
+            prefix = f"{chapter}:" if passage.end_chapter > passage.chapter else ""
+            parts.extend(f"{prefix}{n} {verses[n]}" for n in selected)
+        if not parts:
+            return "[Gevraagde verzen niet gevonden.]", log
+        text = " ".join(parts)
+        log += f"\n{passage.label}: {len(text)} karakters."
+        return text, log
+
+    @staticmethod
+    def _fetch_chapter(book_id: int, chapter: int, echo: bool = True) -> tuple[str, Dict[int, str], str]:
+        """
+        Chapter text and verse map from the cache or the sources.
+        Returns: (text, verses, log); text starts with '[' on failure.
+        """
+        result, cached, fetch_log = BibleFetcher._chapter_from_cache(book_id, chapter, echo)
+        if result:
+            return result
+
+        # debijbel.nl is preferred (Nederlandse Bijbelgenootschap - cleaner HTML);
+        # hispage.nl is raced against it once debijbel is slow or has failed
+        attempts = [
+            ("debijbel", lambda: BibleFetcher._try_debijbel(book_id, str(chapter), cached['debijbel'], echo)),
+            ("hispage", lambda: BibleFetcher._try_hispage(book_id, str(chapter), cached['hispage'], echo)),
+        ]
+        text, log = BibleFetcher._race(attempts)
+        return BibleFetcher._chapter_result(text, fetch_log + log, cached)
+
+    @staticmethod
+    def _chapter_from_cache(book_id: int, chapter: int, echo: bool = True) -> tuple[Optional[tuple], dict, str]:
+        """
+        The cache's part of _fetch_chapter: (result when the cache or offline
+        mode settles it, else None; cached entry per source; log). echo=False
+        leaves a cache hit to the log only.
+        """
+        fetch_log = f"\n\n=== Boek {book_id}, hoofdstuk {chapter} ==="
+
+        # A fresh cached chapter (or any cached chapter when offline) skips the network
+        cache = chapter_cache()
+        cached = {source: cache.get(source, book_id, chapter) if cache else None
+                  for source in BibleFetcher.SOURCES}
+        offline = bool(os.getenv("SOLLE_OFFLINE"))
+        for source, entry in cached.items():
+            if entry and (offline or entry.age < _cache_ttl()):
+                fetch_log += f"\nCache: hit ({source}, {_format_age(entry.age)})"
+                if echo:
+                    print(f"   (Uit cache: {source}, {_format_age(entry.age)})")
+                return (entry.text, entry.verses, fetch_log), cached, fetch_log
+        if offline:
+            fetch_log += "\nCache: miss (offline, netwerk overgeslagen)"
+            return ("[Kon tekst niet ophalen (offline). Fallback op interne kennis.]", {}, fetch_log), cached, fetch_log
+        if cache:
+            stale = any(cached.values())
+            fetch_log += "\nCache: " + ("verlopen, hervalideren" if stale else "miss")
+        return None, cached, fetch_log
+
+    @staticmethod
+    def _chapter_result(text: str, fetch_log: str, cached: dict) -> tuple[str, Dict[int, str], str]:
+        """The raced text split into verses, or a stale cached chapter when every source failed."""
+        if text.startswith("["):
+            entry = next((entry for entry in cached.values() if entry), None)
+            if entry:
+                fetch_log += f"\n\nCache: verouderde tekst gebruikt ({_format_age(entry.age)})."
+                return entry.text, entry.verses, fetch_log
+            return text, {}, fetch_log
+        verses = split_verses(text)
+        if not verses:
+            fetch_log += "\nGeen versnummering herkend; het hele hoofdstuk wordt gebruikt."
+        return text, verses, fetch_log
+
+    @staticmethod
+    def _attempt(source: str, fetch) -> tuple[str, str]:
+        """Runs one source's fetch and reports the outcome to its circuit breaker."""
+        try:
+            text, log = fetch()
+        except MissingRecording:
+            # Not the source's fault; frees a half-open breaker's trial
+            circuit_breaker(source).cancel()
+            raise
+        circuit_breaker(source).record(not _source_unavailable(text))
+        return text, log
+
+    @staticmethod
+    def _race(attempts: list) -> tuple[str, str]:
+        """
+        Hedged fetch: starts the first source and adds the next one when the
+        running ones have not succeeded within the hedge delay (or have failed).
+        The first extracted text wins; losers are abandoned, not awaited.
+        Sources whose circuit breaker is open are skipped.
+
+        An abandoned request still runs to completion on its worker thread,
+        and the interpreter joins those threads at exit. The wait is bounded
+        by the request's connect and read timeouts (per retry), so a script
+        may exit up to that long after its last fetch.
+        """
+        log = ""
+        queue = list(attempts)
+        pool = ThreadPoolExecutor(max_workers=len(queue))
+        pending = {}
+
+        def launch():
+            # Ask the breaker only when a source is actually started: allow()
+            # may hand out the single trial request of a cooled-down breaker
+            nonlocal log
+            while queue:
+                source, fetch = queue.pop(0)
+                if circuit_breaker(source).allow():
+                    pending[pool.submit(BibleFetcher._attempt, source, fetch)] = source
+                    return
+                log += f"\n\n--- {source} overgeslagen (circuit breaker open) ---"
+
+        text = "[Alle bronnen tijdelijk overgeslagen na herhaalde fouten.]"
+        try:
+            launch()
+            while pending:
+                hedge = _hedge_delay()
+                done, _ = wait(pending, timeout=hedge if queue else None, return_when=FIRST_COMPLETED)
+                if not done:
+                    log += f"\n\n(Geen antwoord binnen {hedge:g} s; volgende bron parallel gestart)"
+                    launch()
+                    continue
+                for future in done:
+                    pending.pop(future)
+                    text, attempt_log = future.result()
+                    log += attempt_log
+                    if not text.startswith("["):
+                        for source in pending.values():
+                            log += f"\n\n--- {source} afgebroken (andere bron was eerder) ---"
+                        return text, log
+                if queue and not pending:
+                    launch()
+            return text, log
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _not_modified(source: str, book_id: int, chapter: str,
+                      response: Page, cached: Optional[CachedChapter]) -> Optional[str]:
+        """The cached text if the server answered 304 Not Modified."""
+        if response.status_code == 304 and cached:
+            cache = chapter_cache()
+            if cache:
+                cache.touch(source, book_id, int(chapter))
+            return cached.text
+        return None
+
+    @staticmethod
+    def _store(source: str, book_id: int, chapter: str, text: str, response: Page):
+        cache = chapter_cache()
+        if cache:
+            cache.put(source, book_id, int(chapter), text, split_verses(text),
+                      response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    @staticmethod
+    def _note_extraction(source: str, extraction: Extraction, memo: Optional[StrategyMemo],
+                         echo: bool = True) -> str:
+        """
+        Remembers the strategy that found verses and returns a log line saying
+        which one it was, and which remembered strategy or layout stopped
+        working; with echo, a strategy that stopped working is also printed.
+        """
+        if extraction.strategy is None:
+            tried = ", ".join(extraction.failed)
+            if memo:
+                if echo:
+                    print(f"   ({source}: extractiestrategie '{memo.strategy}' vindt geen verzen meer)")
+                return (f"\nExtractie: onthouden strategie '{memo.strategy}' (layout {memo.fingerprint})"
+                        f" vindt geen verzen meer (geprobeerd: {tried}).")
+            return f"\nExtractie: geen strategie vond verzen (geprobeerd: {tried})."
+
+        remember_strategy(source, StrategyMemo(extraction.strategy, extraction.fingerprint))
+        if memo is None:
+            return f"\nExtractie: strategie '{extraction.strategy}' (layout {extraction.fingerprint})."
+        if memo.strategy != extraction.strategy:
+            if echo:
+                print(f"   ({source}: extractiestrategie '{memo.strategy}' werkt niet meer, nu '{extraction.strategy}')")
+            return (f"\nExtractie: onthouden strategie '{memo.strategy}' vindt geen verzen meer"
+                    f" (layout {memo.fingerprint} -> {extraction.fingerprint});"
+                    f" nu '{extraction.strategy}' (niets gevonden: {', '.join(extraction.failed)}).")
+        if memo.fingerprint != extraction.fingerprint:
+            return (f"\nExtractie: strategie '{extraction.strategy}', layout gewijzigd"
+                    f" ({memo.fingerprint} -> {extraction.fingerprint}).")
+        return f"\nExtractie: onthouden strategie '{extraction.strategy}'."
+
+    @staticmethod
+    def _try_debijbel(book_id: int, chapter: str, cached: Optional[CachedChapter] = None,
+                      echo: bool = True) -> tuple[str, str]:
+        """Try to fetch from debijbel.nl (NBG - cleaner, more reliable)."""
+        return BibleFetcher._try_source("debijbel", book_id, chapter, cached, echo)
+
+    @staticmethod
+    def _try_hispage(book_id: int, chapter: str, cached: Optional[CachedChapter] = None,
+                     echo: bool = True) -> tuple[str, str]:
+        """Fallback to bible.hispage.nl with improved parsing."""
+        return BibleFetcher._try_source("hispage", book_id, chapter, cached, echo)
+
+    @staticmethod
+    def _try_source(source: str, book_id: int, chapter: str, cached: Optional[CachedChapter],
+                    echo: bool = True) -> tuple[str, str]:
+        """One source's fetch on the shared requests session."""
+        request, result = BibleFetcher._source_steps(source)
+        url, headers, read_timeout, log = request(book_id, chapter, cached)
+        if url is None:
+            return "[Boek niet gevonden]", log
+        if echo:
+            print(f"   (Ophalen van {url}...)")
+        try:
+            response = BibleFetcher._get(source, url, headers, read_timeout)
+            return result(book_id, chapter, cached, response, log, echo=echo)
+        except MissingRecording:
+            raise
+        except requests.RequestException as e:
+            log += f"\nException: {str(e)}"
+            return f"[Fout bij ophalen: {str(e)}]", log
+        except Exception as e:
+            # The source answered; the page could not be handled
+            log += f"\nException: {str(e)}"
+            return f"[Fout bij verwerken: {str(e)}]", log
+
+    @staticmethod
+    def _get(source: str, url: str, headers: dict, read_timeout: float) -> Page:
+        """GET on the shared session, or from the recordings in replay mode; recorded in record mode."""
+        replay = http_recordings("SOLLE_HTTP_REPLAY")
+        if replay:
+            return replay.load(source, url)
+        response = http_session().get(url, headers=headers, timeout=_timeouts(read_timeout))
+        record = http_recordings("SOLLE_HTTP_RECORD")
+        if record:
+            record.save(source, url, response)
+        return response
+
+    @staticmethod
+    def _source_steps(source: str):
+        """
+        (request, result) of a source. request gives (url or None, headers,
+        read timeout, log); result turns the response into (text, log),
+        storing it in the cache, and prints nothing with echo=False. The
+        HTTP call in between is the only part that differs between the sync
+        fetcher and AsyncBibleFetcher.
+        """
+        return {
+            "debijbel": (BibleFetcher._debijbel_request, BibleFetcher._debijbel_result),
+            "hispage": (BibleFetcher._hispage_request, BibleFetcher._hispage_result),
+        }[source]
+
+    @staticmethod
+    def _debijbel_request(book_id: int, chapter: str, cached: Optional[CachedChapter]) -> tuple:
+        log = "\n\n--- Poging 1: debijbel.nl (HSV) ---"
+
+        # Map book_id to debijbel.nl book abbreviation
+        book_abbrevs = {
+            1: "GEN", 2: "EXO", 3: "LEV", 4: "NUM", 5: "DEU", 6: "JOZ", 7: "RIC", 8: "RUT",
+            9: "1SA", 10: "2SA", 11: "1KO", 12: "2KO", 13: "1KR", 14: "2KR", 15: "EZR",
+            16: "NEH", 17: "EST", 18: "JOB", 19: "PSA", 20: "SPR", 21: "PRE", 22: "HOO",
+            23: "JES", 24: "JER", 25: "KLA", 26: "EZE", 27: "DAN", 28: "HOS", 29: "JOE",
+            30: "AMO", 31: "OBA", 32: "JON", 33: "MIC", 34: "NAH", 35: "HAB", 36: "SEF",
+            37: "HAG", 38: "ZAC", 39: "MAL", 40: "MAT", 41: "MAR", 42: "LUK", 43: "JOH",
+            44: "HAN", 45: "ROM", 46: "1KOR", 47: "2KOR", 48: "GAL", 49: "EFE", 50: "FIL",
+            51: "KOL", 52: "1TES", 53: "2TES", 54: "1TIM", 55: "2TIM", 56: "TIT", 57: "FLM",
+            58: "HEB", 59: "JAK", 60: "1PE", 61: "2PE", 62: "1JOH", 63: "2JOH", 64: "3JOH",
+            65: "JUD", 66: "OPE"
+        }
+
+        abbrev = book_abbrevs.get(book_id, "")
+        if not abbrev:
+            log += f"\nGeen abbreviatie voor book_id {book_id}"
+            return None, {}, 0, log
+
+        # debijbel.nl HSV format: https://debijbel.nl/bijbel/HSV/PSA.23
+        url = BibleFetcher.DEBIJBEL_URL.format(abbrev=abbrev, chapter=chapter)
+        log += f"\nURL: {url}"
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'nl-NL,nl;q=0.9,en;q=0.8'
+        }
+        if cached:
+            headers.update(cached.conditional_headers())
+        return url, headers, 15, log
+
+    @staticmethod
+    def _debijbel_result(book_id: int, chapter: str, cached: Optional[CachedChapter],
+                         response: Page, log: str, echo: bool = True) -> tuple[str, str]:
+        log += f"\nHTTP Status: {response.status_code}"
+        text = BibleFetcher._not_modified("debijbel", book_id, chapter, response, cached)
+        if text is not None:
+            log += "\nCache: hergevalideerd (304), tekst uit cache."
+            return text, log
+        if response.status_code != 200:
+            return f"[HTTP {response.status_code}]", log
+
+        memo = remembered_strategy("debijbel")
+        extraction = extract_debijbel(response.content, prefer=memo.strategy if memo else None)
+        log += BibleFetcher._note_extraction("debijbel", extraction, memo, echo)
+        verses_text = extraction.verses
+
+        if verses_text:
+            full_text = " ".join(verses_text)
+            # Clean up; the whole chapter is kept, fetch_text slices the verses
+            full_text = re.sub(r'\s+', ' ', full_text).strip()
+            log += f"\nSucces: {len(full_text)} karakters opgehaald."
+            BibleFetcher._store("debijbel", book_id, chapter, full_text, response)
+            return full_text, log
+
+        log += "\nGeen verzen gevonden op debijbel.nl"
+        return "[Geen tekst gevonden]", log
+
+    @staticmethod
+    def _hispage_request(book_id: int, chapter: str, cached: Optional[CachedChapter]) -> tuple:
+        log = "\n\n--- Poging 2: hispage.nl ---"
+
+        # v[]=6 is HSV (Herziene Statenvertaling)
+        url = BibleFetcher.HISPAGE_URL.format(book_id=book_id, chapter=chapter)
+        log += f"\nURL: {url}"
+        headers = {'User-Agent': 'Mozilla/5.0 (compatible; SermonBot/1.0)'}
+        if cached:
+            headers.update(cached.conditional_headers())
+        return url, headers, 10, log
+
+    @staticmethod
+    def _hispage_result(book_id: int, chapter: str, cached: Optional[CachedChapter],
+                        response: Page, log: str, echo: bool = True) -> tuple[str, str]:
+        log += f"\nHTTP Status: {response.status_code}"
+        text = BibleFetcher._not_modified("hispage", book_id, chapter, response, cached)
+        if text is not None:
+            log += "\nCache: hergevalideerd (304), tekst uit cache."
+            return text, log
+        if response.status_code != 200:
+            return f"[Fout bij ophalen: HTTP {response.status_code}]", log
+
+        # Cells that look like verses, menus removed, deduplicated
+        extraction = extract_hispage(response.content)
+        log += BibleFetcher._note_extraction("hispage", extraction, remembered_strategy("hispage"), echo)
+        verses = extraction.verses
+
+        if verses:
+            full_text = " ".join(verses)
+            full_text = re.sub(r'\s+', ' ', full_text).strip()
+
+            log += f"\nSucces: {len(full_text)} karakters opgehaald."
+            BibleFetcher._store("hispage", book_id, chapter, full_text, response)
+            return full_text, log
+
+        log += "\nGeen verzen gevonden met verbeterde parsing."
+        return "[Kon geen leesbare tekst extraheren.]", log
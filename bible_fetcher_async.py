@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Async counterpart of BibleFetcher, for asyncio services.
+
+AsyncBibleFetcher parses references, uses the chapter cache, races the
+sources with the same hedge delay and circuit breakers, and extracts and
+slices verses exactly like BibleFetcher: it calls the same request/result
+steps of each source (BibleFetcher._source_steps) and only makes the HTTP
+calls itself, with aiohttp on the event loop instead of requests on threads.
+The blocking parts of those steps (the SQLite chapter cache and parsing a
+page) run in the default executor, so the loop is never held up by them,
+and nothing is printed: everything is reported in the returned log.
+
+Concurrent requests per host are limited (SOLLE_HTTP_POOL_SIZE), requests
+are spaced by the shared rate limiter (SOLLE_HTTP_RATE), and connection
+errors and 429/5xx answers are retried with jittered exponential backoff
+(SOLLE_HTTP_RETRIES, SOLLE_HTTP_BACKOFF). Cancelling fetch_text cancels its
+outstanding requests; a source that loses a race is cancelled rather than
+left running. SOLLE_HTTP_RECORD / SOLLE_HTTP_REPLAY record and replay
+responses as for the sync fetcher.
+
+    async with AsyncBibleFetcher() as fetcher:
+        text, log = await fetcher.fetch_text("Jes 9:1-6; Luk 2:1-20")
+
+aiohttp is an optional dependency, only needed for this module.
+"""
+
+import os
+import asyncio
+import functools
+from urllib.parse import urlsplit
+from typing import Dict, Optional
+
+try:
+    import aiohttp
+except ImportError:  # optional: only the async fetcher needs it
+    aiohttp = None
+
+import bible_fetcher
+from bible_fetcher import BibleFetcher, CachedChapter, MissingRecording, Page, circuit_breaker, rate_limiter
+from sermon_data import backoff_delay
+
+
+class AsyncBibleFetcher:
+    """
+    Fetches Bible text like BibleFetcher.fetch_text, on an aiohttp session
+    owned by the instance. Use it as an async context manager, or call
+    close() when done.
+    """
+
+    def __init__(self, host_limit: Optional[int] = None):
+        if aiohttp is None:
+            raise ImportError("AsyncBibleFetcher needs aiohttp: pip install aiohttp")
+        self.host_limit = host_limit or int(os.getenv("SOLLE_HTTP_POOL_SIZE") or bible_fetcher.HTTP_POOL_SIZE)
+        self._session = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> "AsyncBibleFetcher":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _client(self) -> "aiohttp.ClientSession":
+        # Created on first use so that it belongs to the running event loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=self.host_limit))
+        return self._session
+
+    async def fetch_text(self, reference: str) -> tuple[str, str]:
+        """
+        BibleFetcher.fetch_text on the event loop; the chapters of a
+        multi-passage reference are fetched concurrently.
+        Returns: (text, log_details)
+        """
+        passages, parse_log = BibleFetcher.parse_passages(reference)
+        if not passages:
+            return "[Kon tekst niet automatisch ophalen. Fallback op interne kennis.]", parse_log
+
+        keys = BibleFetcher._chapter_keys(passages)
+        results = await asyncio.gather(*(self.fetch_chapter(book_id, chapter) for book_id, chapter in keys))
+        fetch_log = parse_log + "".join(log for _, _, log in results)
+        chapters = {key: (text, verses) for key, (text, verses, _) in zip(keys, results)}
+        return BibleFetcher._assemble(passages, chapters, fetch_log)
+
+    async def fetch_chapter(self, book_id: int, chapter: int) -> tuple[str, Dict[int, str], str]:
+        """Chapter text and verse map from the cache or the sources: (text, verses, log)."""
+        result, cached, fetch_log = await asyncio.to_thread(BibleFetcher._chapter_from_cache,
+                                                            book_id, chapter, echo=False)
+        if result:
+            return result
+        attempts = [(source, functools.partial(self._try_source, source, book_id, str(chapter), cached[source]))
+                    for source in BibleFetcher.SOURCES]
+        text, log = await self._race(attempts)
+        return BibleFetcher._chapter_result(text, fetch_log + log, cached)
+
+    async def _race(self, attempts: list) -> tuple[str, str]:
+        """BibleFetcher._race with tasks: losers and leftovers are cancelled, not abandoned."""
+        log = ""
+        queue = list(attempts)
+        pending = {}
+
+        def launch():
+            # As in BibleFetcher._race: only ask the breaker for a source that is started
+            nonlocal log
+            while queue:
+                source, fetch = queue.pop(0)
+                if circuit_breaker(source).allow():
+                    pending[asyncio.ensure_future(self._attempt(source, fetch))] = source
+                    return
+                log += f"\n\n--- {source} overgeslagen (circuit breaker open) ---"
+
+        text = "[Alle bronnen tijdelijk overgeslagen na herhaalde fouten.]"
+        try:
+            launch()
+            while pending:
+                hedge = bible_fetcher._hedge_delay()
+                done, _ = await asyncio.wait(pending, timeout=hedge if queue else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    log += f"\n\n(Geen antwoord binnen {hedge:g} s; volgende bron parallel gestart)"
+                    launch()
+                    continue
+                for task in done:
+                    pending.pop(task)
+                    text, attempt_log = task.result()
+                    log += attempt_log
+                    if not text.startswith("["):
+                        for source in pending.values():
+                            log += f"\n\n--- {source} afgebroken (andere bron was eerder) ---"
+                        return text, log
+                if queue and not pending:
+                    launch()
+            return text, log
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    async def _attempt(source: str, fetch) -> tuple[str, str]:
+        """Runs one source's fetch and reports the outcome to its circuit breaker."""
+        try:
+            text, log = await fetch()
+        except (asyncio.CancelledError, MissingRecording):
+            # Neither a success nor a failure; frees a half-open breaker's trial
+            circuit_breaker(source).cancel()
+            raise
+        circuit_breaker(source).record(not bible_fetcher._source_unavailable(text))
+        return text, log
+
+    async def _try_source(self, source: str, book_id: int, chapter: str,
+                          cached: Optional[CachedChapter]) -> tuple[str, str]:
+        """BibleFetcher._try_source with the request made on the event loop and the page handled off it."""
+        request, result = BibleFetcher._source_steps(source)
+        url, headers, read_timeout, log = request(book_id, chapter, cached)
+        if url is None:
+            return "[Boek niet gevonden]", log
+        try:
+            replay = bible_fetcher.http_recordings("SOLLE_HTTP_REPLAY")
+            if replay:
+                page = await asyncio.to_thread(replay.load, source, url)
+            else:
+                page = await self._get(url, headers, read_timeout)
+                record = bible_fetcher.http_recordings("SOLLE_HTTP_RECORD")
+                if record:
+                    await asyncio.to_thread(record.save, source, url, page)
+            return await asyncio.to_thread(result, book_id, chapter, cached, page, log, echo=False)
+        except MissingRecording:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log += f"\nException: {str(e) or type(e).__name__}"
+            return f"[Fout bij ophalen: {str(e) or type(e).__name__}]", log
+        except Exception as e:
+            # The source answered; the page could not be handled
+            log += f"\nException: {str(e) or type(e).__name__}"
+            return f"[Fout bij verwerken: {str(e) or type(e).__name__}]", log
+
+    async def _get(self, url: str, headers: dict, read_timeout: float) -> Page:
+        """GET with the per-host limit, the shared rate limit and retries on transient failures."""
+        retries = int(os.getenv("SOLLE_HTTP_RETRIES") or bible_fetcher.HTTP_RETRIES)
+        backoff = float(os.getenv("SOLLE_HTTP_BACKOFF") or bible_fetcher.HTTP_BACKOFF)
+        connect, read = bible_fetcher._timeouts(read_timeout)
+        timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        host = urlsplit(url).netloc
+        slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.host_limit))
+        for attempt in range(retries + 1):
+            if attempt:
+                # Full jitter, as _ThrottledSession on the sync session
+                await asyncio.sleep(backoff_delay(attempt, backoff, bible_fetcher.HTTP_BACKOFF_MAX))
+            async with slots:
+                await asyncio.sleep(rate_limiter.delay(url))
+                try:
+                    async with self._client().get(url, headers=headers, timeout=timeout) as response:
+                        page = Page(response.status, response.headers, await response.read())
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt == retries:
+                        raise
+                    continue
+            if page.status_code in bible_fetcher.HTTP_RETRY_STATUSES and attempt < retries:
+                continue
+            return page
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Reading lists for the batch scripts.
+
+A lectionary file holds one reading per line, optionally preceded by an ISO
+date ('2026-12-24  Luk 2:1-20'). Empty lines and everything after '#' are
+ignored. Used by 01__generate_sermon_solle.py (--batch) and
+03__prefetch_bible_texts.py.
+"""
+
+import re
+import datetime
+from typing import List, Optional
+
+_DATED_LINE = re.compile(r"^(\d{4}-\d{2}-\d{2})\s+(.+)$")
+
+
+def read_lectionary(paths: List[str], start: Optional[datetime.date] = None,
+                    end: Optional[datetime.date] = None) -> List[str]:
+    """References from lectionary files; with start/end only the dated lines in [start, end]."""
+    references = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                match = _DATED_LINE.match(line)
+                if match:
+                    date = datetime.date.fromisoformat(match.group(1))
+                    if (start and date < start) or (end and date > end):
+                        continue
+                    line = match.group(2).strip()
+                elif start or end:
+                    continue
+                references.append(line)
+    return references
@@ -0,0 +1,1171 @@
+#!/usr/bin/env python3
+"""
+Sermon Corpus Container
+
+Reads and writes the binary sermon data file (data/sermons.dat) shared by
+01__generate_sermon_solle.py and 02__feedback_sermon.py.
+
+Format SOLLE04 (current):
+    magic      7 bytes   b'SOLLE04'
+    version    <B        4
+    count      <I        number of records
+    meta_size  <I        size of the metadata section
+    codec      <B        0 = zlib, 1 = zlib with the preset dictionary below
+    dict_size  <I
+    dictionary XOR-obfuscated zlib preset dictionary (zdict), dict_size bytes
+    metadata   uncompressed, one column after the other:
+                 offset      count x <Q   absolute file offset of each record
+                 length      count x <I
+                 word_count  count x <I
+                 book_id     count x <B   1-66, 0 if the scripture names no book
+                 id, title, scripture: count x <I end offsets + UTF-8 blob
+    records    XOR-obfuscated, zlib-compressed UTF-8 JSON
+
+Format SOLLE03 (legacy, read-only): SOLLE04 without codec and dictionary
+(always plain zlib).
+
+Format SOLLE02 (legacy, read-only):
+    magic    7 bytes   b'SOLLE02'
+    version  <B        2
+    count    <I
+    index    count x (<Q offset, <I length)
+    records  as above
+
+Format SOLLE01 (legacy, read-only):
+    magic    7 bytes   b'SOLLE01'
+    version  <B        1
+    count    <H
+    records  count x (<I length, record)
+
+The offset column lets callers sample record indices first and decode only
+the chosen records, and the metadata columns can be filtered (see
+_SermonSource.query) without touching any record body. SOLLE01 files are
+indexed with a sequential scan over the length prefixes; for SOLLE01/02 the
+metadata is computed by decoding every record once.
+
+Updates go to an append-only journal next to the data file (see
+add_sermons); readers replay it on top of the base file, and compact() folds
+it back in. Writers serialize on a lock file and never block readers.
+
+The reader maps the file read-only with mmap and hands memoryview slices of
+the mapping to the XOR and inflate stages, so several processes reading the
+same file share the page cache instead of holding private copies.
+"""
+
+import os
+import json
+import collections
+import contextlib
+import hashlib
+import mmap
+import random
+import re
+import sqlite3
+import struct
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Tuple, NamedTuple, Optional, Iterable, Iterator
+
+try:
+    import numpy as np
+except ImportError:  # optional: xor_bytes falls back to big-int arithmetic
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialized
+    fcntl = None
+
+# Constants for binary sermon file
+SERMON_MAGIC = b'SOLLE04'
+SERMON_VERSION = 4
+SERMON_MAGIC_V3 = b'SOLLE03'
+SERMON_VERSION_V3 = 3
+SERMON_MAGIC_V2 = b'SOLLE02'
+SERMON_VERSION_V2 = 2
+SERMON_MAGIC_V1 = b'SOLLE01'
+SERMON_VERSION_V1 = 1
+SERMON_XOR_KEY = b'DorotheeS\xc3\xb6lle1929-2003MystiekEnVerzet'
+SERMON_DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sermons.dat")
+
+_INDEX_ENTRY = struct.Struct('<QI')  # SOLLE02 index table
+_DECODE_CHUNK = 64 * 1024
+
+# Record codecs (SOLLE04 header). Journal records always use plain zlib.
+CODEC_ZLIB = 0
+CODEC_ZLIB_DICT = 1
+CODECS = {'zlib': CODEC_ZLIB, 'zdict': CODEC_ZLIB_DICT}
+DICT_SIZE = 32 * 1024
+
+# Journal (<data file>.journal): header, then appended entries
+#   header  magic b'SOLLEJ1', base file <Q size, <Q mtime_ns
+#   entry   <I crc32 of the rest, <B op, <I meta_len, <I record_len,
+#           meta JSON (uncompressed), record (plain zlib, no dictionary)
+JOURNAL_MAGIC = b'SOLLEJ1'
+_JOURNAL_HEADER = struct.Struct('<7sQQ')
+_JOURNAL_ENTRY = struct.Struct('<IBII')
+_OP_ADD, _OP_REPLACE, _OP_DELETE = 1, 2, 3
+CACHE_SCHEMA = 3
+
+# read_many() decodes serially below this many records; pool start-up costs more
+PARALLEL_MIN_RECORDS = 1000
+
+# Book number ranges (BibleFetcher.BOOK_MAPPING numbering) for metadata queries
+TESTAMENTS = {'OT': range(1, 40), 'NT': range(40, 67)}
+GOSPELS = range(40, 44)
+
+
+class SermonDataError(ValueError):
+    """A record in the data file or its journal fails to decode."""
+
+
+@contextlib.contextmanager
+def _checked(i: int, where: str):
+    """Reports zlib, UTF-8 and JSON failures as a SermonDataError naming record i."""
+    try:
+        yield
+    except SermonDataError:
+        raise
+    except (zlib.error, ValueError) as e:
+        raise SermonDataError(f"Corrupt sermon record {i} ({where}): {e}") from e
+
+
+class SermonMeta(NamedTuple):
+    """Per-record metadata, available without decoding the record."""
+    index: int
+    id: Optional[str]
+    title: Optional[str]
+    scripture: Optional[str]
+    book_id: int
+    word_count: int
+
+
+def book_id_for(scripture: str) -> int:
+    """Book number (1-66) of a scripture reference such as 'Lucas 2', 0 if none."""
+    # Imported here so that reading the corpus does not require requests/bs4
+    from bible_fetcher import BibleFetcher
+
+    match = re.match(rf"^({BibleFetcher._BOOK_PATTERN})", (scripture or '').lower().strip())
+    if not match:
+        return 0
+    return BibleFetcher.lookup_book(match.group(1).strip()).book_id or 0
+
+
+def related_books(book_id: int) -> range:
+    """The gospels for a gospel reading, otherwise the reading's testament."""
+    if book_id in GOSPELS:
+        return GOSPELS
+    for books in TESTAMENTS.values():
+        if book_id in books:
+            return books
+    return range(0)
+
+
+def _meta_for(index: int, sermon: Dict) -> SermonMeta:
+    return SermonMeta(index, sermon.get('id'), sermon.get('title'), sermon.get('scripture'),
+                      book_id_for(sermon.get('scripture', '')), len(sermon.get('text', '').split()))
+
+
+def _tiled_key(key: bytes, n: int, phase: int = 0) -> bytes:
+    """Repeats key to length n, starting at key position phase."""
+    phase %= len(key)
+    rotated = key[phase:] + key[:phase]
+    return (rotated * (n // len(key) + 1))[:n]
+
+
+def xor_bytes(data, key: bytes = SERMON_XOR_KEY, phase: int = 0) -> bytes:
+    """
+    XOR a whole buffer with a repeating key in one operation.
+
+    phase is the key position of data[0], so a record can be processed in
+    chunks. Uses NumPy when installed and big-int arithmetic otherwise.
+    """
+    n = len(data)
+    if n == 0:
+        return b''
+    tiled = _tiled_key(key, n, phase)
+    if np is not None:
+        return np.bitwise_xor(np.frombuffer(data, np.uint8), np.frombuffer(tiled, np.uint8)).tobytes()
+    x = int.from_bytes(data, 'little') ^ int.from_bytes(tiled, 'little')
+    return x.to_bytes(n, 'little')
+
+
+def xor_inplace(buf, key: bytes = SERMON_XOR_KEY, phase: int = 0):
+    """XOR a writable buffer (bytearray, writable memoryview) in place."""
+    view = memoryview(buf).cast('B')
+    if not view:
+        return
+    if np is not None:
+        arr = np.frombuffer(view, np.uint8)
+        np.bitwise_xor(arr, np.frombuffer(_tiled_key(key, len(view), phase), np.uint8), out=arr)
+    else:
+        view[:] = xor_bytes(view, key, phase)
+
+
+def _serialize(sermon: Dict) -> bytes:
+    """UTF-8 JSON of a sermon with 'text' last, so the header fields can be read
+    without inflating the body."""
+    ordered = {k: v for k, v in sermon.items() if k != 'text'}
+    if 'text' in sermon:
+        ordered['text'] = sermon['text']
+    return json.dumps(ordered, ensure_ascii=False).encode('utf-8')
+
+
+def _encode_record(sermon: Dict, zdict: Optional[bytes] = None) -> bytes:
+    """Serialize, compress and obfuscate a single sermon record."""
+    compressor = zlib.compressobj(9, zdict=zdict) if zdict else zlib.compressobj(9)
+    return xor_bytes(compressor.compress(_serialize(sermon)) + compressor.flush())
+
+
+def train_dictionary(sermons: List[Dict], size: int = DICT_SIZE, max_samples: int = 2000) -> bytes:
+    """
+    Builds a zlib preset dictionary from word n-grams shared between sermons.
+
+    Fragments are scored by document frequency times length; the best ones go
+    at the end of the dictionary, where zlib reaches them with the shortest
+    distances. At most max_samples evenly spaced sermons are used for training.
+    """
+    step = max(1, len(sermons) // max_samples)
+    counts = collections.Counter()
+    for sermon in sermons[::step]:
+        words = re.findall(rb'\S+\s*', _serialize(sermon))
+        grams = set()
+        for n in (1, 2, 3):
+            for i in range(len(words) - n + 1):
+                gram = b''.join(words[i:i + n])
+                if len(gram) >= 4:
+                    grams.add(gram)
+        counts.update(grams)
+
+    chosen, total = [], 0
+    for _, gram in sorted(((c * len(g), g) for g, c in counts.items() if c >= 2), reverse=True):
+        if total + len(gram) <= size:
+            chosen.append(gram)
+            total += len(gram)
+    return b''.join(reversed(chosen))
+
+
+def _choose_dictionary(sermons: List[Dict], max_samples: int = 200) -> bytes:
+    """
+    Trains a dictionary and returns the tail length (1 KiB .. DICT_SIZE, or
+    none) that minimizes dictionary plus records, estimated on a sample.
+
+    Small corpora cannot pay for a large dictionary stored in the header.
+    """
+    zdict = train_dictionary(sermons)
+    if not sermons or not zdict:
+        return b''
+    step = max(1, len(sermons) // max_samples)
+    sample = sermons[::step]
+    scale = len(sermons) / len(sample)
+
+    best, best_size = b'', scale * sum(len(_encode_record(s)) for s in sample)
+    size = 1024
+    while size <= DICT_SIZE:
+        candidate = zdict[-size:]
+        total = len(candidate) + scale * sum(len(_encode_record(s, candidate)) for s in sample)
+        if total < best_size:
+            best, best_size = candidate, total
+        size *= 2
+    return best
+
+
+# Longest prefix of a JSON string body that ends on a complete character or escape
+_JSON_STRING_PREFIX = re.compile(r'(?:[^"\\]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*')
+_HIGH_SURROGATE_TAIL = re.compile(r'\\u[dD][89abAB][0-9a-fA-F]{2}$')
+_TEXT_MARKER = b'"text": "'
+
+
+class _RecordStream:
+    """
+    Incrementally de-obfuscates and inflates one record.
+
+    Output is only produced as far as a caller asks for it, so the header
+    fields or the start of the text can be read without inflating the rest.
+    """
+
+    def __init__(self, obfuscated, zdict: Optional[bytes] = None):
+        # Reuse a caller's memoryview so that releasing it releases ours as well
+        self._view = obfuscated if isinstance(obfuscated, memoryview) else memoryview(obfuscated)
+        self._pos = 0
+        self._pending = b''
+        self._inflater = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        self.data = bytearray()
+
+    @property
+    def done(self) -> bool:
+        return self._inflater.eof
+
+    def fill(self, size: int = -1):
+        """Inflates until at least size bytes of JSON are available (-1: everything)."""
+        while (size < 0 or len(self.data) < size) and not self._inflater.eof:
+            if not self._pending and self._pos < len(self._view):
+                with self._view[self._pos:self._pos + _DECODE_CHUNK] as chunk:
+                    self._pending = xor_bytes(chunk, phase=self._pos)
+                self._pos += len(self._pending)
+            wanted = 0 if size < 0 else size - len(self.data)
+            out = self._inflater.decompress(self._pending, wanted)
+            self._pending = self._inflater.unconsumed_tail
+            if not out and not self._pending and self._pos >= len(self._view) and not self._inflater.eof:
+                raise zlib.error("Incomplete or truncated compressed record")
+            self.data += out
+
+    def header(self) -> Dict:
+        """Parses the fields in front of 'text' (all fields if there is no text)."""
+        while True:
+            pos = self.data.find(_TEXT_MARKER)
+            if pos >= 0:
+                return json.loads(bytes(self.data[:pos]).rstrip(b', ') + b'}')
+            if self.done:
+                return json.loads(self.data)
+            self.fill(len(self.data) + 4096)
+
+    def excerpt(self, n: int) -> str:
+        """Returns the first n characters of 'text', inflating no further than needed."""
+        self.header()
+        pos = self.data.find(_TEXT_MARKER)
+        if pos < 0:
+            return ''
+        start = pos + len(_TEXT_MARKER)
+        target = start + 2 * n
+        while True:
+            raw = bytes(self.data[start:]).decode('utf-8', errors='ignore')
+            body = _JSON_STRING_PREFIX.match(raw).group(0)
+            if _HIGH_SURROGATE_TAIL.search(body):
+                body = body[:-6]  # wait for the low half of an escaped surrogate pair
+            text = json.loads('"' + body + '"')
+            complete = len(body) < len(raw) and raw[len(body)] == '"'
+            if len(text) >= n or complete or self.done:
+                return text[:n]
+            target += 2 * n
+            self.fill(target)
+
+    def read_all(self) -> bytearray:
+        """The whole inflated record, without a final copy; json.loads takes a bytearray."""
+        self.fill()
+        if self._inflater.unused_data or self._pos < len(self._view):
+            raise zlib.error("Trailing data after compressed record")
+        return self.data
+
+
+def _decode_record(obfuscated, zdict: Optional[bytes] = None) -> Dict:
+    """
+    Reverse _encode_record.
+
+    Accepts any buffer (bytes or a memoryview into the mapped file) and streams
+    it through XOR and zlib.decompressobj in chunks, so the full de-obfuscated
+    record is never materialized. json.loads takes the UTF-8 bytes directly.
+    """
+    return json.loads(_RecordStream(obfuscated, zdict).read_all())
+
+
+def _decode_batch(batch: List[Tuple[int, str, bytes, Optional[bytes]]]) -> List[Dict]:
+    """Pool task for SermonReader.read_many: decodes (index, where, record, zdict) tuples in order."""
+    decoded = []
+    for i, where, record, zdict in batch:
+        with _checked(i, where):
+            decoded.append(_decode_record(record, zdict))
+    return decoded
+
+
+def _default_workers(count: int) -> int:
+    workers = os.getenv("SOLLE_DECODE_WORKERS")
+    if workers:
+        return max(1, int(workers))
+    return 1 if count < PARALLEL_MIN_RECORDS else min(os.cpu_count() or 1, 8)
+
+
+def reservoir_sample(items: Iterable, n: int, rng: random.Random = None) -> List:
+    """
+    n items drawn uniformly from an iterable of unknown length, in one pass
+    and O(n) memory (Algorithm R). The result is in random order.
+    """
+    rng = rng or random
+    reservoir = []
+    if n <= 0:
+        return reservoir
+    for seen, item in enumerate(items):
+        if seen < n:
+            reservoir.append(item)
+        else:
+            j = rng.randrange(seen + 1)
+            if j < n:
+                reservoir[j] = item
+    rng.shuffle(reservoir)
+    return reservoir
+
+
+class SermonRecord:
+    """
+    A sermon whose title and scripture are available immediately and whose
+    text is decoded only when it is first accessed.
+    """
+
+    __slots__ = ('id', 'title', 'scripture', '_source', '_index', '_text')
+
+    def __init__(self, source: '_SermonSource', index: int, header: Dict):
+        self.id = header.get('id')
+        self.title = header.get('title')
+        self.scripture = header.get('scripture')
+        self._source = source
+        self._index = index
+        self._text = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._source.read(self._index).get('text', '')
+        return self._text
+
+    def excerpt(self, n: int) -> str:
+        """First n characters of the text, without decoding the remainder."""
+        if self._text is not None:
+            return self._text[:n]
+        return self._source._excerpt(self._index, n)
+
+    def to_dict(self) -> Dict:
+        return self._source.read(self._index)
+
+    def __repr__(self) -> str:
+        return f"SermonRecord({self.title!r}, {self.scripture!r})"
+
+
+class _SermonSource:
+    """Common interface of SermonReader and SermonCache."""
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def read(self, i: int) -> Dict:
+        raise NotImplementedError
+
+    def _header(self, i: int) -> Dict:
+        raise NotImplementedError
+
+    def _excerpt(self, i: int, n: int) -> str:
+        raise NotImplementedError
+
+    def metadata(self) -> List[SermonMeta]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.read(i)
+
+    def record(self, i: int) -> SermonRecord:
+        """Lazy record: header fields now, text on first access."""
+        return SermonRecord(self, i, self._header(i))
+
+    def records(self):
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def read_many(self, indices: Optional[Iterable[int]] = None, workers: Optional[int] = None,
+                  processes: bool = False) -> List[Dict]:
+        """Decodes the given records (default: all), in order."""
+        return [self.read(i) for i in (range(len(self)) if indices is None else indices)]
+
+    def sample(self, n: int, rng: random.Random = None) -> List[Dict]:
+        """Picks n record indices at random and decodes only those records."""
+        rng = rng or random
+        indices = rng.sample(range(len(self)), min(n, len(self)))
+        return [self.read(i) for i in indices]
+
+    def sample_records(self, n: int, rng: random.Random = None,
+                       prefer: Optional[Iterable[int]] = None) -> List[SermonRecord]:
+        """
+        Like sample(), but returns lazy records.
+
+        With prefer, records are drawn from those indices first and the rest of
+        the corpus only fills up what is missing.
+        """
+        rng = rng or random
+        indices = reservoir_sample(prefer or (), n, rng)
+        if len(indices) < n:
+            taken = set(indices)
+            rest = (i for i in range(len(self)) if i not in taken)
+            indices += reservoir_sample(rest, n - len(indices), rng)
+        return [self.record(i) for i in indices]
+
+    def query(self, book_ids: Optional[Iterable[int]] = None, testament: Optional[str] = None,
+              min_words: int = 0, max_words: Optional[int] = None) -> List[int]:
+        """
+        Indices of the records matching every given filter.
+
+        Works on metadata() only, e.g. query(book_ids=GOSPELS) or
+        query(testament='OT', max_words=2000).
+        """
+        books = set(book_ids) if book_ids is not None else None
+        if testament is not None:
+            in_testament = set(TESTAMENTS[testament])
+            books = in_testament if books is None else books & in_testament
+        return [
+            meta.index for meta in self.metadata()
+            if (books is None or meta.book_id in books)
+            and meta.word_count >= min_words
+            and (max_words is None or meta.word_count <= max_words)
+        ]
+
+
+def _read_base_index(mm) -> Tuple[int, List[Tuple[int, int]], Optional[List[SermonMeta]], Optional[bytes]]:
+    """
+    Reads the header of a mapped data file:
+    (version, [(offset, length), ...], metadata or None, zdict or None).
+    """
+    magic = mm[:len(SERMON_MAGIC)]
+    pos = len(SERMON_MAGIC)
+    metadata = None
+    zdict = None
+
+    if magic in (SERMON_MAGIC, SERMON_MAGIC_V3):
+        version, count, meta_size = struct.unpack_from('<BII', mm, pos)
+        if (magic, version) not in ((SERMON_MAGIC, SERMON_VERSION), (SERMON_MAGIC_V3, SERMON_VERSION_V3)):
+            raise ValueError(f"Unsupported sermon data version: {version}")
+        pos += 9
+        if version >= 4:
+            codec, dict_size = struct.unpack_from('<BI', mm, pos)
+            pos += 5
+            if codec not in CODECS.values():
+                raise ValueError(f"Unsupported sermon codec: {codec}")
+            if pos + dict_size > len(mm):
+                raise ValueError("Truncated sermon dictionary")
+            if codec == CODEC_ZLIB_DICT:
+                zdict = xor_bytes(mm[pos:pos + dict_size])
+            pos += dict_size
+        if pos + meta_size > len(mm):
+            raise ValueError("Truncated sermon metadata section")
+        meta = mm[pos:pos + meta_size]
+        offsets, lengths, _, _ = _unpack_columns(meta, count)
+        index = list(zip(offsets, lengths))
+        metadata = _unpack_metadata(meta, count)
+
+    elif magic == SERMON_MAGIC_V2:
+        version, count = struct.unpack_from('<BI', mm, pos)
+        if version != SERMON_VERSION_V2:
+            raise ValueError(f"Unsupported sermon data version: {version}")
+        pos += 5
+        end = pos + count * _INDEX_ENTRY.size
+        if end > len(mm):
+            raise ValueError("Truncated sermon index table")
+        index = list(_INDEX_ENTRY.iter_unpack(mm[pos:end]))
+
+    elif magic == SERMON_MAGIC_V1:
+        version, count = struct.unpack_from('<BH', mm, pos)
+        if version != SERMON_VERSION_V1:
+            raise ValueError(f"Unsupported sermon data version: {version}")
+        pos += 3
+        # No offset table: walk the length prefixes, skipping the bodies
+        index = []
+        for _ in range(count):
+            length = struct.unpack_from('<I', mm, pos)[0]
+            index.append((pos + 4, length))
+            pos += 4 + length
+
+    else:
+        raise ValueError("Invalid sermon data file format")
+
+    for i, (offset, length) in enumerate(index):
+        if offset + length > len(mm):
+            raise ValueError(f"Truncated sermon record {i}")
+    return version, index, metadata, zdict
+
+
+class SermonReader(_SermonSource):
+    """
+    Random-access, memory-mapped reader for SOLLE04 (and legacy SOLLE01-03)
+    sermon files, with the journal (see add_sermons) replayed on top.
+    """
+
+    def __init__(self, binary_file: str, use_journal: bool = True):
+        self.path = binary_file
+        self._maps = []
+        try:
+            base, base_key = self._map(binary_file)
+            self.version, index, metadata, zdict = _read_base_index(base)
+            self._index = [(base, offset, length, zdict) for offset, length in index]
+            self._meta = metadata or [None] * len(index)
+            if use_journal and os.path.exists(journal_path(binary_file)):
+                self._apply_journal(journal_path(binary_file), base_key)
+        except Exception:
+            self.close()
+            raise
+
+    def _map(self, path: str) -> Tuple[mmap.mmap, Tuple[int, int]]:
+        """Maps path read-only; returns the mapping and the (size, mtime_ns) of the mapped file."""
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # mmap refuses empty files
+                raise ValueError(f"Invalid sermon data file format: {path}")
+        self._maps.append(mm)
+        return mm, (st.st_size, st.st_mtime_ns)
+
+    def _apply_journal(self, path: str, base_key: Tuple[int, int]):
+        """Replays add/replace/delete entries; a journal written for another base file is ignored."""
+        journal, _ = self._map(path)
+        positions = None  # id -> position, built on the first replace/delete
+        for op, meta, offset, length in _journal_entries(journal, base_key):
+            if op == _OP_ADD:
+                self._index.append((journal, offset, length, None))
+                self._meta.append(SermonMeta(0, **meta))
+                if positions is not None:
+                    positions[meta['id']] = len(self._index) - 1
+                continue
+
+            if positions is None:
+                positions = {self._header(i).get('id'): i
+                             for i, record in enumerate(self._index) if record is not None}
+            pos = positions.get(meta['id'])
+            if pos is None:
+                continue
+            if op == _OP_REPLACE:
+                self._index[pos] = (journal, offset, length, None)
+                self._meta[pos] = SermonMeta(0, **meta)
+            else:
+                self._index[pos] = self._meta[pos] = None
+                del positions[meta['id']]
+
+        live = [i for i, record in enumerate(self._index) if record is not None]
+        self._index = [self._index[i] for i in live]
+        self._meta = [self._meta[i] for i in live]
+        self._meta = [meta._replace(index=n) if meta else None for n, meta in enumerate(self._meta)]
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def close(self):
+        for mm in self._maps:
+            mm.close()
+        self._maps = []
+
+    def _view(self, i: int) -> memoryview:
+        mm, offset, length, _ = self._index[i]
+        return memoryview(mm)[offset:offset + length]
+
+    def _where(self, i: int) -> str:
+        mm, offset, length, _ = self._index[i]
+        path = self.path if mm is self._maps[0] else journal_path(self.path)
+        return f"{path}, offset {offset}, {length} bytes"
+
+    def _zdict(self, i: int) -> Optional[bytes]:
+        return self._index[i][3]
+
+    def read(self, i: int) -> Dict:
+        """Decodes record i straight from the mapped file."""
+        with self._view(i) as record, _checked(i, self._where(i)):
+            return _decode_record(record, self._zdict(i))
+
+    def read_many(self, indices: Optional[Iterable[int]] = None, workers: Optional[int] = None,
+                  processes: bool = False) -> List[Dict]:
+        """
+        Decodes many records across a worker pool; results come back in order.
+
+        Threads (the default) share the mapping and overlap the zlib stage,
+        which releases the GIL; json.loads does not, so for large corpora
+        processes=True scales further at the cost of copying every record to
+        a worker and pickling the decoded dict back. workers defaults to
+        SOLLE_DECODE_WORKERS, or to serial decoding below PARALLEL_MIN_RECORDS
+        records and one worker per CPU (at most 8) above.
+        """
+        indices = list(range(len(self)) if indices is None else indices)
+        workers = workers or _default_workers(len(indices))
+        if workers <= 1 or len(indices) < 2:
+            return [self.read(i) for i in indices]
+
+        # A few batches per worker keeps the pool busy without a task per record
+        size = -(-len(indices) // (workers * 4))
+        if processes:
+            batches = [[(i, self._where(i), bytes(self._view(i)), self._zdict(i)) for i in indices[start:start + size]]
+                       for start in range(0, len(indices), size)]
+            pool = ProcessPoolExecutor(workers)
+        else:
+            batches = [[(i, self._where(i), self._view(i), self._zdict(i)) for i in indices[start:start + size]]
+                       for start in range(0, len(indices), size)]
+            pool = ThreadPoolExecutor(workers)
+        try:
+            with pool:
+                return [sermon for decoded in pool.map(_decode_batch, batches) for sermon in decoded]
+        finally:
+            if not processes:
+                for batch in batches:
+                    for _, _, view, _ in batch:
+                        view.release()
+
+    def _header(self, i: int) -> Dict:
+        meta = self._meta[i]
+        if meta is not None:
+            return {k: v for k, v in (('id', meta.id), ('title', meta.title), ('scripture', meta.scripture))
+                    if v is not None}
+        with self._view(i) as record, _checked(i, self._where(i)):
+            return _RecordStream(record, self._zdict(i)).header()
+
+    def metadata(self) -> List[SermonMeta]:
+        """Reads the metadata section; legacy records are decoded once to build it."""
+        if any(meta is None for meta in self._meta):
+            self._meta = [meta or _meta_for(i, self.read(i)) for i, meta in enumerate(self._meta)]
+        return self._meta
+
+    def _excerpt(self, i: int, n: int) -> str:
+        with self._view(i) as record, _checked(i, self._where(i)):
+            return _RecordStream(record, self._zdict(i)).excerpt(n)
+
+
+def cache_dir() -> str:
+    """
+    Directory of the solle caches (sermons, Bible chapters, model responses);
+    read at call time so values from .env are honoured.
+    """
+    return os.getenv("SOLLE_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "solle")
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff before retry `attempt` (1, 2, ...)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def _file_key(binary_file: str) -> Dict[str, str]:
+    """
+    Size, mtime and SHA-256 of the data file and its journal; the cache is
+    valid only if all of them match.
+    """
+    key = {'schema': str(CACHE_SCHEMA)}
+    digest = hashlib.sha256()
+    for name, path in (('', binary_file), ('journal_', journal_path(binary_file))):
+        if not os.path.exists(path):
+            continue
+        st = os.stat(path)
+        key[f'{name}size'] = str(st.st_size)
+        key[f'{name}mtime_ns'] = str(st.st_mtime_ns)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    key['sha256'] = digest.hexdigest()
+    return key
+
+
+class SermonCache(_SermonSource):
+    """
+    Decoded sermons in a local SQLite file, one JSON row per record.
+
+    Reading from the cache skips XOR and zlib entirely, and sampling still only
+    touches the chosen rows. The cache is keyed on the data file's size, mtime
+    and content hash and rebuilt as soon as any of them change. The text is
+    stored in its own column so titles and excerpts are read without it. A rebuild is
+    written to a temporary file and moved into place with os.replace, so
+    concurrent runs never see a half-written cache.
+    """
+
+    def __init__(self, db_path: str):
+        self.path = db_path
+        self._db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            self.key = dict(self._db.execute("SELECT name, value FROM meta"))
+            self._count = self._db.execute("SELECT COUNT(*) FROM sermons").fetchone()[0]
+        except sqlite3.Error:
+            self._db.close()
+            raise
+
+    @staticmethod
+    def path_for(binary_file: str) -> str:
+        name = hashlib.sha256(os.path.abspath(binary_file).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(cache_dir(), f"sermons-{name}.sqlite")
+
+    @classmethod
+    def open(cls, binary_file: str) -> 'SermonCache':
+        """Opens the cache for binary_file, (re)building it when it is missing or stale."""
+        key = _file_key(binary_file)
+        db_path = cls.path_for(binary_file)
+
+        if os.path.exists(db_path):
+            try:
+                cache = cls(db_path)
+                if cache.key == key:
+                    return cache
+                cache.close()
+            except sqlite3.Error:
+                pass  # Corrupt or foreign file: rebuild below
+
+        cls.build(binary_file, db_path, key)
+        return cls(db_path)
+
+    @staticmethod
+    def build(binary_file: str, db_path: str, key: Dict[str, str]):
+        """Decodes binary_file into a fresh cache and atomically replaces db_path."""
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix="sermons-", suffix=".tmp", dir=os.path.dirname(db_path))
+        os.close(fd)
+        try:
+            db = sqlite3.connect(tmp_path)
+            try:
+                db.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)")
+                db.execute(
+                    "CREATE TABLE sermons (idx INTEGER PRIMARY KEY, header TEXT, text TEXT,"
+                    " title TEXT, scripture TEXT, book_id INTEGER, word_count INTEGER)"
+                )
+                with SermonReader(binary_file) as reader:
+                    db.executemany("INSERT INTO sermons VALUES (?, ?, ?, ?, ?, ?, ?)", (
+                        (i,
+                         json.dumps({k: v for k, v in sermon.items() if k != 'text'}, ensure_ascii=False),
+                         sermon.get('text'),
+                         *_meta_for(i, sermon)[2:])
+                        for i, sermon in enumerate(reader.read_many())
+                    ))
+                db.executemany("INSERT INTO meta VALUES (?, ?)", key.items())
+                db.commit()
+            finally:
+                db.close()
+            os.replace(tmp_path, db_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        self._db.close()
+
+    def _row(self, columns: str, i: int, *params) -> tuple:
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return self._db.execute(f"SELECT {columns} FROM sermons WHERE idx = ?", (*params, i)).fetchone()
+
+    def read(self, i: int) -> Dict:
+        header, text = self._row("header, text", i)
+        sermon = json.loads(header)
+        if text is not None:
+            sermon['text'] = text
+        return sermon
+
+    def _header(self, i: int) -> Dict:
+        return json.loads(self._row("header", i)[0])
+
+    def _excerpt(self, i: int, n: int) -> str:
+        return self._row("substr(text, 1, ?)", i, n)[0] or ''
+
+    def metadata(self) -> List[SermonMeta]:
+        rows = self._db.execute(
+            "SELECT idx, json_extract(header, '$.id'), title, scripture, book_id, word_count"
+            " FROM sermons ORDER BY idx"
+        )
+        return [SermonMeta(*row) for row in rows]
+
+
+def open_corpus(binary_file: str = SERMON_DATA_FILE, use_cache: bool = True) -> _SermonSource:
+    """
+    Opens the sermon corpus, preferring the decoded cache.
+
+    Falls back to reading the data file directly when the cache is disabled
+    (use_cache=False or SOLLE_NO_CACHE=1), cannot be written, or cannot be
+    built because a record is corrupt; that record then fails on its own.
+    """
+    if not os.path.exists(binary_file):
+        raise FileNotFoundError(f"Sermon data file not found: {binary_file}")
+    if use_cache and not os.getenv("SOLLE_NO_CACHE"):
+        try:
+            return SermonCache.open(binary_file)
+        except (OSError, sqlite3.Error, SermonDataError) as e:
+            print(f"Preekcache niet beschikbaar ({e}); bestand wordt direct gelezen.")
+    return SermonReader(binary_file)
+
+
+def iter_sermons(binary_file: str = SERMON_DATA_FILE, use_cache: bool = True) -> Iterator[Dict]:
+    """
+    Yields the sermons one at a time, decoding each record only when it is
+    reached, so work can start at once and the corpus never has to fit in
+    memory. A corrupt record raises SermonDataError when it is reached.
+    """
+    if not os.path.exists(binary_file):
+        print(f"Sermon data file not found: {binary_file}")
+        return
+
+    with open_corpus(binary_file, use_cache) as corpus:
+        yield from corpus
+
+
+def load_sermons(binary_file: str = SERMON_DATA_FILE) -> List[Dict]:
+    """Load all sermons from the binary data file."""
+    if not os.path.exists(binary_file):
+        print(f"Sermon data file not found: {binary_file}")
+        return []
+
+    with open_corpus(binary_file) as corpus:
+        return corpus.read_many()
+
+
+def sample_sermons(n: int, binary_file: str = SERMON_DATA_FILE) -> List[Dict]:
+    """Load n random sermons, decoding only the sampled records."""
+    if not os.path.exists(binary_file):
+        print(f"Sermon data file not found: {binary_file}")
+        return []
+
+    with open_corpus(binary_file) as corpus:
+        return corpus.sample(n)
+
+
+def load_random_examples(n: int, excerpt_chars: int, scripture: Optional[str] = None,
+                         seed: Optional[str] = None, binary_file: str = SERMON_DATA_FILE) -> List[Dict]:
+    """
+    Loads n random sermons as style examples: title, scripture and the first
+    excerpt_chars characters of the text. Sermons on related books (the
+    gospels for a gospel reading, otherwise the same testament) are preferred
+    when a scripture reference is given. The same seed (SOLLE_SEED) gives the
+    same examples on the same data file.
+    """
+    examples = []
+    try:
+        with open_corpus(binary_file) as corpus:
+            # Only the sampled records are touched, and only their excerpts inflated
+            preferred = corpus.query(book_ids=related_books(book_id_for(scripture))) if scripture else None
+            rng = random.Random(seed) if seed is not None else None
+            for record in corpus.sample_records(n, rng=rng, prefer=preferred):
+                if record.scripture is None:
+                    continue
+                try:
+                    text = record.excerpt(excerpt_chars)
+                except SermonDataError as e:
+                    # Skip a damaged record instead of losing all examples
+                    print(f"Preek overgeslagen: {e}")
+                    continue
+                examples.append({
+                    'title': record.title if record.title is not None else 'Onbekend',
+                    'scripture': record.scripture,
+                    'text': text + "..."
+                })
+    except Exception as e:
+        print(f"Error loading sermon data: {e}")
+        return []
+
+    return examples
+
+
+def _pack_strings(values: List[Optional[str]]) -> bytes:
+    """String column: end offsets followed by the concatenated UTF-8 values."""
+    encoded = [(v or '').encode('utf-8') for v in values]
+    ends, end = [], 0
+    for e in encoded:
+        end += len(e)
+        ends.append(end)
+    return struct.pack(f'<{len(ends)}I', *ends) + b''.join(encoded)
+
+
+def _unpack_strings(buf, pos: int, count: int) -> Tuple[List[Optional[str]], int]:
+    ends = struct.unpack_from(f'<{count}I', buf, pos)
+    pos += 4 * count
+    blob = bytes(buf[pos:pos + (ends[-1] if ends else 0)])
+    values, start = [], 0
+    for end in ends:
+        values.append(blob[start:end].decode('utf-8') or None)
+        start = end
+    return values, pos + len(blob)
+
+
+def _unpack_columns(buf, count: int) -> Tuple[tuple, tuple, tuple, tuple]:
+    """The fixed-width columns: offset, length, word_count, book_id."""
+    offsets = struct.unpack_from(f'<{count}Q', buf, 0)
+    lengths = struct.unpack_from(f'<{count}I', buf, 8 * count)
+    word_counts = struct.unpack_from(f'<{count}I', buf, 12 * count)
+    book_ids = struct.unpack_from(f'<{count}B', buf, 16 * count)
+    return offsets, lengths, word_counts, book_ids
+
+
+def _unpack_metadata(buf, count: int) -> List[SermonMeta]:
+    _, _, word_counts, book_ids = _unpack_columns(buf, count)
+    pos = 17 * count
+    ids, pos = _unpack_strings(buf, pos, count)
+    titles, pos = _unpack_strings(buf, pos, count)
+    scriptures, pos = _unpack_strings(buf, pos, count)
+    return [SermonMeta(i, ids[i], titles[i], scriptures[i], book_ids[i], word_counts[i]) for i in range(count)]
+
+
+def write_sermons(binary_file: str, sermons: List[Dict], codec: int = CODEC_ZLIB_DICT):
+    """
+    Write sermons to binary_file in the current (SOLLE04) format.
+
+    With CODEC_ZLIB_DICT a preset dictionary is trained on the sermons and
+    stored once in the header; when no dictionary makes the file smaller the
+    records are written with CODEC_ZLIB.
+    """
+    zdict = _choose_dictionary(sermons) if codec == CODEC_ZLIB_DICT else b''
+    if not zdict:
+        codec = CODEC_ZLIB
+    records = [_encode_record(s, zdict) for s in sermons]
+    metas = [_meta_for(i, s) for i, s in enumerate(sermons)]
+    count = len(records)
+
+    tail = (
+        struct.pack(f'<{count}I', *(m.word_count for m in metas))
+        + struct.pack(f'<{count}B', *(m.book_id for m in metas))
+        + _pack_strings([m.id for m in metas])
+        + _pack_strings([m.title for m in metas])
+        + _pack_strings([m.scripture for m in metas])
+    )
+    meta_size = 12 * count + len(tail)
+    offset = len(SERMON_MAGIC) + 14 + len(zdict) + meta_size
+    offsets = []
+    for rec in records:
+        offsets.append(offset)
+        offset += len(rec)
+
+    tmp_path = binary_file + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(SERMON_MAGIC)
+        f.write(struct.pack('<BIIBI', SERMON_VERSION, count, meta_size, codec, len(zdict)))
+        f.write(xor_bytes(zdict))
+        f.write(struct.pack(f'<{count}Q', *offsets))
+        f.write(struct.pack(f'<{count}I', *(len(rec) for rec in records)))
+        f.write(tail)
+        for rec in records:
+            f.write(rec)
+    os.replace(tmp_path, binary_file)
+
+
+def journal_path(binary_file: str) -> str:
+    return binary_file + ".journal"
+
+
+def _journal_base_key(binary_file: str) -> Tuple[int, int]:
+    st = os.stat(binary_file)
+    return st.st_size, st.st_mtime_ns
+
+
+def _journal_matches(path: str, base_key: Tuple[int, int]) -> bool:
+    """True if the journal at path exists and was started for the given base file."""
+    if not os.path.exists(path):
+        return False
+    with open(path, 'rb') as f:
+        header = f.read(_JOURNAL_HEADER.size)
+    return len(header) == _JOURNAL_HEADER.size and _JOURNAL_HEADER.unpack(header) == (JOURNAL_MAGIC, *base_key)
+
+
+def _journal_entries(buf, base_key: Tuple[int, int]):
+    """
+    Yields (op, meta, record_offset, record_length) for each intact entry.
+
+    Stops at the first incomplete or corrupt entry, which is what a reader sees
+    while a writer is still appending.
+    """
+    if len(buf) < _JOURNAL_HEADER.size or buf[:len(JOURNAL_MAGIC)] != JOURNAL_MAGIC:
+        return
+    _, size, mtime_ns = _JOURNAL_HEADER.unpack_from(buf, 0)
+    if (size, mtime_ns) != tuple(base_key):
+        return  # Written for an older base file (already compacted)
+
+    pos = _JOURNAL_HEADER.size
+    while pos + _JOURNAL_ENTRY.size <= len(buf):
+        crc, op, meta_len, record_len = _JOURNAL_ENTRY.unpack_from(buf, pos)
+        body = pos + _JOURNAL_ENTRY.size
+        end = body + meta_len + record_len
+        if end > len(buf) or zlib.crc32(buf[pos + 4:end]) != crc:
+            return
+        meta = json.loads(buf[body:body + meta_len])
+        yield op, meta, body + meta_len, record_len
+        pos = end
+
+
+def _journal_entry(op: int, sermon: Dict) -> bytes:
+    if op == _OP_DELETE:
+        meta, record = {'id': sermon['id']}, b''
+    else:
+        meta, record = _meta_for(0, sermon)._asdict(), _encode_record(sermon)
+        del meta['index']
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    body = _JOURNAL_ENTRY.pack(0, op, len(meta_bytes), len(record))[4:] + meta_bytes + record
+    return struct.pack('<I', zlib.crc32(body)) + body
+
+
+@contextlib.contextmanager
+def _writer_lock(binary_file: str):
+    """Serializes writers (journal appends, compaction). Readers never take it."""
+    with open(binary_file + ".lock", 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _append_journal(binary_file: str, op: int, sermons: List[Dict]):
+    """Validates the ids against the current corpus and appends the entries."""
+    with _writer_lock(binary_file):
+        if not os.path.exists(binary_file):
+            write_sermons(binary_file, [])
+        with SermonReader(binary_file) as reader:
+            ids = {meta.id for meta in reader.metadata()}
+
+        entries = []
+        for sermon in sermons:
+            sermon_id = sermon.get('id')
+            if not sermon_id:
+                raise ValueError(f"Sermon without 'id': {sermon.get('title')!r}")
+            if op == _OP_ADD and sermon_id in ids:
+                raise ValueError(f"Sermon id already exists: {sermon_id}")
+            if op != _OP_ADD and sermon_id not in ids:
+                raise ValueError(f"Unknown sermon id: {sermon_id}")
+            if op == _OP_DELETE:
+                ids.discard(sermon_id)
+            else:
+                ids.add(sermon_id)
+            entries.append(_journal_entry(op, sermon))
+
+        path = journal_path(binary_file)
+        base_key = _journal_base_key(binary_file)
+        if _journal_matches(path, base_key):
+            with open(path, 'ab') as f:
+                f.write(b''.join(entries))
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            # New journal, or one left over from before the base file was
+            # rewritten. Replaced rather than truncated: readers may have it mapped.
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(_JOURNAL_HEADER.pack(JOURNAL_MAGIC, *base_key))
+                f.write(b''.join(entries))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+
+
+def add_sermons(binary_file: str, sermons: List[Dict]):
+    """Appends new sermons to the journal; their ids must not exist yet."""
+    _append_journal(binary_file, _OP_ADD, sermons)
+
+
+def replace_sermons(binary_file: str, sermons: List[Dict]):
+    """Appends replacements for existing sermons (matched on 'id')."""
+    _append_journal(binary_file, _OP_REPLACE, sermons)
+
+
+def delete_sermons(binary_file: str, sermon_ids: List[str]):
+    """Appends tombstones for the given sermon ids."""
+    _append_journal(binary_file, _OP_DELETE, [{'id': sermon_id} for sermon_id in sermon_ids])
+
+
+def compact(binary_file: str, codec: int = CODEC_ZLIB_DICT) -> int:
+    """
+    Folds the journal into a fresh data file in the current format.
+
+    The new file replaces the old one atomically and the journal is removed
+    afterwards; readers that still have the old files open are unaffected, and
+    a reader that sees the new file with the old journal ignores the journal
+    because it names a different base file.
+    """
+    with _writer_lock(binary_file):
+        with SermonReader(binary_file) as reader:
+            sermons = list(reader)
+        write_sermons(binary_file, sermons, codec)
+        if os.path.exists(journal_path(binary_file)):
+            os.remove(journal_path(binary_file))
+    return len(sermons)
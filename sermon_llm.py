@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Model calls shared by 01__generate_sermon_solle.py and 02__feedback_sermon.py.
+
+generate_text() wraps model.generate_content(prompt). With SOLLE_STREAM=1
+the response is streamed and every chunk is handed to the caller's on_chunk
+callback as it arrives; otherwise on_chunk receives the whole text once.
+Callers write their console output and files through that callback, so a
+long sermon shows up (and is saved) while it is being written, and an
+interrupted run leaves the part that had arrived.
+
+With SOLLE_LLM_CACHE=1 responses are kept in a local SQLite cache
+(llm.sqlite in SOLLE_CACHE_DIR), keyed on a hash of the model name, system
+instruction, generation config and prompt, so a rerun with the same input
+costs no API calls. The cache is bounded (SOLLE_LLM_CACHE_MB) and evicts the
+least recently used responses; SOLLE_LLM_CACHE_BYPASS=1 asks the model anyway
+and replaces the cached answer. Set SOLLE_SEED to make the choice of example
+sermons, and with it the prompts, repeatable.
+
+All calls share one quota (SOLLE_LLM_RPM requests and SOLLE_LLM_TPM tokens
+per minute, token buckets), and rate-limit (429) and server errors are
+retried with jittered exponential backoff as long as no text has been
+passed on yet.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Callable, IO, Optional, Tuple
+from sermon_data import backoff_delay, cache_dir
+
+# Size bound of the response cache in megabytes (SOLLE_LLM_CACHE_MB)
+LLM_CACHE_MB = 50
+# Model quota, 0 for no limit: requests and tokens per minute (SOLLE_LLM_RPM,
+# SOLLE_LLM_TPM); the job queue runner sets defaults
+LLM_RPM = 0
+LLM_TPM = 0
+# Expected response size, charged against the token quota until the actual usage is known
+OUTPUT_TOKEN_ESTIMATE = 4000
+# Retries of rate-limited (429) and failed (500, 503) calls (SOLLE_LLM_RETRIES, SOLLE_LLM_BACKOFF)
+LLM_RETRIES = 5
+LLM_BACKOFF = 2.0
+LLM_BACKOFF_MAX = 60.0
+LLM_RETRY_CODES = (429, 500, 503)
+
+
+class TokenBucket:
+    """
+    Token bucket holding at most one minute's allowance, refilled
+    continuously. reserve() takes from it right away, running into debt if
+    need be, and returns how long the caller has to wait for that debt to
+    be paid off, so concurrent callers queue up in order.
+    """
+
+    def __init__(self):
+        self._level = None
+        self._stamp = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, per_minute: float) -> float:
+        now = time.monotonic()
+        if self._level is None:
+            self._level = per_minute
+        self._level = min(per_minute, self._level + (now - self._stamp) * per_minute / 60)
+        self._stamp = now
+        return now
+
+    def reserve(self, amount: float, per_minute: float) -> float:
+        """Takes amount (0 without a limit); returns the seconds to wait."""
+        if per_minute <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(per_minute)
+            # More than a minute's allowance waits for a full bucket, not forever
+            self._level -= min(amount, per_minute)
+            return max(0.0, -self._level * 60 / per_minute)
+
+    def settle(self, amount: float, per_minute: float):
+        """Corrects an earlier reservation by amount (negative gives back)."""
+        if per_minute <= 0:
+            return
+        with self._lock:
+            self._refill(per_minute)
+            self._level = min(per_minute, self._level - amount)
+
+
+class QuotaLimiter:
+    """Requests per minute and tokens per minute for the model (SOLLE_LLM_RPM, SOLLE_LLM_TPM)."""
+
+    def __init__(self):
+        self.requests = TokenBucket()
+        self.tokens = TokenBucket()
+
+    @staticmethod
+    def limits() -> Tuple[float, float]:
+        return (float(os.getenv("SOLLE_LLM_RPM") or LLM_RPM),
+                float(os.getenv("SOLLE_LLM_TPM") or LLM_TPM))
+
+    def delay(self, tokens: int) -> float:
+        """Reserves one request of about `tokens` tokens; returns the seconds to wait for it."""
+        rpm, tpm = self.limits()
+        return max(self.requests.reserve(1, rpm), self.tokens.reserve(tokens, tpm))
+
+    def settle(self, tokens: int):
+        """Charges the difference between the estimate and the tokens actually used."""
+        self.tokens.settle(tokens, self.limits()[1])
+
+
+# Shared by all model calls of the process, so batch workers count against one quota
+quota_limiter = QuotaLimiter()
+
+
+def streaming_enabled() -> bool:
+    return bool(os.getenv("SOLLE_STREAM"))
+
+
+def _chunk_text(chunk) -> str:
+    # A chunk may carry only a finish reason or safety ratings and no text
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+class ResponseCache:
+    """
+    Model responses in SQLite by request key, with the time each was last
+    used; beyond max_bytes of text the least recently used ones are dropped.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int):
+        self.path = db_path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Shared by the worker threads of a batch run
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT, text TEXT,"
+                " size INTEGER, created_at REAL, used_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used_at)")
+        except sqlite3.Error:
+            self._db.close()
+            raise
+
+    @staticmethod
+    def default_path() -> str:
+        return os.path.join(cache_dir(), "llm.sqlite")
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock, self._db:
+            row = self._db.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+        return row[0] if row else None
+
+    def put(self, key: str, model_name: str, text: str):
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, model_name, text, size, now, now))
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for old_key, old_size in self._db.execute(
+                    "SELECT key, size FROM responses ORDER BY used_at").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                total -= old_size
+
+    def close(self):
+        self._db.close()
+
+
+_response_cache = None  # False once opening it has failed, so that is reported only once
+_response_cache_lock = threading.Lock()
+
+
+def response_cache() -> Optional[ResponseCache]:
+    """The shared response cache, or None unless SOLLE_LLM_CACHE=1 (and not SOLLE_NO_CACHE=1)."""
+    global _response_cache
+    if not os.getenv("SOLLE_LLM_CACHE") or os.getenv("SOLLE_NO_CACHE"):
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            max_bytes = int(float(os.getenv("SOLLE_LLM_CACHE_MB") or LLM_CACHE_MB) * 1024 * 1024)
+            try:
+                _response_cache = ResponseCache(ResponseCache.default_path(), max_bytes)
+            except (OSError, sqlite3.Error) as e:
+                print(f"LLM-cache niet beschikbaar ({e}); alle verzoeken gaan naar het model.")
+                _response_cache = False
+        return _response_cache or None
+
+
+def _model_name(model) -> str:
+    return getattr(model, "model_name", type(model).__name__)
+
+
+def request_key(model, prompt: str) -> str:
+    """Hash of everything that determines the response: model, system instruction, config and prompt."""
+    # GenerativeModel has no public accessors for its system instruction and generation config
+    request = {
+        "model": _model_name(model),
+        "system_instruction": str(getattr(model, "_system_instruction", None) or ""),
+        "generation_config": getattr(model, "_generation_config", None) or {},
+        "prompt": prompt,
+    }
+    encoded = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def generate_text(model, prompt: str, on_chunk: Optional[Callable[[str], None]] = None,
+                  echo: bool = True) -> str:
+    """
+    The response text of model.generate_content(prompt), streamed to
+    on_chunk with SOLLE_STREAM, and from or into the response cache when
+    that is enabled. echo=False keeps the cache and retry notes off the
+    console, for callers running on worker threads.
+    """
+    cache = response_cache()
+    key = request_key(model, prompt) if cache else None
+    if cache and not os.getenv("SOLLE_LLM_CACHE_BYPASS"):
+        text = cache.get(key)
+        if text is not None:
+            if echo:
+                print("   (antwoord uit de LLM-cache)")
+            if on_chunk:
+                on_chunk(text)
+            return text
+
+    text = _call_model(model, prompt, on_chunk, echo)
+    if cache:
+        cache.put(key, _model_name(model), text)
+    return text
+
+
+def _call_model(model, prompt: str, on_chunk: Optional[Callable[[str], None]], echo: bool = True) -> str:
+    """
+    _generate within the quota, retrying rate-limit and server errors with
+    backoff as long as no text has been handed to on_chunk yet.
+    """
+    retries = int(os.getenv("SOLLE_LLM_RETRIES") or LLM_RETRIES)
+    backoff = float(os.getenv("SOLLE_LLM_BACKOFF") or LLM_BACKOFF)
+    estimate = len(prompt) // 4 + OUTPUT_TOKEN_ESTIMATE
+    for attempt in range(retries + 1):
+        time.sleep(quota_limiter.delay(estimate))
+        delivered = []
+
+        def forward(text: str):
+            delivered.append(text)
+            if on_chunk:
+                on_chunk(text)
+
+        try:
+            text, used = _generate(model, prompt, forward)
+        except Exception as e:
+            code = _error_code(e)
+            if delivered or attempt == retries or code not in LLM_RETRY_CODES:
+                raise
+            # A refused request used no tokens
+            quota_limiter.settle(-estimate)
+            wait = backoff_delay(attempt + 1, backoff, LLM_BACKOFF_MAX)
+            if echo:
+                print(f"   (model antwoordt {code}; nieuwe poging over {wait:.0f} s)")
+            time.sleep(wait)
+            continue
+        if used:
+            quota_limiter.settle(used - estimate)
+        return text
+
+
+def _error_code(error: Exception) -> Optional[int]:
+    # google.api_core exceptions carry the HTTP status as .code
+    code = getattr(error, "code", None)
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def _total_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) or None
+
+
+def _generate(model, prompt: str, on_chunk: Callable[[str], None]) -> Tuple[str, Optional[int]]:
+    """One model call: (text, tokens used if reported)."""
+    if not streaming_enabled():
+        response = model.generate_content(prompt)
+        text = response.text
+        on_chunk(text)
+        return text, _total_tokens(response)
+
+    response = model.generate_content(prompt, stream=True)
+    parts = []
+    for chunk in response:
+        text = _chunk_text(chunk)
+        if text:
+            parts.append(text)
+            on_chunk(text)
+    if not parts:
+        # Nothing usable arrived (e.g. blocked): raises the same error as the non-streaming call
+        return response.text, _total_tokens(response)
+    return "".join(parts), _total_tokens(response)
+
+
+# Start of the line ChunkWriter.interrupted appends to a file cut off mid-generation
+INCOMPLETE_MARKER = "[Onvolledig:"
+
+
+class ChunkWriter:
+    """
+    on_chunk callback that prints each chunk and appends it to the given
+    open files, flushing them so that the text is on disk as it arrives.
+    """
+
+    def __init__(self, *files: IO[str], echo: bool = True):
+        self.files = files
+        self.echo = echo
+
+    def __call__(self, text: str):
+        if self.echo:
+            print(text, end="", flush=True)
+        for f in self.files:
+            f.write(text)
+            f.flush()
+
+    def interrupted(self, error: BaseException):
+        """Marks the files as incomplete after a failed or interrupted call."""
+        reason = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+        for f in self.files:
+            f.write(f"\n\n{INCOMPLETE_MARKER} het genereren is afgebroken ({reason})]\n")
+            f.flush()
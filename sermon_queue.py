@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Persistent job queue for bulk generation.
+
+01__generate_sermon_solle.py --queue and 02__feedback_sermon.py --queue
+submit their work as jobs to a SQLite file (output/jobs.sqlite, or
+SOLLE_QUEUE_DB) and then work through every unfinished job of their kind.
+A job keeps the output of each pipeline stage it has completed (fetched
+text, analysis, examples, sermon, critique) as JSON state, saved as soon as
+the stage is done. After a crash, Ctrl+C or a quota error that outlasted
+the retries, running the same script again resumes every unfinished job
+at the stage where it stopped; finished stages are not repeated.
+
+Runs without the queue keep the same stage state in a Checkpoint file
+(output/checkpoints/<kind>_<time>_<input>.json), rewritten after every
+stage and removed when the run completes; --resume continues the most
+recent one.
+
+The model quota itself (requests and tokens per minute, backoff on 429) is
+enforced by sermon_llm for every call; run_jobs sets the defaults below
+when SOLLE_LLM_RPM / SOLLE_LLM_TPM are not configured.
+"""
+
+import os
+import re
+import glob
+import json
+import time
+import sqlite3
+import datetime
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+QUEUE_PATH = os.path.join("output", "jobs.sqlite")
+# Default quota for queue runs (Gemini flash free tier: 10 requests, 250k tokens per minute)
+QUEUE_RPM = 10
+QUEUE_TPM = 250_000
+QUEUE_WORKERS = 2
+CHECKPOINT_DIR = os.path.join("output", "checkpoints")
+
+PENDING, RUNNING, DONE, FAILED = "wacht", "bezig", "klaar", "mislukt"
+
+
+class Job(NamedTuple):
+    id: int
+    kind: str
+    input: str
+    status: str
+    state: Dict
+    attempts: int
+    error: Optional[str]
+
+
+class JobInterrupted(Exception):
+    """Raised at a stage boundary when the runner is stopping (Ctrl+C)."""
+
+
+class JobQueue:
+    """
+    Jobs per kind ('sermon', 'feedback') with their status and stage state
+    in SQLite. Safe to share between the worker threads of one runner; run
+    one runner per kind at a time.
+    """
+
+    def __init__(self, db_path: str):
+        self.path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, input TEXT,"
+                " status TEXT, state TEXT, attempts INTEGER, error TEXT, created_at REAL, updated_at REAL)"
+            )
+        except sqlite3.Error:
+            self._db.close()
+            raise
+
+    @staticmethod
+    def default_path() -> str:
+        return os.getenv("SOLLE_QUEUE_DB") or QUEUE_PATH
+
+    def submit(self, kind: str, job_input: str) -> int:
+        """Adds a job; an unfinished job with the same kind and input is reused instead."""
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND input = ? AND status != ?", (kind, job_input, DONE)
+            ).fetchone()
+            if row:
+                return row[0]
+            now = time.time()
+            return self._db.execute(
+                "INSERT INTO jobs (kind, input, status, state, attempts, created_at, updated_at)"
+                " VALUES (?, ?, ?, '{}', 0, ?, ?)", (kind, job_input, PENDING, now, now)
+            ).lastrowid
+
+    def unfinished(self, kind: str) -> List[Job]:
+        """Every job of kind that is not done, oldest first; 'running' ones were cut off by a crash."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, kind, input, status, state, attempts, error FROM jobs"
+                " WHERE kind = ? AND status != ? ORDER BY id", (kind, DONE)
+            ).fetchall()
+        return [Job(*row[:4], json.loads(row[4]), *row[5:]) for row in rows]
+
+    def _update(self, job_id: int, **columns):
+        columns["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id))
+
+    def start(self, job_id: int, attempts: int):
+        self._update(job_id, status=RUNNING, attempts=attempts, error=None)
+
+    def save_state(self, job_id: int, state: Dict):
+        self._update(job_id, state=json.dumps(state, ensure_ascii=False))
+
+    def finish(self, job_id: int, state: Dict):
+        self._update(job_id, status=DONE, state=json.dumps(state, ensure_ascii=False))
+
+    def fail(self, job_id: int, error: str):
+        self._update(job_id, status=FAILED, error=error)
+
+    def release(self, job_id: int):
+        """Puts an interrupted job back to waiting."""
+        self._update(job_id, status=PENDING)
+
+    def close(self):
+        self._db.close()
+
+
+class Checkpoint:
+    """
+    Stage state of one run outside the queue, in a JSON file that is
+    replaced atomically after every stage. A run that completes removes it;
+    one that fails leaves it for --resume.
+    """
+
+    def __init__(self, path: str, kind: str, job_input: str, state: Optional[Dict] = None):
+        self.path = path
+        self.kind = kind
+        self.input = job_input
+        self.state = {} if state is None else state
+
+    @classmethod
+    def new(cls, kind: str, job_input: str, directory: str = CHECKPOINT_DIR) -> "Checkpoint":
+        """A checkpoint under a fresh name: <kind>_<time>_<input>.json, with -2, -3, ... if taken."""
+        os.makedirs(directory, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_input = re.sub(r'[^\w-]+', '_', os.path.basename(job_input)).strip('_')[:60]
+        base = f"{kind}_{timestamp}_{safe_input}"
+        for n in itertools.count(2):
+            path = os.path.join(directory, f"{base}.json")
+            try:
+                with open(path, "x", encoding="utf-8"):
+                    pass
+                break
+            except FileExistsError:
+                base = f"{kind}_{timestamp}_{safe_input}-{n}"
+        checkpoint = cls(path, kind, job_input)
+        checkpoint.save(checkpoint.state)
+        return checkpoint
+
+    @classmethod
+    def load(cls, path: str) -> "Checkpoint":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        missing = [name for name in ("kind", "input", "state") if not isinstance(data, dict) or name not in data]
+        if missing:
+            raise ValueError(f"Not a checkpoint file: no {', '.join(missing)}")
+        return cls(path, data["kind"], data["input"], data["state"])
+
+    @classmethod
+    def latest(cls, kind: str, directory: str = CHECKPOINT_DIR) -> Optional["Checkpoint"]:
+        """The most recently saved checkpoint of kind, or None."""
+        paths = glob.glob(os.path.join(directory, f"{kind}_*.json"))
+        for path in sorted(paths, key=os.path.getmtime, reverse=True):
+            try:
+                return cls.load(path)
+            except (OSError, ValueError, KeyError):
+                continue
+        return None
+
+    def save(self, state: Dict):
+        """Writes the state; the callback for write_sermon / review_sermon."""
+        self.state = state
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"kind": self.kind, "input": self.input, "state": state,
+                       "saved_at": datetime.datetime.now().isoformat(timespec="seconds")},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def run_jobs(queue: JobQueue, kind: str, handler: Callable[[str, Dict, Callable[[Dict], None]], str],
+             workers: int = QUEUE_WORKERS) -> int:
+    """
+    Runs every unfinished job of kind on a pool of workers.
+
+    handler(job_input, state, checkpoint) does the work: it skips the stages
+    already in state, and calls checkpoint(state) after each stage it
+    completes. It returns a short result (e.g. the output file) for the
+    summary. Ctrl+C lets running jobs stop at their next stage boundary.
+    Returns the number of jobs that did not finish.
+    """
+    os.environ.setdefault("SOLLE_LLM_RPM", str(QUEUE_RPM))
+    os.environ.setdefault("SOLLE_LLM_TPM", str(QUEUE_TPM))
+    jobs = queue.unfinished(kind)
+    if not jobs:
+        print("Geen openstaande taken.")
+        return 0
+    resumed = sum(1 for job in jobs if job.state)
+    print(f"{len(jobs)} openstaande taken ({resumed} gaan verder waar ze gebleven waren), {workers} tegelijk,"
+          f" hoogstens {os.environ['SOLLE_LLM_RPM']} verzoeken en {os.environ['SOLLE_LLM_TPM']} tokens per minuut\n")
+    stop = threading.Event()
+    results = {}
+    start = time.perf_counter()
+
+    def work(job: Job):
+        job_start = time.perf_counter()
+        state = dict(job.state)
+
+        def checkpoint(new_state: Dict):
+            queue.save_state(job.id, new_state)
+            if stop.is_set():
+                raise JobInterrupted()
+
+        queue.start(job.id, job.attempts + 1)
+        try:
+            result = handler(job.input, state, checkpoint)
+        except JobInterrupted:
+            queue.release(job.id)
+            return None, "onderbroken", time.perf_counter() - job_start
+        except Exception as e:
+            queue.fail(job.id, f"{type(e).__name__}: {e}")
+            return False, f"{type(e).__name__}: {e}", time.perf_counter() - job_start
+        queue.finish(job.id, state)
+        return True, result, time.perf_counter() - job_start
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    futures = {pool.submit(work, job): job for job in jobs}
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            results[job.id] = future.result()
+            ok, _, seconds = results[job.id]
+            status = {True: "klaar", False: "mislukt", None: "onderbroken"}[ok]
+            print(f"[{done}/{len(jobs)}] {job.input}: {status} ({seconds:.1f} s)")
+    except KeyboardInterrupt:
+        stop.set()
+        print("\nAfgebroken: lopende taken stoppen na hun huidige stap; opnieuw starten gaat verder.")
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    unfinished = 0
+    print(f"\n{'taak':<6}{'invoer':<30} {'status':<12}{'tijd':>8}  resultaat / fout")
+    for job in jobs:
+        ok, detail, seconds = results[job.id]
+        unfinished += ok is not True
+        status = {True: "klaar", False: "mislukt", None: "onderbroken"}[ok]
+        print(f"{job.id:<6}{job.input:<30} {status:<12}{seconds:>7.1f}s  {detail}")
+    print(f"\nKlaar in {time.perf_counter() - start:.1f} s: {len(jobs) - unfinished} klaar, {unfinished} niet."
+          + (" Opnieuw starten gaat verder bij de laatste voltooide stap." if unfinished else ""))
+    return unfinished